@@ -0,0 +1,670 @@
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import FrozenSet, List, Dict, Optional
+
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+import catalog
+import search
+
+# --- Async connection pool (handlerlar uchun) ---
+DATABASE_URL = os.getenv("DATABASE_URL")
+if not DATABASE_URL:
+    raise ValueError("DATABASE_URL env var is required for PostgreSQL")
+
+# open=False: pool event loop ichida (Application.post_init) ochiladi
+pool = AsyncConnectionPool(
+    conninfo=DATABASE_URL, min_size=1, max_size=10, open=False, kwargs={"autocommit": True}
+)
+
+
+async def open_pool():
+    await pool.open()
+
+
+async def close_pool():
+    await pool.close()
+
+
+@asynccontextmanager
+async def get_conn():
+    async with pool.connection() as conn:
+        conn.row_factory = dict_row
+        yield conn
+
+# =====================
+# 🗂 Catalog cache
+# =====================
+
+async def _load_catalog() -> catalog.Catalog:
+    """Butun katalogni bitta ulanishda o'qib, snapshot quradi."""
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute("SELECT * FROM books ORDER BY sort_key, id;")
+        books = await cur.fetchall()
+        await cur.execute("SELECT * FROM parts ORDER BY book_id, id;")
+        parts = await cur.fetchall()
+        await cur.execute("SELECT * FROM genres ORDER BY nomi;")
+        genres = await cur.fetchall()
+        await cur.execute("SELECT book_id, genre_id FROM book_genres;")
+        links = await cur.fetchall()
+    return catalog.build(books, parts, genres, links)
+
+
+async def _catalog() -> catalog.Catalog:
+    return await catalog.get(_load_catalog)
+
+
+async def load_catalog():
+    """Startup da katalogni oldindan yuklash (post_init)."""
+    catalog.invalidate()
+    await _catalog()
+
+
+def _book_key(book_id: Optional[str]):
+    return catalog.book_sort_key(book_id) if book_id is not None else None
+
+# Sahifalangan variantlar: (raqamli) book id / part id bo'yicha keyset
+
+async def get_books_page(after_id: Optional[str] = None, before_id: Optional[str] = None,
+                         limit: int = 20) -> catalog.Page:
+    snap = await _catalog()
+    return catalog.paginate(snap.books, snap.book_keys, _book_key(after_id), _book_key(before_id), limit)
+
+async def get_books_by_genre_page(genre_id: int, after_id: Optional[str] = None,
+                                  before_id: Optional[str] = None, limit: int = 20) -> catalog.Page:
+    snap = await _catalog()
+    return catalog.paginate(
+        snap.books_by_genre.get(genre_id, ()), snap.genre_book_keys.get(genre_id, ()),
+        _book_key(after_id), _book_key(before_id), limit
+    )
+
+async def get_parts_page(book_id: str, after_id: Optional[int] = None,
+                         before_id: Optional[int] = None, limit: int = 20) -> catalog.Page:
+    snap = await _catalog()
+    return catalog.paginate(
+        snap.parts_by_book.get(book_id, ()), snap.part_keys.get(book_id, ()), after_id, before_id, limit
+    )
+
+# =====================
+# 🔎 Search
+# =====================
+
+# "auto": pg_trgm o'rnatilgan bo'lsa DB, aks holda xotiradagi indeks
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto").lower()
+_search_state = {"pg_trgm": None, "index": None, "books": None}
+
+async def _has_pg_trgm() -> bool:
+    if _search_state["pg_trgm"] is None:
+        async with get_conn() as conn, conn.cursor() as cur:
+            await cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm';")
+            _search_state["pg_trgm"] = await cur.fetchone() is not None
+    return _search_state["pg_trgm"]
+
+async def _memory_index() -> search.NgramIndex:
+    """Katalog snapshot i almashganda indeks qayta quriladi."""
+    books = (await _catalog()).books
+    if _search_state["books"] is not books:
+        _search_state["index"] = search.NgramIndex(books)
+        _search_state["books"] = books
+    return _search_state["index"]
+
+async def search_books_memory(query: str, limit: int = 10) -> List[Dict]:
+    """Faqat xotiradagi indeks bo'yicha qidiruv — DB ga murojaat qilmaydi (inline rejim)."""
+    return [b for _, b in (await _memory_index()).search(query, limit)]
+
+async def search_books(query: str, limit: int = 10) -> List[Dict]:
+    """Nom bo'yicha tartiblangan natijalar (kirill/lotin va apostrof farqlari hisobga olinmaydi)."""
+    if not search.fold(query):
+        return []
+    use_pg = SEARCH_BACKEND == "postgres" or (SEARCH_BACKEND == "auto" and await _has_pg_trgm())
+    if not use_pg:
+        return await search_books_memory(query, limit)
+
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            """
+            SELECT b.id, b.nomi, word_similarity(q, b.search_key) AS score
+            FROM books b, uz_fold(%s) AS q
+            WHERE q <%% b.search_key OR b.search_key LIKE '%%' || q || '%%'
+            ORDER BY (b.search_key LIKE q || '%%') DESC, (b.search_key LIKE '%%' || q || '%%') DESC,
+                     score DESC, b.sort_key, b.id
+            LIMIT %s;
+            """,
+            (query, limit)
+        )
+        rows = await cur.fetchall()
+    # Katalogdagi to'liq qatorlarni qaytaramiz (boshqa o'qish funksiyalari kabi)
+    by_id = (await _catalog()).books_by_id
+    return [by_id.get(r["id"], r) for r in rows]
+
+# =====================
+# 📚 Books
+# =====================
+
+async def get_next_book_id() -> str:
+    """Reserve the next numeric string id from book_id_seq."""
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute("SELECT nextval('book_id_seq') AS id;")
+        row = await cur.fetchone()
+        return str(row["id"])
+
+async def create_book(title: str, genre_ids: List[int], part_urls: List[str]) -> str:
+    """
+    Kitob, uning janrlari va qismlarini bitta so'rovda (demak bitta tranzaksiyada) yaratadi.
+    Id book_id_seq dan olinadi; qismlar "1-qism", "2-qism", ... tartibida nomlanadi.
+    """
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            """
+            WITH b AS (
+                INSERT INTO books (id, nomi) VALUES (nextval('book_id_seq')::text, %s)
+                RETURNING id
+            ), g AS (
+                INSERT INTO book_genres (book_id, genre_id)
+                SELECT b.id, gid FROM b, unnest(%s::int[]) AS gid
+                ON CONFLICT DO NOTHING
+            ), p AS (
+                INSERT INTO parts (book_id, nomi, audio_url)
+                SELECT b.id, u.n || '-qism', u.url
+                FROM b, unnest(%s::text[]) WITH ORDINALITY AS u(url, n)
+                ORDER BY u.n
+            )
+            SELECT id FROM b;
+            """,
+            (title, list(genre_ids), list(part_urls))
+        )
+        row = await cur.fetchone()
+    catalog.invalidate()
+    return row["id"]
+
+async def add_book(book_id: str, nomi: str):
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            "INSERT INTO books (id, nomi) VALUES (%s, %s) ON CONFLICT (id) DO NOTHING;",
+            (book_id, nomi)
+        )
+    catalog.invalidate()
+
+async def get_book(book_id: str) -> Optional[Dict]:
+    return (await _catalog()).books_by_id.get(book_id)
+
+async def get_book_by_title(title: str) -> Optional[Dict]:
+    return next((b for b in (await _catalog()).books if b["nomi"] == title), None)
+
+async def get_books() -> List[Dict]:
+    return list((await _catalog()).books)
+
+async def delete_book(book_id: str):
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute("DELETE FROM books WHERE id = %s;", (book_id,))
+    catalog.invalidate()
+
+async def update_book_title(book_id: str, new_title: str):
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute("UPDATE books SET nomi = %s WHERE id = %s;", (new_title, book_id))
+    catalog.invalidate()
+
+# =====================
+# 🎧 Parts
+# =====================
+
+async def add_part(book_id: str, nomi: str, audio_url: str):
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            "INSERT INTO parts (book_id, nomi, audio_url) VALUES (%s, %s, %s);",
+            (book_id, nomi, audio_url)
+        )
+    catalog.invalidate()
+
+async def add_parts(book_id: str, urls: List[str]) -> int:
+    """
+    Bir nechta qismni bitta INSERT ... SELECT unnest bilan qo'shadi; raqamlash
+    ("N-qism") server tomonda. Kitob qatori qulflanadi — parallel qo'shishlarda
+    raqamlar takrorlanmaydi. Kitobdagi yangi qismlar sonini qaytaradi.
+    """
+    async with get_conn() as conn, conn.transaction(), conn.cursor() as cur:
+        await cur.execute("SELECT id FROM books WHERE id = %s FOR UPDATE;", (book_id,))
+        if not await cur.fetchone():
+            return 0
+        # Qulfdan keyingi alohida so'rov — snapshot boshqa tranzaksiyalarning qismlarini ham ko'radi
+        await cur.execute(
+            """
+            WITH c AS (SELECT count(*) AS n FROM parts WHERE book_id = %s),
+            ins AS (
+                INSERT INTO parts (book_id, nomi, audio_url)
+                SELECT %s, (c.n + u.n) || '-qism', u.url
+                FROM c, unnest(%s::text[]) WITH ORDINALITY AS u(url, n)
+                ORDER BY u.n
+                RETURNING 1
+            )
+            SELECT (SELECT n FROM c) + (SELECT count(*) FROM ins) AS total;
+            """,
+            (book_id, book_id, list(urls))
+        )
+        total = (await cur.fetchone())["total"]
+    catalog.invalidate()
+    return total
+
+async def get_parts(book_id: str) -> List[Dict]:
+    return list((await _catalog()).parts_by_book.get(book_id, ()))
+
+async def get_part(part_id: int) -> Optional[Dict]:
+    """parts.id bo'yicha qism (katalog keshidan)."""
+    return (await _catalog()).parts_by_id.get(part_id)
+
+async def get_next_parts(part_id: int, limit: int = 1) -> List[Dict]:
+    """Shu kitobda part_id dan keyingi `limit` ta qism (katalogdagi tartiblangan ro'yxatdan)."""
+    snap = await _catalog()
+    part = snap.parts_by_id.get(part_id)
+    if not part:
+        return []
+    page = catalog.paginate(
+        snap.parts_by_book.get(part["book_id"], ()), snap.part_keys.get(part["book_id"], ()),
+        after=part_id, limit=limit
+    )
+    return list(page.items)
+
+async def delete_part(part_id: int):
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute("DELETE FROM parts WHERE id = %s;", (part_id,))
+    catalog.invalidate()
+
+async def set_part_file_id(book_id: str, part_id: int, file_id: str):
+    """Birinchi muvaffaqiyatli yuborishdan olingan Telegram file_id ni saqlaydi."""
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute("UPDATE parts SET file_id = %s WHERE id = %s;", (file_id, part_id))
+    catalog.patch_part(book_id, part_id, file_id=file_id)
+
+async def set_part_file_ids(pairs: List[tuple]):
+    """[(part_id, file_id), ...] ni bitta so'rovda yozadi (warm-up job uchun)."""
+    if not pairs:
+        return
+    part_ids = [int(pid) for pid, _ in pairs]
+    file_ids = [fid for _, fid in pairs]
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            """
+            UPDATE parts SET file_id = v.file_id
+            FROM unnest(%s::int[], %s::text[]) AS v(id, file_id)
+            WHERE parts.id = v.id;
+            """,
+            (part_ids, file_ids)
+        )
+    # Butun katalogni qayta yuklamasdan, faqat shu qismlar
+    catalog.patch_parts({pid: {"file_id": fid} for pid, fid in zip(part_ids, file_ids)})
+
+async def get_parts_without_file_id() -> List[Dict]:
+    snap = await _catalog()
+    return [p for parts in snap.parts_by_book.values() for p in parts if not p.get("file_id")]
+
+# =====================
+# 🏷 Genres
+# =====================
+
+async def add_genre(nomi: str):
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            "INSERT INTO genres (nomi) VALUES (%s) ON CONFLICT (nomi) DO NOTHING;",
+            (nomi,)
+        )
+    catalog.invalidate()
+
+async def get_genres() -> List[Dict]:
+    return list((await _catalog()).genres)
+
+async def delete_genre(genre_id: int):
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute("DELETE FROM genres WHERE id = %s;", (genre_id,))
+    catalog.invalidate()
+
+async def link_book_genre(book_id: str, genre_id: int):
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            "INSERT INTO book_genres (book_id, genre_id) VALUES (%s, %s) ON CONFLICT DO NOTHING;",
+            (book_id, genre_id)
+        )
+    catalog.invalidate()
+
+async def clear_book_genres(book_id: str):
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute("DELETE FROM book_genres WHERE book_id = %s;", (book_id,))
+    catalog.invalidate()
+
+async def get_genres_for_book(book_id: str) -> List[Dict]:
+    return list((await _catalog()).genres_by_book.get(book_id, ()))
+
+async def set_book_genres(book_id: str, genre_ids: List[int]):
+    """
+    Faqat farqni yozadi: ro'yxatda yo'q bog'lanishlar o'chiriladi, yangilari
+    qo'shiladi (mavjudlari tegilmaydi) — ikki so'rov, bitta tranzaksiya.
+    """
+    ids = sorted(set(genre_ids))
+    async with get_conn() as conn, conn.transaction(), conn.cursor() as cur:
+        await cur.execute(
+            "DELETE FROM book_genres WHERE book_id = %s AND genre_id <> ALL(%s::int[]);",
+            (book_id, ids)
+        )
+        if ids:
+            await cur.execute(
+                """
+                INSERT INTO book_genres (book_id, genre_id)
+                SELECT %s, unnest(%s::int[])
+                ON CONFLICT DO NOTHING;
+                """,
+                (book_id, ids)
+            )
+    catalog.invalidate()
+
+async def set_genres_for_books(assignments: Dict[str, List[int]]):
+    """
+    Ko'p kitobga birdaniga janr belgilash: {book_id: [genre_id, ...]}.
+    Har bir kitobning janrlari berilgan ro'yxatga tenglashtiriladi (bo'sh ro'yxat —
+    hammasi olib tashlanadi); butun to'plam ikki so'rov bilan yoziladi.
+    """
+    if not assignments:
+        return
+    book_ids = list(assignments)
+    pairs = [(bid, gid) for bid, gids in assignments.items() for gid in sorted(set(gids))]
+    async with get_conn() as conn, conn.transaction(), conn.cursor() as cur:
+        await cur.execute(
+            """
+            DELETE FROM book_genres bg
+            WHERE bg.book_id = ANY(%s::text[])
+              AND NOT EXISTS (
+                  SELECT 1 FROM unnest(%s::text[], %s::int[]) AS n(book_id, genre_id)
+                  WHERE n.book_id = bg.book_id AND n.genre_id = bg.genre_id
+              );
+            """,
+            (book_ids, [p[0] for p in pairs], [p[1] for p in pairs])
+        )
+        if pairs:
+            await cur.execute(
+                """
+                INSERT INTO book_genres (book_id, genre_id)
+                SELECT * FROM unnest(%s::text[], %s::int[])
+                ON CONFLICT DO NOTHING;
+                """,
+                ([p[0] for p in pairs], [p[1] for p in pairs])
+            )
+    catalog.invalidate()
+
+async def get_books_by_genre(genre_id: int) -> List[Dict]:
+    return list((await _catalog()).books_by_genre.get(genre_id, ()))
+
+# =====================
+# 👥 Users & Admins
+# =====================
+
+async def add_user(user_id: int, name: str):
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            "INSERT INTO users (id, name) VALUES (%s, %s) ON CONFLICT (id) DO NOTHING;",
+            (user_id, name)
+        )
+
+async def get_users() -> List[Dict]:
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute("SELECT * FROM users ORDER BY id;")
+        return list(await cur.fetchall())
+
+async def count_users() -> int:
+    # users dagi triggerlar yuritadigan hisoblagich — COUNT(*) skanerisiz
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute("SELECT value FROM app_counters WHERE name = 'users';")
+        row = await cur.fetchone()
+        return int(row["value"]) if row else 0
+
+async def get_user_ids_after(after_id: int, limit: int) -> List[int]:
+    """users.id bo'yicha keyset sahifa (broadcast uchun)."""
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute("SELECT id FROM users WHERE id > %s ORDER BY id LIMIT %s;", (after_id, limit))
+        return [r["id"] for r in await cur.fetchall()]
+
+# Admin ID lar keshi: add_admin/delete_admin da bekor qilinadi, boshqa
+# instance dagi o'zgarishlar ADMIN_CACHE_TTL soniyada ko'rinadi
+ADMIN_CACHE_TTL = float(os.getenv("ADMIN_CACHE_TTL", "60"))
+_admin_ids: Optional[FrozenSet[int]] = None
+_admin_ids_at = 0.0
+_admin_ids_gen = 0
+
+
+def _invalidate_admin_ids():
+    global _admin_ids, _admin_ids_gen
+    _admin_ids = None
+    _admin_ids_gen += 1
+
+async def get_admin_ids() -> FrozenSet[int]:
+    global _admin_ids, _admin_ids_at
+    if _admin_ids is not None and time.monotonic() - _admin_ids_at < ADMIN_CACHE_TTL:
+        return _admin_ids
+    gen = _admin_ids_gen
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute("SELECT id FROM admins;")
+        ids = frozenset(int(r["id"]) for r in await cur.fetchall())
+    # So'rov paytida add/delete bo'lgan bo'lsa, eski natijani keshlamaymiz
+    if gen == _admin_ids_gen:
+        _admin_ids, _admin_ids_at = ids, time.monotonic()
+    return ids
+
+async def add_admin(admin_id: int, name: str):
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            "INSERT INTO admins (id, name) VALUES (%s, %s) ON CONFLICT (id) DO NOTHING;",
+            (admin_id, name)
+        )
+    _invalidate_admin_ids()
+
+async def get_admins() -> List[Dict]:
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute("SELECT * FROM admins ORDER BY id;")
+        return list(await cur.fetchall())
+
+async def delete_admin(admin_id: int):
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute("DELETE FROM admins WHERE id = %s;", (admin_id,))
+    _invalidate_admin_ids()
+
+# =====================
+# 📬 Broadcast jobs
+# =====================
+
+async def create_broadcast_job(from_chat_id: int, message_id: int, admin_chat_id: int,
+                               progress_message_id: Optional[int], total: int, owner: str) -> Dict:
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            """
+            INSERT INTO broadcast_jobs (from_chat_id, message_id, admin_chat_id, progress_message_id, total, owner)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            RETURNING *;
+            """,
+            (from_chat_id, message_id, admin_chat_id, progress_message_id, total, owner)
+        )
+        return dict(await cur.fetchone())
+
+async def checkpoint_broadcast_job(job_id: int, owner: str, last_user_id: int, sent: int, failed: int,
+                                   status: str = "running") -> bool:
+    """Faqat lease egasi yozadi; False — job boshqa instance ga o'tgan."""
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            """
+            UPDATE broadcast_jobs
+            SET last_user_id = %s, sent = %s, failed = %s, status = %s, updated_at = now()
+            WHERE id = %s AND owner = %s;
+            """,
+            (last_user_id, sent, failed, status, job_id, owner)
+        )
+        return cur.rowcount > 0
+
+async def renew_broadcast_lease(job_id: int, owner: str) -> bool:
+    """Heartbeat: updated_at ni yangilaydi; False — lease yo'qotilgan (yoki job tugagan)."""
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            """
+            UPDATE broadcast_jobs SET updated_at = now()
+            WHERE id = %s AND owner = %s AND status = 'running';
+            """,
+            (job_id, owner)
+        )
+        return cur.rowcount > 0
+
+async def claim_stale_broadcast_jobs(stale_seconds: int, owner: str) -> List[Dict]:
+    """
+    Heartbeat i uzoq vaqt kelmagan (jarayon o'lgan) 'running' joblarni egallaydi.
+    owner almashgani uchun eski egasi ham, boshqa instance lar ham ularni yozolmaydi.
+    """
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            """
+            UPDATE broadcast_jobs SET updated_at = now(), owner = %s
+            WHERE status = 'running' AND updated_at < now() - make_interval(secs => %s)
+            RETURNING *;
+            """,
+            (owner, stale_seconds)
+        )
+        return list(await cur.fetchall())
+
+# =====================
+# 💬 Feedback
+# =====================
+
+async def add_feedback(user_id: int, name: str, username: Optional[str], text: str):
+    text_norm = (text or "").strip()
+    if not text_norm:
+        return
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            "INSERT INTO feedback (id, name, username, text, created_at) VALUES (%s, %s, %s, %s, %s);",
+            (user_id, name, username, text_norm, datetime.utcnow())
+        )
+
+async def get_feedback(limit: int = 10) -> List[Dict]:
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            """
+            SELECT * FROM feedback
+            ORDER BY created_at DESC NULLS LAST, id DESC
+            LIMIT %s;
+            """,
+            (limit,)
+        )
+        return list(await cur.fetchall())
+
+async def deduplicate_feedback() -> int:
+    """Remove duplicate rows with same (id, text); keep the oldest (smallest ctid). Return removed count."""
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            """
+            WITH deleted AS (
+                DELETE FROM feedback a
+                USING feedback b
+                WHERE a.id = b.id
+                  AND a.text = b.text
+                  AND a.ctid > b.ctid
+                RETURNING 1
+            )
+            SELECT COUNT(*) AS removed FROM deleted;
+            """
+        )
+        row = await cur.fetchone()
+        return int(row["removed"] if row and row["removed"] is not None else 0)
+
+# =====================
+# 👁 Book Views
+# =====================
+
+async def increment_book_view(book_id: str):
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            """
+            INSERT INTO book_views (book_id, count) VALUES (%s, 1)
+            ON CONFLICT (book_id) DO UPDATE SET count = book_views.count + 1;
+            """,
+            (book_id,)
+        )
+
+async def add_book_views(counts: Dict[str, int]):
+    """{book_id: n} ni bitta ko'p qatorli UPSERT bilan qo'shadi."""
+    if not counts:
+        return
+    # Tartiblangan kalitlar — parallel flushlar orasida deadlock bo'lmasligi uchun
+    book_ids = sorted(counts)
+    async with get_conn() as conn, conn.cursor() as cur:
+        # Flush gacha o'chirilgan kitoblar tashlab yuboriladi (aks holda FK butun batchni rad etadi)
+        await cur.execute(
+            """
+            INSERT INTO book_views (book_id, count)
+            SELECT r.book_id, r.n
+            FROM unnest(%s::text[], %s::int[]) AS r(book_id, n)
+            JOIN books b ON b.id = r.book_id
+            ORDER BY r.book_id
+            ON CONFLICT (book_id) DO UPDATE SET count = book_views.count + EXCLUDED.count;
+            """,
+            (book_ids, [counts[b] for b in book_ids])
+        )
+
+# =====================
+# 🔖 Listening progress
+# =====================
+
+async def save_progress(rows: List[tuple]):
+    """[(user_id, book_id, part_id, unix_ts), ...] ni bitta UPSERT bilan yozadi (oxirgisi ustun)."""
+    if not rows:
+        return
+    # Tartiblangan kalitlar — parallel flushlar orasida deadlock bo'lmasligi uchun
+    rows = sorted(rows, key=lambda r: (r[0], r[1]))
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            """
+            INSERT INTO user_progress (user_id, book_id, part_id, updated_at)
+            SELECT u, b, p, to_timestamp(t)
+            FROM unnest(%s::bigint[], %s::text[], %s::int[], %s::float8[]) AS r(u, b, p, t)
+            WHERE EXISTS (SELECT 1 FROM parts WHERE parts.id = r.p)
+            ON CONFLICT (user_id, book_id) DO UPDATE
+            SET part_id = EXCLUDED.part_id, updated_at = EXCLUDED.updated_at
+            WHERE user_progress.updated_at <= EXCLUDED.updated_at;
+            """,
+            ([r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows], [r[3] for r in rows])
+        )
+
+async def get_continue_part(user_id: int) -> Optional[Dict]:
+    """Oxirgi tinglangan kitobdagi keyingi qism (+ kitob nomi) — bitta so'rov."""
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            """
+            SELECT p.*, b.nomi AS book_nomi
+            FROM (
+                SELECT book_id, part_id FROM user_progress
+                WHERE user_id = %s ORDER BY updated_at DESC LIMIT 1
+            ) up
+            JOIN LATERAL (
+                SELECT * FROM parts WHERE book_id = up.book_id AND id > up.part_id ORDER BY id LIMIT 1
+            ) p ON true
+            JOIN books b ON b.id = up.book_id;
+            """,
+            (user_id,)
+        )
+        row = await cur.fetchone()
+        return dict(row) if row else None
+
+async def get_book_views() -> List[Dict]:
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute("SELECT * FROM book_views ORDER BY count DESC, book_id;")
+        return list(await cur.fetchall())
+
+async def get_book_stats(limit: int) -> List[Dict]:
+    """Eng ko'p ochilgan kitoblar: [{book_id, nomi, views}] — idx_book_views_count bo'yicha."""
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            """
+            SELECT v.book_id, b.nomi, v.count AS views
+            FROM book_views v
+            JOIN books b ON b.id = v.book_id
+            ORDER BY v.count DESC, v.book_id
+            LIMIT %s;
+            """,
+            (limit,)
+        )
+        return list(await cur.fetchall())
@@ -0,0 +1,311 @@
+"""
+Broadcast engine: DB da saqlanadigan, qayta tiklanadigan (resumable) xabar tarqatish.
+
+- Har bir job `broadcast_jobs` jadvalida; foydalanuvchilar users.id bo'yicha
+  keyset sahifalarda olinadi. Checkpoint — tartib bo'yicha uzluksiz yuborib
+  bo'lingan eng katta users.id (workerlar tartibsiz tugatadi); u har yuborishdan
+  keyin yoziladi (bir vaqtda bittadan yozuv), shuning uchun qayta tiklanganda
+  faqat yozilmay qolgan bir nechta foydalanuvchiga qayta yuboriladi.
+- Bir nechta worker parallel yuboradi; umumiy tezlik token bucket bilan,
+  bitta chatga yuborish oralig'i esa PER_CHAT_INTERVAL bilan cheklanadi.
+- RetryAfter (429) kelsa umumiy bucket retry_after ga to'xtatiladi — barcha
+  workerlar kutadi — va xabar qayta yuboriladi; 429 urinish hisoblanmaydi.
+- Har job egasi (owner) bor va HEARTBEAT_INTERVAL da batchlardan mustaqil ravishda
+  lease ni yangilaydi (uzoq RetryAfter kutishlarida ham). Jarayon o'lsa, job
+  STALE_AFTER soniyadan keyin `resume_broadcasts` orqali boshqa instance da davom etadi;
+  lease ni yo'qotgan eski egasi yuborishni to'xtatadi.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Dict, Optional
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+from telegram.ext import ContextTypes
+
+from async_storage import (
+    get_user_ids_after, checkpoint_broadcast_job, claim_stale_broadcast_jobs, renew_broadcast_lease
+)
+from utils import retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+# Telegram: ~30 xabar/soniya umumiy, ~1 xabar/soniya bitta chatga
+GLOBAL_RATE = 25
+GLOBAL_BURST = 25
+PER_CHAT_INTERVAL = 1.0
+WORKERS = 8
+BATCH_SIZE = 200
+MAX_ATTEMPTS = 3
+PROGRESS_INTERVAL = 3.0
+HEARTBEAT_INTERVAL = 20
+# Heartbeat bir necha marta o'tkazib yuborilsa ham (DB uzilishi) sog' job olib qo'yilmasin;
+# flood wait (RetryAfter) heartbeat ga ta'sir qilmaydi, lekin zaxira bilan undan ham katta
+STALE_AFTER = 600
+
+# Shu jarayonning lease identifikatori (bir xostda bir nechta worker ham farqlanadi)
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# job_id -> asyncio.Task (shu jarayonda ishlayotganlar)
+_running: Dict[int, asyncio.Task] = {}
+
+
+class TokenBucket:
+    """Oddiy token bucket: `rate` token/soniya, eng ko'pi `capacity` token."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Flood wait: `seconds` davomida hech kimga token berilmaydi, keyin bucket bo'sh holdan boshlanadi."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    # Kutishdan keyin burst bilan qayta 429 olmaslik uchun
+                    self._tokens = 0
+                    self._updated = time.monotonic()
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class RateLimiter:
+    """Umumiy token bucket + har bir chat uchun minimal oraliq."""
+
+    def __init__(self, rate: float = GLOBAL_RATE, burst: float = GLOBAL_BURST,
+                 per_chat_interval: float = PER_CHAT_INTERVAL):
+        self.bucket = TokenBucket(rate, burst)
+        self.per_chat_interval = per_chat_interval
+        self._last_sent: Dict[int, float] = {}
+
+    async def wait(self, chat_id: int):
+        last = self._last_sent.get(chat_id)
+        if last is not None:
+            delay = self.per_chat_interval - (time.monotonic() - last)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await self.bucket.acquire()
+        self._last_sent[chat_id] = time.monotonic()
+        if len(self._last_sent) > 10_000:
+            cutoff = time.monotonic() - self.per_chat_interval
+            self._last_sent = {k: v for k, v in self._last_sent.items() if v > cutoff}
+
+    def pause(self, seconds: float):
+        self.bucket.pause(seconds)
+
+
+# Barcha joblar uchun umumiy limiter (bot tokeni bitta)
+limiter = RateLimiter()
+
+
+async def _send_one(bot, job: dict, user_id: int) -> bool:
+    attempts = 0
+    while attempts < MAX_ATTEMPTS:
+        await limiter.wait(user_id)
+        try:
+            await bot.copy_message(chat_id=user_id, from_chat_id=job["from_chat_id"], message_id=job["message_id"])
+            return True
+        except RetryAfter as e:
+            # Flood wait butun bot tokeniga tegishli: umumiy limiter ni to'xtatamiz,
+            # urinishlar soniga qo'shilmaydi
+            limiter.pause(retry_after_seconds(e))
+        except (Forbidden, BadRequest):
+            # bloklagan / o'chirilgan akkaunt — qayta urinish foydasiz
+            return False
+        except TelegramError:
+            attempts += 1
+            await asyncio.sleep(1)
+    return False
+
+
+class LeaseLost(Exception):
+    """Job boshqa instance ga o'tib ketgan — yuborishni to'xtatish kerak."""
+
+
+class _Progress:
+    """
+    Checkpoint holati: batch ichida tartib bo'yicha uzluksiz tugagan foydalanuvchilar
+    (last_user_id) va ularning sent/failed soni. Undan keyingi, tartibsiz tugaganlar
+    checkpoint ga kirmaydi — qayta tiklanganda ular (bir nechtasi) qayta yuboriladi.
+    """
+
+    def __init__(self, job: dict):
+        self.job_id = job["id"]
+        self.last_user_id = job["last_user_id"]
+        self.sent = job["sent"]
+        self.failed = job["failed"]
+        self._saved = self.last_user_id
+        self._pending: list = []
+        self._next = 0
+        self._results: Dict[int, bool] = {}
+        self._lock = asyncio.Lock()
+
+    def start_batch(self, batch: list):
+        self._pending, self._next, self._results = batch, 0, {}
+
+    def done(self, user_id: int, ok: bool):
+        self._results[user_id] = ok
+        while self._next < len(self._pending) and self._pending[self._next] in self._results:
+            uid = self._pending[self._next]
+            if self._results.pop(uid):
+                self.sent += 1
+            else:
+                self.failed += 1
+            self.last_user_id = uid
+            self._next += 1
+
+    async def checkpoint(self, status: str = "running", wait: bool = False):
+        # Bir vaqtda bitta yozuv: band bo'lsa keyingi yuborish (yoki batch oxiri) yozadi
+        if self._lock.locked() and not wait:
+            return
+        async with self._lock:
+            if self.last_user_id == self._saved and status == "running":
+                return
+            last_user_id = self.last_user_id
+            if not await checkpoint_broadcast_job(
+                self.job_id, INSTANCE_ID, last_user_id, self.sent, self.failed, status=status
+            ):
+                raise LeaseLost()
+            self._saved = last_user_id
+
+
+async def _worker(bot, job: dict, queue: asyncio.Queue, progress: _Progress):
+    while True:
+        try:
+            user_id = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        progress.done(user_id, await _send_one(bot, job, user_id))
+        await progress.checkpoint()
+
+
+async def _run_workers(bot, job: dict, queue: asyncio.Queue, progress: _Progress):
+    """Workerlardan biri yiqilsa (LeaseLost) qolganlari ham to'xtatiladi."""
+    tasks = [asyncio.create_task(_worker(bot, job, queue, progress)) for _ in range(WORKERS)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _progress_text(job: dict, sent: int, failed: int, done: bool) -> str:
+    head = "✅ Xabar yuborildi!" if done else "⏳ Xabar yuborilmoqda..."
+    return (f"{head}\n\n👥 Umumiy foydalanuvchilar: {job['total']}\n"
+            f"📬 Yuborilganlar: {sent}\n❌ Xatoliklar: {failed}")
+
+
+async def _edit_progress(bot, job: dict, sent: int, failed: int, done: bool = False):
+    if not job.get("progress_message_id"):
+        return
+    markup = None
+    if done:
+        markup = InlineKeyboardMarkup([[
+            InlineKeyboardButton("🏠 Asosiy menyu", callback_data="admin_panel"),
+            InlineKeyboardButton("📨 Yana yuborish", callback_data="admin_broadcast")
+        ]])
+    await limiter.wait(job["admin_chat_id"])
+    try:
+        await bot.edit_message_text(
+            chat_id=job["admin_chat_id"], message_id=job["progress_message_id"],
+            text=_progress_text(job, sent, failed, done), reply_markup=markup
+        )
+    except TelegramError:
+        # "message is not modified" va shu kabilar — progress uchun muhim emas
+        pass
+
+
+async def _heartbeat(job_id: int, task: asyncio.Task):
+    """Lease ni batchlardan mustaqil yangilaydi; yo'qotilsa yuborayotgan task ni to'xtatadi."""
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        try:
+            alive = await renew_broadcast_lease(job_id, INSTANCE_ID)
+        except Exception:
+            # DB vaqtincha ishlamayapti — STALE_AFTER gacha yana urinib ko'ramiz
+            logger.warning("Broadcast job %s heartbeat yozilmadi", job_id, exc_info=True)
+            continue
+        if not alive:
+            logger.warning("Broadcast job %s lease yo'qotildi, yuborish to'xtatiladi", job_id)
+            task.cancel()
+            return
+
+
+async def run_job(bot, job: dict):
+    """Jobni checkpoint dan boshlab oxirigacha yuboradi."""
+    job_id = job["id"]
+    progress = _Progress(job)
+    last_progress = 0.0
+    heartbeat = asyncio.create_task(_heartbeat(job_id, asyncio.current_task()), name=f"broadcast-hb-{job_id}")
+    try:
+        while True:
+            batch = await get_user_ids_after(progress.last_user_id, BATCH_SIZE)
+            if not batch:
+                break
+            progress.start_batch(batch)
+            queue: asyncio.Queue = asyncio.Queue()
+            for uid in batch:
+                queue.put_nowait(uid)
+            await _run_workers(bot, job, queue, progress)
+
+            # Band bo'lgani uchun o'tkazib yuborilgan oxirgi checkpoint
+            await progress.checkpoint(wait=True)
+            if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                await _edit_progress(bot, job, progress.sent, progress.failed)
+                last_progress = time.monotonic()
+
+        await progress.checkpoint(status="done", wait=True)
+        await _edit_progress(bot, job, progress.sent, progress.failed, done=True)
+    except asyncio.CancelledError:
+        # Shutdown yoki lease yo'qotildi: oxirgi checkpoint saqlangan, job keyinroq davom etadi
+        raise
+    except LeaseLost:
+        logger.warning("Broadcast job %s boshqa instance da davom etmoqda", job_id)
+    except Exception:
+        logger.exception("Broadcast job %s to'xtadi", job_id)
+    finally:
+        heartbeat.cancel()
+        _running.pop(job_id, None)
+
+
+def start_job(bot, job: dict) -> Optional[asyncio.Task]:
+    if job["id"] in _running:
+        return None
+    task = asyncio.create_task(run_job(bot, job), name=f"broadcast-{job['id']}")
+    _running[job["id"]] = task
+    return task
+
+
+async def resume_broadcasts(context: ContextTypes.DEFAULT_TYPE):
+    """JobQueue callback: o'lgan jarayonlardan qolgan joblarni davom ettiradi."""
+    for job in await claim_stale_broadcast_jobs(STALE_AFTER, INSTANCE_ID):
+        if job["id"] not in _running:
+            logger.info("Broadcast job %s davom ettirilmoqda (last_user_id=%s)", job["id"], job["last_user_id"])
+            start_job(context.bot, job)
+
+
+async def stop_all():
+    """post_shutdown: ishlayotgan joblarni to'xtatadi (checkpoint dan keyin davom etadi)."""
+    tasks = list(_running.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,202 @@
+"""
+Katalog keshi: kitoblar, qismlar va janrlarning o'zgarmas (immutable) snapshot'i.
+
+Snapshot bot ishga tushganda bir marta yuklanadi va async_storage dagi yozish
+funksiyalari tomonidan bekor qilinadi (invalidate). Keyingi o'qishda u qaytadan
+yuklanadi, shuning uchun oddiy ko'rish (browsing) DB ga murojaat qilmaydi.
+"""
+import asyncio
+import os
+import time
+from bisect import bisect_left, bisect_right
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+# Bir nechta instance ishlaganda boshqa jarayondagi o'zgarishlar shu muddatda ko'rinadi
+CATALOG_TTL = float(os.getenv("CATALOG_TTL", "300"))
+
+
+class Catalog(NamedTuple):
+    books: Tuple[Mapping, ...]
+    books_by_id: Mapping[str, Mapping]
+    parts_by_book: Mapping[str, Tuple[Mapping, ...]]
+    parts_by_id: Mapping[int, Mapping]
+    genres: Tuple[Mapping, ...]
+    books_by_genre: Mapping[int, Tuple[Mapping, ...]]
+    genres_by_book: Mapping[str, Tuple[Mapping, ...]]
+    # Keyset sahifalash uchun tartiblangan kalitlar (ro'yxatlarga parallel)
+    book_keys: Tuple[tuple, ...]
+    genre_book_keys: Mapping[int, Tuple[tuple, ...]]
+    part_keys: Mapping[str, Tuple[int, ...]]
+    loaded_at: float
+
+
+class Page(NamedTuple):
+    items: Tuple[Mapping, ...]
+    offset: int
+    has_prev: bool
+    has_next: bool
+
+
+def book_sort_key(book_id: str) -> tuple:
+    """ORDER BY books.sort_key, id tartibiga mos kalit: raqamlilar avval, qolganlari (NULL) oxirida."""
+    # books.sort_key: CASE WHEN id ~ '^[0-9]{1,18}$' THEN id::bigint END
+    if book_id.isascii() and book_id.isdigit() and len(book_id) <= 18:
+        return (0, int(book_id), book_id)
+    return (1, 0, book_id)
+
+
+def paginate(items: Sequence[Mapping], keys: Sequence[Any], after: Any = None,
+             before: Any = None, limit: int = 20) -> Page:
+    """
+    Keyset sahifa: `after` kalitidan keyingi yoki `before` kalitidan oldingi `limit` ta element.
+    Tartiblangan kalitlar bo'yicha bisect — narxi O(log n + limit).
+    """
+    if before is not None:
+        end = bisect_left(keys, before)
+        start = max(0, end - limit)
+    else:
+        start = bisect_right(keys, after) if after is not None else 0
+        end = min(len(items), start + limit)
+    return Page(tuple(items[start:end]), start, start > 0, end < len(items))
+
+
+_snapshot: Optional[Catalog] = None
+_generation = 0
+_lock = asyncio.Lock()
+_counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _freeze(row: Mapping) -> Mapping:
+    return MappingProxyType(dict(row))
+
+
+def build(books: Iterable[Mapping], parts: Iterable[Mapping],
+          genres: Iterable[Mapping], links: Iterable[Mapping]) -> Catalog:
+    """
+    DB qatorlaridan snapshot quradi.
+    genres — tartiblangan; parts — (book_id, id) bo'yicha; links — book_genres qatorlari.
+    Kitoblar bu yerda book_sort_key bo'yicha saralanadi: SQL dagi id taqqoslashi DB
+    collation iga bog'liq, paginate() ning bisect i esa Python tartibidagi kalitlarni kutadi.
+    """
+    books_t = tuple(sorted((_freeze(b) for b in books), key=lambda b: book_sort_key(b["id"])))
+    books_by_id = {b["id"]: b for b in books_t}
+    genres_t = tuple(_freeze(g) for g in genres)
+
+    parts_by_book: Dict[str, List[Mapping]] = {}
+    for p in parts:
+        parts_by_book.setdefault(p["book_id"], []).append(_freeze(p))
+
+    book_genre_ids: Dict[str, set] = {}
+    genre_book_ids: Dict[int, set] = {}
+    for link in links:
+        book_genre_ids.setdefault(link["book_id"], set()).add(link["genre_id"])
+        genre_book_ids.setdefault(link["genre_id"], set()).add(link["book_id"])
+
+    # Tartibni saqlash uchun asosiy ro'yxatlar bo'ylab yuramiz (books_by_genre ham book_keys tartibida)
+    books_by_genre: Dict[int, List[Mapping]] = {}
+    for b in books_t:
+        for gid in book_genre_ids.get(b["id"], ()):
+            books_by_genre.setdefault(gid, []).append(b)
+    genres_by_book: Dict[str, List[Mapping]] = {}
+    for g in genres_t:
+        for bid in genre_book_ids.get(g["id"], ()):
+            genres_by_book.setdefault(bid, []).append(g)
+
+    books_by_genre_t = {k: tuple(v) for k, v in books_by_genre.items()}
+    parts_by_book_t = {k: tuple(v) for k, v in parts_by_book.items()}
+
+    return Catalog(
+        books=books_t,
+        books_by_id=MappingProxyType(books_by_id),
+        parts_by_book=MappingProxyType(parts_by_book_t),
+        parts_by_id=MappingProxyType({p["id"]: p for ps in parts_by_book_t.values() for p in ps}),
+        genres=genres_t,
+        books_by_genre=MappingProxyType(books_by_genre_t),
+        genres_by_book=MappingProxyType({k: tuple(v) for k, v in genres_by_book.items()}),
+        book_keys=tuple(book_sort_key(b["id"]) for b in books_t),
+        genre_book_keys=MappingProxyType({
+            gid: tuple(book_sort_key(b["id"]) for b in bs) for gid, bs in books_by_genre_t.items()
+        }),
+        part_keys=MappingProxyType({
+            bid: tuple(p["id"] for p in ps) for bid, ps in parts_by_book_t.items()
+        }),
+        loaded_at=time.monotonic(),
+    )
+
+
+def patch_part(book_id: str, part_id: int, **changes):
+    """
+    Bitta qismni joyida yangilaydi (masalan file_id) — butun katalogni qayta yuklamasdan.
+    Yangi snapshot yaratiladi, eski snapshot o'qiyotganlar uchun o'zgarmay qoladi.
+    """
+    patch_parts({part_id: changes})
+
+
+def patch_parts(changes_by_part: Mapping[int, Mapping]):
+    """patch_part ning to'plamli varianti: {part_id: o'zgarishlar} — bitta yangi snapshot."""
+    global _snapshot
+    snap = _snapshot
+    if snap is None:
+        return
+    parts_by_book = dict(snap.parts_by_book)
+    parts_by_id = dict(snap.parts_by_id)
+    touched = set()
+    for part_id, changes in changes_by_part.items():
+        old = parts_by_id.get(part_id)
+        if old is None:
+            continue
+        parts_by_id[part_id] = _freeze({**old, **changes})
+        touched.add(old["book_id"])
+    if not touched:
+        return
+    for book_id in touched:
+        parts_by_book[book_id] = tuple(parts_by_id[p["id"]] for p in parts_by_book.get(book_id, ()))
+    _snapshot = snap._replace(
+        parts_by_book=MappingProxyType(parts_by_book), parts_by_id=MappingProxyType(parts_by_id)
+    )
+
+
+def _fresh(snap: Optional[Catalog]) -> bool:
+    return snap is not None and (time.monotonic() - snap.loaded_at) < CATALOG_TTL
+
+
+async def get(loader: Callable[[], Awaitable[Catalog]]) -> Catalog:
+    """Snapshot ni qaytaradi; yo'q yoki eskirgan bo'lsa loader orqali bir marta yuklaydi."""
+    global _snapshot
+    snap = _snapshot
+    if _fresh(snap):
+        _counters["hits"] += 1
+        return snap
+
+    async with _lock:
+        # Lock kutilayotgan paytda boshqa korutina yuklab bo'lgan bo'lishi mumkin
+        if _fresh(_snapshot):
+            _counters["hits"] += 1
+            return _snapshot
+        _counters["misses"] += 1
+        generation = _generation
+        snap = await loader()
+        # Yuklash paytida invalidate() bo'lgan bo'lsa, eski ma'lumotni saqlamaymiz
+        if generation == _generation:
+            _snapshot = snap
+        return snap
+
+
+def invalidate():
+    """Yozish amallaridan keyin chaqiriladi — keyingi o'qish snapshot ni qayta yuklaydi."""
+    global _snapshot, _generation
+    _snapshot = None
+    _generation += 1
+    _counters["invalidations"] += 1
+
+
+def stats() -> dict:
+    """Monitoring uchun hit/miss hisoblagichlari."""
+    snap = _snapshot
+    return {
+        **_counters,
+        "loaded": snap is not None,
+        "age_seconds": round(time.monotonic() - snap.loaded_at, 1) if snap else None,
+        "books": len(snap.books) if snap else 0,
+    }
@@ -11,3 +11,16 @@ if not BOT_TOKEN:
 ADMINS = [int(s) for s in os.getenv("ADMINS", "").split(",") if s.strip()]
 DEV_USERNAME = os.getenv("DEV_USERNAME")
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME")
+
+# Qismlarning file_id sini oldindan olish uchun yopiq kanal/guruh (bot admin bo'lishi kerak)
+FILE_CACHE_CHAT_ID = os.getenv("FILE_CACHE_CHAT_ID")
+
+# Ishga tushirish rejimi: "polling" (default) yoki "webhook"
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # masalan: https://bot.example.com
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")  # X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("PORT", "8080"))
+BOT_MODE = os.getenv("BOT_MODE", "webhook" if WEBHOOK_URL else "polling").lower()
+
+if BOT_MODE == "webhook" and not (WEBHOOK_URL and WEBHOOK_SECRET):
+    raise ValueError("Webhook mode requires WEBHOOK_URL and WEBHOOK_SECRET in .env")
@@ -0,0 +1,98 @@
+"""
+Qismlarning Telegram file_id sini oldindan aniqlash (warm-up).
+
+t.me havolasi orqali yuborishda Telegram faylni har safar qaytadan oladi.
+Bu job file_id si yo'q qismlarni FILE_CACHE_CHAT_ID ga forward qiladi,
+olingan Audio.file_id ni saqlaydi va forward qilingan xabarni o'chiradi.
+Forwardlar foydalanuvchilarga yuborishlar bilan bitta flood limitini bo'lishadi,
+shuning uchun umumiy broadcaster.limiter orqali kutiladi.
+"""
+import asyncio
+import logging
+import re
+from typing import Optional, Tuple
+
+from telegram.error import RetryAfter, TelegramError
+from telegram.ext import ContextTypes
+
+from config import FILE_CACHE_CHAT_ID
+from async_storage import get_parts_without_file_id, set_part_file_ids
+from broadcaster import limiter
+from utils import retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+LINK_PATTERN = re.compile(r"^https://t\.me/([\w\d_]+)/(\d+)$")
+
+# Forwardlar orasidagi pauza (Telegram flood limitlaridan pastda qolish uchun)
+WARMUP_DELAY = 0.5
+# file_id lar shuncha qismdan keyin DB ga yoziladi
+WARMUP_BATCH = 50
+# Bitta qism uchun RetryAfter dan keyingi qayta urinishlar; oshsa qism keyingi warm-up ga qoladi
+MAX_RETRY_AFTER = 3
+
+
+def parse_part_link(url: str) -> Optional[Tuple[str, int]]:
+    """https://t.me/kanal/123 -> ("@kanal", 123)."""
+    m = LINK_PATTERN.match((url or "").strip())
+    if not m:
+        return None
+    return f"@{m.group(1)}", int(m.group(2))
+
+
+def extract_file_id(message) -> Optional[str]:
+    media = message.audio or message.voice or message.document
+    return media.file_id if media else None
+
+
+async def _resolve(bot, url: str) -> Optional[str]:
+    link = parse_part_link(url)
+    if not link:
+        return None
+    from_chat, message_id = link
+    for _ in range(MAX_RETRY_AFTER + 1):
+        await limiter.wait(FILE_CACHE_CHAT_ID)
+        try:
+            fwd = await bot.forward_message(
+                chat_id=FILE_CACHE_CHAT_ID, from_chat_id=from_chat,
+                message_id=message_id, disable_notification=True
+            )
+            break
+        except RetryAfter as e:
+            # Flood wait butun bot uchun — umumiy limiter orqali hamma kutadi
+            limiter.pause(retry_after_seconds(e))
+    else:
+        logger.warning("file_id warm-up: %s flood limit tufayli o'tkazib yuborildi", url)
+        return None
+    try:
+        await bot.delete_message(chat_id=FILE_CACHE_CHAT_ID, message_id=fwd.message_id)
+    except TelegramError:
+        pass
+    return extract_file_id(fwd)
+
+
+async def warm_file_ids(context: ContextTypes.DEFAULT_TYPE):
+    """JobQueue callback: file_id si yo'q barcha qismlar uchun file_id ni aniqlaydi."""
+    if not FILE_CACHE_CHAT_ID:
+        return
+
+    parts = await get_parts_without_file_id()
+    if not parts:
+        return
+    logger.info("file_id warm-up: %d ta qism", len(parts))
+
+    found = []
+    for part in parts:
+        try:
+            file_id = await _resolve(context.bot, part["audio_url"])
+        except TelegramError as e:
+            logger.warning("file_id warm-up: part %s (%s): %s", part["id"], part["audio_url"], e)
+            file_id = None
+        if file_id:
+            found.append((part["id"], file_id))
+        if len(found) >= WARMUP_BATCH:
+            await set_part_file_ids(found)
+            found = []
+        await asyncio.sleep(WARMUP_DELAY)
+
+    await set_part_file_ids(found)
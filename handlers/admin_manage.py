@@ -35,7 +35,7 @@ async def receive_admin_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ASK_NEW_ADMIN_ID
 
     user_id = user_input
-    admins = load_admins()
+    admins = await load_admins()
     if user_id in admins:
         await update.message.reply_text("⚠️ Bu foydalanuvchi allaqachon admin.", reply_markup=BACK_HOME_KB)
         return ASK_NEW_ADMIN_ID
@@ -44,7 +44,7 @@ async def receive_admin_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "id": int(user_id),
         "name": update.message.from_user.full_name
     }
-    save_admins(admins)
+    await save_admins(admins)
 
     await update.message.reply_text("✅ Yangi admin muvaffaqiyatli qo‘shildi!", reply_markup=BACK_HOME_KB)
     return ConversationHandler.END
@@ -54,7 +54,7 @@ async def receive_admin_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def delete_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    admins = load_admins()
+    admins = await load_admins()
     user_id = str(query.from_user.id)
 
     keyboard = []
@@ -81,12 +81,12 @@ async def remove_admin_confirm(update: Update, context: ContextTypes.DEFAULT_TYP
     query = update.callback_query
     await query.answer()
     admin_id = query.data.replace("remove_admin_", "")
-    admins = load_admins()
+    admins = await load_admins()
 
     if admin_id not in admins:
         await query.edit_message_text("❌ Admin topilmadi.", reply_markup=BACK_HOME_KB)
         return
 
     del admins[admin_id]
-    save_admins(admins)
+    await save_admins(admins)
     await query.edit_message_text("✅ Admin muvaffaqiyatli o‘chirildi.", reply_markup=BACK_HOME_KB)
@@ -12,7 +12,7 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if query:
         await query.answer()
 
-    if not is_admin(user_id):
+    if not await is_admin(user_id):
         text = "⛔ Sizda bu bo‘limga kirish huquqi yo‘q."
         if query:
             await query.edit_message_text(text)
@@ -1,6 +1,8 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, CallbackQueryHandler, filters
-from storage import get_books, get_book, update_book_title
+from async_storage import get_books_page, get_book, update_book_title
+from keyboards import PAGE_SIZE, paged_keyboard, parse_cursor
+from state_store import store
 
 RENAME_SELECT_BOOK = 820
 RENAME_ASK_TITLE = 821
@@ -11,15 +13,19 @@ async def start_rename_book(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    books = get_books()
-    if not books:
+    _, after_id, before_id = parse_cursor(query.data)
+    page = await get_books_page(after_id, before_id, PAGE_SIZE)
+    if not page.items:
         await query.edit_message_text(
             "📚 Hozircha hech qanday kitob mavjud emas.",
             reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🏠 Admin panel", callback_data="admin_panel")]])
         )
         return ConversationHandler.END
 
-    keyboard = [[InlineKeyboardButton(b["nomi"], callback_data=f"renamebook_{b['id']}")] for b in books]
+    keyboard = paged_keyboard(
+        page, lambda i, b: InlineKeyboardButton(b["nomi"], callback_data=f"renamebook_{b['id']}"),
+        "admin_rename_book", columns=1
+    )
     keyboard.append([InlineKeyboardButton("🏠 Admin panel", callback_data="admin_panel")])
 
     await query.edit_message_text(
@@ -35,9 +41,9 @@ async def pick_book_then_ask_title(update: Update, context: ContextTypes.DEFAULT
     await query.answer()
 
     book_id = query.data.replace("renamebook_", "")
-    context.user_data["rename_book_id"] = book_id
+    await store.set(query.from_user.id, "rename_book", book_id)
 
-    book = get_book(book_id)
+    book = await get_book(book_id)
     old = book["nomi"] if book else "—"
 
     keyboard = [[
@@ -59,7 +65,7 @@ async def receive_new_title(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Nomi bo‘sh bo‘lmasin. Qayta yuboring.")
         return RENAME_ASK_TITLE
 
-    book_id = context.user_data.get("rename_book_id")
+    book_id = await store.get(update.effective_user.id, "rename_book")
     if not book_id:
         await update.message.reply_text(
             "❌ Xatolik: Kitob aniqlanmadi.",
@@ -67,8 +73,8 @@ async def receive_new_title(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return ConversationHandler.END
 
-    update_book_title(book_id, new_title)
-    context.user_data.pop("rename_book_id", None)
+    await update_book_title(book_id, new_title)
+    await store.delete(update.effective_user.id, "rename_book")
 
     keyboard = [[InlineKeyboardButton("🏠 Admin panel", callback_data="admin_panel")]]
     await update.message.reply_text("✅ Kitob nomi yangilandi.", reply_markup=InlineKeyboardMarkup(keyboard))
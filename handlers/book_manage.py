@@ -1,13 +1,30 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
+import html
 import re
+from typing import List, Tuple
 
-from storage import (
-    get_books, add_book, get_parts, add_part, delete_part_by_index,
-    delete_book, get_genres, set_book_genres, get_next_book_id
+from async_storage import (
+    get_books_page, create_book, get_parts, get_parts_page, get_part, add_parts, delete_part,
+    delete_book, get_genres
 )
+from keyboards import (
+    PAGE_SIZE, paged_keyboard, parse_cursor, toggle_keyboard, remember_markup, schedule_markup_edit,
+    get_draft
+)
+from state_store import store
 
 TELEGRAM_LINK_PATTERN = re.compile(r"^https://t\.me/[\w\d_]+/\d+$")
+# Oraliq: https://t.me/kanal/35-120 -> 35..120 xabarlar
+TELEGRAM_RANGE_PATTERN = re.compile(r"^(https://t\.me/[\w\d_]+/)(\d+)-(\d+)$")
+# Bitta xabardan qo'shiladigan qismlar chegarasi (xato oraliqdan himoya)
+MAX_LINKS_PER_MESSAGE = 500
+
+PARTS_FORMAT_HINT = (
+    "Har qatorda bitta havola yoki oraliq:\n"
+    "<code>https://t.me/kanal/123</code>\n"
+    "<code>https://t.me/kanal/35-120</code>"
+)
 
 # States
 ADD_BOOK_NAME, SELECT_BOOK_GENRES, ADD_BOOK_PARTS = range(3)
@@ -15,9 +32,51 @@ ADD_PART_SELECT_BOOK, ADD_PART_URL = range(100, 102)
 DELETE_PART_SELECT_BOOK, DELETE_PART_SELECT, CONFIRM_DELETE_PART = range(200, 203)
 ASK_BOOK_DELETE, CONFIRM_BOOK_DELETE = range(300, 302)
 
-# Temp storage
-TEMP_BOOK = {}  # user_id -> {'title':..., 'genres': set([...]), 'book_id': '...'}
-TEMP_ADD_PART = {}
+# Vaqtinchalik holat state_store da (owner = user_id):
+#   "add_book"    -> {'title':..., 'genres': set([...]), 'book_id': '...'}
+#   "add_part"    -> book_id
+#   "delete_part" -> {'book_id':..., 'part_id':...}
+#   "delete_book" -> book_id
+
+
+def parse_part_links(text: str) -> Tuple[List[str], List[str]]:
+    """
+    Xabardagi havolalarni ajratadi (qator/bo'shliq bilan ajratilgan, oraliqlar ochiladi).
+    (havolalar, noto'g'ri bo'laklar) qaytaradi.
+    """
+    urls, bad = [], []
+    for token in text.split():
+        m = TELEGRAM_RANGE_PATTERN.match(token)
+        if m:
+            prefix, start, end = m.group(1), int(m.group(2)), int(m.group(3))
+            if start > end or end - start + 1 > MAX_LINKS_PER_MESSAGE:
+                bad.append(token)
+                continue
+            urls.extend(f"{prefix}{n}" for n in range(start, end + 1))
+        elif TELEGRAM_LINK_PATTERN.match(token):
+            urls.append(token)
+        else:
+            bad.append(token)
+    return urls, bad
+
+
+async def _reject_part_links(message, urls: List[str], bad: List[str], keyboard) -> bool:
+    """Xato bo'lsa foydalanuvchiga aytadi va True qaytaradi (hech narsa qo'shilmaydi)."""
+    if bad:
+        shown = "\n".join(f"<code>{html.escape(b)}</code>" for b in bad[:5])
+        error = f"❌ Noto‘g‘ri havola(lar):\n{shown}"
+    elif not urls:
+        error = "❌ Havola topilmadi."
+    elif len(urls) > MAX_LINKS_PER_MESSAGE:
+        error = f"❌ Bitta xabarda ko‘pi bilan {MAX_LINKS_PER_MESSAGE} ta qism qo‘shish mumkin."
+    else:
+        return False
+    await message.reply_text(
+        f"{error}\n\n{PARTS_FORMAT_HINT}",
+        parse_mode="HTML",
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+    return True
 
 
 # ==================== KITOB QO‘SHISH ====================
@@ -38,9 +97,9 @@ async def ask_book_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def receive_book_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     title = (update.message.text or "").strip()
-    TEMP_BOOK[update.effective_user.id] = {"title": title, "genres": set()}
+    await store.set(update.effective_user.id, "add_book", {"title": title, "genres": set()})
     # Janrlar ro'yxatini chiqaramiz (multi-select)
-    genres = get_genres()
+    genres = await get_genres()
     if not genres:
         await update.message.reply_text(
             f"✅ <b>{title}</b> qabul qilindi.\nHozircha janr yo‘q. To‘g‘ridan-to‘g‘ri qismlar kiriting:\n"
@@ -54,30 +113,30 @@ async def receive_book_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ADD_BOOK_PARTS
 
     # Multi-select
-    kb = []
-    row = []
-    for g in genres:
-        row.append(InlineKeyboardButton(f"▫️ {g['nomi']}", callback_data=f"toggle_genre_{g['id']}"))
-        if len(row) == 2:
-            kb.append(row);
-            row = []
-    if row: kb.append(row)
-    kb.append([InlineKeyboardButton("✅ Tugatdim (janrlar)", callback_data="genres_done")])
-    kb.append([InlineKeyboardButton("❌ Bekor qilish", callback_data="cancel_add_book")])
-
-    await update.message.reply_text(
+    markup = _book_genres_keyboard(genres, set())
+    sent = await update.message.reply_text(
         f"📌 <b>{title}</b> — janr(lar)ni tanlang (bir nechtasini tanlashingiz mumkin):",
         parse_mode="HTML",
-        reply_markup=InlineKeyboardMarkup(kb)
+        reply_markup=markup
     )
+    remember_markup(sent.chat_id, sent.message_id, markup)
     return SELECT_BOOK_GENRES
 
 
+def _book_genres_keyboard(genres, selected) -> InlineKeyboardMarkup:
+    return toggle_keyboard(genres, selected, "toggle_genre_", [
+        [InlineKeyboardButton("✅ Tugatdim (janrlar)", callback_data="genres_done")],
+        [InlineKeyboardButton("❌ Bekor qilish", callback_data="cancel_add_book")],
+    ])
+
+
 async def toggle_select_genre(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     user_id = query.from_user.id
-    data = TEMP_BOOK.get(user_id)
+    chat_id, message_id = query.message.chat_id, query.message.message_id
+    # Debounce oynasida tanlov xotirada — har bosishda DB ga murojaat yo'q
+    data = get_draft(chat_id, message_id) or await store.get(user_id, "add_book")
     if not data:
         await query.edit_message_text("❌ Holat topilmadi.")
         return ConversationHandler.END
@@ -88,24 +147,10 @@ async def toggle_select_genre(update: Update, context: ContextTypes.DEFAULT_TYPE
     else:
         data["genres"].add(gid)
 
-    # Qayta chizamiz
-    genres = get_genres()
-    kb = []
-    row = []
-    for g in genres:
-        marker = "✅" if g["id"] in data["genres"] else "▫️"
-        row.append(InlineKeyboardButton(f"{marker} {g['nomi']}", callback_data=f"toggle_genre_{g['id']}"))
-        if len(row) == 2:
-            kb.append(row);
-            row = []
-    if row: kb.append(row)
-    kb.append([InlineKeyboardButton("✅ Tugatdim (janrlar)", callback_data="genres_done")])
-    kb.append([InlineKeyboardButton("❌ Bekor qilish", callback_data="cancel_add_book")])
-
-    await query.edit_message_text(
-        "🏷 Tanlangan janrlar:",
-        reply_markup=InlineKeyboardMarkup(kb)
-    )
+    # Qayta chizish va holatni yozish kechiktiriladi: tez bosishlar bitta tahrir va bitta yozuvga birlashadi
+    markup = _book_genres_keyboard(await get_genres(), data["genres"])
+    schedule_markup_edit(context.bot, chat_id, message_id, markup,
+                         draft=data, persist=lambda: store.set(user_id, "add_book", data))
 
 
 async def genres_done_then_parts(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -117,7 +162,7 @@ async def genres_done_then_parts(update: Update, context: ContextTypes.DEFAULT_T
         [InlineKeyboardButton("🏠 Asosiy menyu", callback_data="admin_panel")],
     ]
     await query.edit_message_text(
-        "🎧 Endi qismlar havolasini yuboring (har birini alohida xabar bilan):\n<code>https://t.me/kanal/123</code>",
+        f"🎧 Endi qismlar havolalarini yuboring (bir xabarda bir nechtasini ham).\n{PARTS_FORMAT_HINT}",
         parse_mode="HTML",
         reply_markup=InlineKeyboardMarkup(keyboard)
     )
@@ -132,32 +177,24 @@ async def receive_book_part(update: Update, context: ContextTypes.DEFAULT_TYPE):
         [InlineKeyboardButton("🔙 Ortga", callback_data="admin_add_book")],
         [InlineKeyboardButton("🏠 Asosiy menyu", callback_data="admin_panel")],
     ]
-    if not TELEGRAM_LINK_PATTERN.match(text):
-        await update.message.reply_text(
-            "❌ Noto‘g‘ri format.\n<code>https://t.me/kanal/123</code>",
-            parse_mode="HTML",
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
+    urls, bad = parse_part_links(text)
+    if await _reject_part_links(update.message, urls, bad, keyboard):
         return ADD_BOOK_PARTS
 
-    # DBga yozish: agar hali kitob yaratilmagan bo'lsa, avval uni yaratamiz
-    data = TEMP_BOOK.get(user_id)
+    data = await store.get(user_id, "add_book")
+    if not data:
+        await update.message.reply_text("❌ Holat topilmadi.")
+        return ConversationHandler.END
     if "book_id" not in data:
-        book_id = get_next_book_id()
-        add_book(book_id, data["title"])
-        # janr bog'lash
-        if data["genres"]:
-            set_book_genres(book_id, list(data["genres"]))
-        data["book_id"] = book_id
-
-    book_id = data["book_id"]
-    # navbatdagi qism nomi
-    parts = get_parts(book_id)
-    part_name = f"{len(parts) + 1}-qism"
-    add_part(book_id, part_name, text)
+        # Birinchi xabar: kitob + janrlar + qismlar bitta tranzaksiyada yaratiladi
+        data["book_id"] = await create_book(data["title"], list(data["genres"]), urls)
+        await store.set(user_id, "add_book", data)
+        total = len(urls)
+    else:
+        total = await add_parts(data["book_id"], urls)
 
     await update.message.reply_text(
-        f"🎧 Qism qo‘shildi. Jami: {len(parts) + 1}",
+        f"🎧 {len(urls)} ta qism qo‘shildi. Jami: {total}",
         reply_markup=InlineKeyboardMarkup(keyboard)
     )
     return ADD_BOOK_PARTS
@@ -167,7 +204,7 @@ async def finish_add_book(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     user_id = query.from_user.id
-    TEMP_BOOK.pop(user_id, None)  # tozalash
+    await store.delete(user_id, "add_book")  # tozalash
 
     keyboard = [[InlineKeyboardButton("🏠 Asosiy menyu", callback_data="admin_panel")]]
     await query.edit_message_text(
@@ -180,7 +217,7 @@ async def finish_add_book(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def cancel_add_book(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    TEMP_BOOK.pop(query.from_user.id, None)
+    await store.delete(query.from_user.id, "add_book")
     await query.edit_message_text(
         "❌ Kitob qo‘shish bekor qilindi.",
         reply_markup=InlineKeyboardMarkup([
@@ -196,22 +233,16 @@ async def start_add_part(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Mavjud kitobni tanlash — 2 ustun."""
     query = update.callback_query
     await query.answer()
-    books = get_books()
-    if not books:
+    _, after_id, before_id = parse_cursor(query.data)
+    page = await get_books_page(after_id, before_id, PAGE_SIZE)
+    if not page.items:
         await query.edit_message_text("📚 Hech qanday kitob mavjud emas.")
         return ConversationHandler.END
 
     # 2 ustunli klaviatura
-    keyboard = []
-    row = []
-    for b in books:
-        row.append(InlineKeyboardButton(b["nomi"], callback_data=f"addpart_{b['id']}"))
-        if len(row) == 2:
-            keyboard.append(row)
-            row = []
-    if row:
-        keyboard.append(row)
-
+    keyboard = paged_keyboard(
+        page, lambda i, b: InlineKeyboardButton(b["nomi"], callback_data=f"addpart_{b['id']}"), "admin_add_part"
+    )
     keyboard.append([InlineKeyboardButton("🔙 Ortga", callback_data="admin_panel")])
 
     await query.edit_message_text(
@@ -225,13 +256,13 @@ async def select_book_for_part_add(update: Update, context: ContextTypes.DEFAULT
     query = update.callback_query
     await query.answer()
     book_id = query.data.replace("addpart_", "")
-    TEMP_ADD_PART[query.from_user.id] = book_id
+    await store.set(query.from_user.id, "add_part", book_id)
     keyboard = [
         [InlineKeyboardButton("🏁 Tugatish", callback_data="cancel_add_part")],
         [InlineKeyboardButton("🔙 Ortga", callback_data="admin_add_part")]
     ]
     await query.edit_message_text(
-        "🎧 Qism havolasini yuboring:\n<code>https://t.me/kanal/123</code>",
+        f"🎧 Qism havolalarini yuboring.\n{PARTS_FORMAT_HINT}",
         parse_mode="HTML",
         reply_markup=InlineKeyboardMarkup(keyboard)
     )
@@ -246,21 +277,18 @@ async def receive_part_url(update: Update, context: ContextTypes.DEFAULT_TYPE):
         [InlineKeyboardButton("🔙 Ortga", callback_data="admin_add_part")]
     ]
 
-    if not TELEGRAM_LINK_PATTERN.match(text):
-        await update.message.reply_text(
-            "❌ Noto‘g‘ri havola. <code>https://t.me/kanal/123</code>",
-            parse_mode="HTML",
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
+    urls, bad = parse_part_links(text)
+    if await _reject_part_links(update.message, urls, bad, keyboard):
         return ADD_PART_URL
 
-    book_id = TEMP_ADD_PART[user_id]
-    parts = get_parts(book_id)
-    part_name = f"{len(parts) + 1}-qism"
-    add_part(book_id, part_name, text)
+    book_id = await store.get(user_id, "add_part")
+    if book_id is None:
+        await update.message.reply_text("❌ Holat topilmadi.")
+        return ConversationHandler.END
+    total = await add_parts(book_id, urls)
 
     await update.message.reply_text(
-        "✅ Qism qo‘shildi.",
+        f"✅ {len(urls)} ta qism qo‘shildi. Jami: {total}",
         reply_markup=InlineKeyboardMarkup(keyboard)
     )
     return ADD_PART_URL
@@ -269,7 +297,7 @@ async def receive_part_url(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def cancel_add_part(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    TEMP_ADD_PART.pop(query.from_user.id, None)
+    await store.delete(query.from_user.id, "add_part")
     await query.edit_message_text(
         "✔️ Qism qo‘shish yakunlandi.",
         reply_markup=InlineKeyboardMarkup([
@@ -284,9 +312,10 @@ async def cancel_add_part(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def start_delete_part(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    context.user_data.clear()
-    books = get_books()
-    if not books:
+    await store.delete(query.from_user.id, "delete_part")
+    _, after_id, before_id = parse_cursor(query.data)
+    page = await get_books_page(after_id, before_id, PAGE_SIZE)
+    if not page.items:
         await query.edit_message_text(
             "📚 Hali hech qanday kitob mavjud emas.",
             reply_markup=InlineKeyboardMarkup([
@@ -295,7 +324,10 @@ async def start_delete_part(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return ConversationHandler.END
 
-    keyboard = [[InlineKeyboardButton(b["nomi"], callback_data=f"delpartbook_{b['id']}")] for b in books]
+    keyboard = paged_keyboard(
+        page, lambda i, b: InlineKeyboardButton(b["nomi"], callback_data=f"delpartbook_{b['id']}"),
+        "admin_delete_part", columns=1
+    )
     keyboard.append([InlineKeyboardButton("🏠 Admin panel", callback_data="admin_panel")])
 
     await query.edit_message_text(
@@ -308,10 +340,16 @@ async def start_delete_part(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def select_part_to_delete(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    book_id = query.data.replace("delpartbook_", "")
-    context.user_data["delete_book_id"] = book_id
-    parts = get_parts(book_id)
-    if not parts:
+    prefix, after_id, before_id = parse_cursor(query.data)
+    book_id = prefix.replace("delpartbook_", "")
+    await store.set(query.from_user.id, "delete_part", {"book_id": book_id})
+    page = await get_parts_page(
+        book_id,
+        int(after_id) if after_id else None,
+        int(before_id) if before_id else None,
+        PAGE_SIZE
+    )
+    if not page.items:
         await query.edit_message_text(
             "📭 Bu kitobda hech qanday qism yo‘q.",
             reply_markup=InlineKeyboardMarkup([
@@ -321,7 +359,10 @@ async def select_part_to_delete(update: Update, context: ContextTypes.DEFAULT_TY
         )
         return ConversationHandler.END
 
-    keyboard = [[InlineKeyboardButton(p["nomi"], callback_data=f"delpart_{i}")] for i, p in enumerate(parts)]
+    keyboard = paged_keyboard(
+        page, lambda i, p: InlineKeyboardButton(p["nomi"], callback_data=f"delpartid_{p['id']}"),
+        prefix, columns=1
+    )
     keyboard.append([
         InlineKeyboardButton("🔙 Ortga", callback_data="admin_delete_part"),
         InlineKeyboardButton("🏠 Admin panel", callback_data="admin_panel")
@@ -337,15 +378,29 @@ async def select_part_to_delete(update: Update, context: ContextTypes.DEFAULT_TY
 async def confirm_delete_part(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    index = int(query.data.replace("delpart_", ""))
-    context.user_data["delete_part_index"] = index
+    data = await store.get(query.from_user.id, "delete_part") or {}
+    if query.data.startswith("delpartid_"):
+        part = await get_part(int(query.data.replace("delpartid_", "")))
+    else:
+        # Eski tugmalar: delpart_{index} — kitob qismlari ro'yxatidagi o'rin
+        parts = await get_parts(data.get("book_id", ""))
+        index = int(query.data.replace("delpart_", ""))
+        part = parts[index] if 0 <= index < len(parts) else None
+    if not part:
+        await query.edit_message_text(
+            "❌ Qism topilmadi (ehtimol allaqachon o‘chirilgan).",
+            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Ortga", callback_data="admin_delete_part")]])
+        )
+        return ConversationHandler.END
+    data.update(book_id=part["book_id"], part_id=part["id"])
+    await store.set(query.from_user.id, "delete_part", data)
     keyboard = [
         [InlineKeyboardButton("✅ Ha, o‘chirilsin", callback_data="confirm_delete_part")],
         [InlineKeyboardButton("🔙 Ortga", callback_data="admin_delete_part")],
         [InlineKeyboardButton("🏠 Admin panel", callback_data="admin_panel")]
     ]
     await query.edit_message_text(
-        f"⚠️ {index + 1}-qism o‘chirilsinmi?",
+        f"⚠️ «{part['nomi']}» o‘chirilsinmi?",
         reply_markup=InlineKeyboardMarkup(keyboard)
     )
     return CONFIRM_DELETE_PART
@@ -354,13 +409,13 @@ async def confirm_delete_part(update: Update, context: ContextTypes.DEFAULT_TYPE
 async def really_delete_part(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    book_id = context.user_data.get("delete_book_id")
-    index = context.user_data.get("delete_part_index")
-    if book_id is None or index is None:
+    data = await store.pop(query.from_user.id, "delete_part") or {}
+    part_id = data.get("part_id")
+    if part_id is None:
         await query.edit_message_text("❌ Xatolik.")
         return ConversationHandler.END
 
-    delete_part_by_index(book_id, index)
+    await delete_part(part_id)
 
     await query.edit_message_text(
         "✅ Qism o‘chirildi.",
@@ -379,8 +434,9 @@ async def admin_list_books(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     query = update.callback_query
     await query.answer()
-    books = get_books()
-    if not books:
+    _, after_id, before_id = parse_cursor(query.data)
+    page = await get_books_page(after_id, before_id, PAGE_SIZE)
+    if not page.items:
         await query.edit_message_text(
             "📚 Hozircha hech qanday kitob mavjud emas.",
             reply_markup=InlineKeyboardMarkup([
@@ -391,16 +447,10 @@ async def admin_list_books(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
 
     # 2 ustunli klaviatura
-    keyboard = []
-    row = []
-    for b in books:
-        row.append(InlineKeyboardButton(b["nomi"], callback_data=f"deletebook_{b['id']}"))
-        if len(row) == 2:
-            keyboard.append(row)
-            row = []
-    if row:
-        keyboard.append(row)
-
+    keyboard = paged_keyboard(
+        page, lambda i, b: InlineKeyboardButton(b["nomi"], callback_data=f"deletebook_{b['id']}"),
+        "admin_list_books"
+    )
     keyboard.append([InlineKeyboardButton("🔙 Ortga", callback_data="admin_panel")])
 
     await query.edit_message_text(
@@ -414,7 +464,7 @@ async def ask_confirm_book_delete(update: Update, context: ContextTypes.DEFAULT_
     query = update.callback_query
     await query.answer()
     book_id = query.data.replace("deletebook_", "")
-    context.user_data["delete_book_id"] = book_id
+    await store.set(query.from_user.id, "delete_book", book_id)
     keyboard = [
         [InlineKeyboardButton("✅ Ha, o‘chirish", callback_data="confirm_delete_book")],
         [InlineKeyboardButton("❌ Bekor qilish", callback_data="admin_panel")]
@@ -429,12 +479,12 @@ async def ask_confirm_book_delete(update: Update, context: ContextTypes.DEFAULT_
 async def confirm_book_delete(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    book_id = context.user_data.get("delete_book_id")
+    book_id = await store.pop(query.from_user.id, "delete_book")
     if not book_id:
         await query.edit_message_text("❌ Xatolik yuz berdi.")
         return ConversationHandler.END
 
-    delete_book(book_id)
+    await delete_book(book_id)
 
     keyboard = [
         [InlineKeyboardButton("🔙 Ortga", callback_data="admin_list_books")],
@@ -0,0 +1,44 @@
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes, ConversationHandler
+from async_storage import search_books
+
+ASK_SEARCH_QUERY = 900
+SEARCH_LIMIT = 10
+# So'rov kutilayotgan holat shuncha soniyadan keyin o'z-o'zidan yakunlanadi
+SEARCH_TIMEOUT = 300
+
+
+# 🔎 Qidiruvni boshlash
+async def ask_search_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # /search <so'rov> — darhol natija
+    if update.message and context.args:
+        await _reply_results(update.message, " ".join(context.args))
+        return ConversationHandler.END
+
+    keyboard = [[InlineKeyboardButton("🏠 Asosiy menyu", callback_data="home")]]
+    text = "🔎 Kitob nomini (yoki uning bir qismini) yozib yuboring:"
+    if update.callback_query:
+        await update.callback_query.answer()
+        await update.callback_query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
+    else:
+        await update.message.reply_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
+    return ASK_SEARCH_QUERY
+
+
+# 📚 Natijalar
+async def receive_search_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await _reply_results(update.message, (update.message.text or "").strip())
+    return ConversationHandler.END
+
+
+async def _reply_results(message, text: str):
+    books = await search_books(text, SEARCH_LIMIT)
+    keyboard = [[InlineKeyboardButton(b["nomi"], callback_data=f"book_{b['id']}")] for b in books]
+    keyboard.append([
+        InlineKeyboardButton("🔎 Yana qidirish", callback_data="search"),
+        InlineKeyboardButton("🏠 Asosiy menyu", callback_data="home"),
+    ])
+    await message.reply_text(
+        f"🔎 «{text}» bo‘yicha topilgan kitoblar:" if books else f"😕 «{text}» bo‘yicha hech narsa topilmadi.",
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
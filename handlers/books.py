@@ -1,15 +1,37 @@
+import asyncio
+import logging
+from typing import Dict
+
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import BadRequest, Forbidden, RetryAfter
 from telegram.ext import ContextTypes
-from storage import get_books, get_parts, get_book, increment_book_view
+from async_storage import (
+    get_books_page, get_parts_page, get_parts, get_part, get_next_parts, get_book, set_part_file_id
+)
+from broadcaster import limiter
+from file_cache import extract_file_id
+from utils import edit_or_reply, retry_after_seconds
+from view_counter import record_view
+from progress import record_progress
+from keyboards import PAGE_SIZE, paged_keyboard, parse_cursor
+
+logger = logging.getLogger(__name__)
+
+# "Keyingi N ta qism" tugmasi bir bosishda yuboradigan qismlar soni
+PLAY_BATCH = 5
 
+# chat_id -> navbatdagi qismlarni yuborayotgan task (bitta chatga bittadan)
+_playing: Dict[int, asyncio.Task] = {}
 
-# 📚 Barcha kitoblar ro'yxati (qismlari bo'lmasa ham ko'rsatiladi)
+
+# 📚 Barcha kitoblar ro'yxati (qismlari bo'lmasa ham ko'rsatiladi) — sahifalab
 async def show_books(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    books = get_books()  # <- faqat books jadvalidan
-    if not books:
+    _, after_id, before_id = parse_cursor(query.data)
+    page = await get_books_page(after_id, before_id, PAGE_SIZE)  # <- faqat books jadvalidan
+    if not page.items:
         keyboard = [[
             InlineKeyboardButton("🏠 Asosiy sahifa", callback_data="home"),
         ]]
@@ -19,16 +41,9 @@ async def show_books(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    keyboard = []
-    row = []
-    for b in books:
-        row.append(InlineKeyboardButton(b["nomi"], callback_data=f"book_{b['id']}"))
-        if len(row) == 2:
-            keyboard.append(row)
-            row = []
-    if row:
-        keyboard.append(row)
-
+    keyboard = paged_keyboard(
+        page, lambda i, b: InlineKeyboardButton(b["nomi"], callback_data=f"book_{b['id']}"), "books"
+    )
     keyboard.append([
         InlineKeyboardButton("🔙 Ortga", callback_data="home"),
         InlineKeyboardButton("🏠 Asosiy sahifa", callback_data="home"),
@@ -40,27 +55,34 @@ async def show_books(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
-# 🎧 Tanlangan kitob qismlari (bo'lmasa xabar chiqadi)
+# 🎧 Tanlangan kitob qismlari (bo'lmasa xabar chiqadi) — sahifalab
 async def show_book_parts(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
-    _, book_id = query.data.split("_", 1)
-
-    # Statistikani kitob ochilganda ham yuritamiz
-    book = get_book(book_id)
-    if book:
-        increment_book_view(book["nomi"])
-
-    parts = get_parts(book_id)
+    prefix, after_id, before_id = parse_cursor(query.data)
+    _, book_id = prefix.split("_", 1)
+
+    # Statistikani kitob ochilganda ham yuritamiz (sahifa almashtirish hisoblanmaydi)
+    if after_id is None and before_id is None:
+        if await get_book(book_id):
+            record_view(book_id)
+
+    page = await get_parts_page(
+        book_id,
+        int(after_id) if after_id else None,
+        int(before_id) if before_id else None,
+        PAGE_SIZE
+    )
 
     # Qismlar yo'q bo'lsa — foydalanuvchiga xabar
-    if not parts:
+    if not page.items:
         keyboard = [
             [
                 InlineKeyboardButton("🔙 Ortga", callback_data="books"),
                 InlineKeyboardButton("🏠 Asosiy sahifa", callback_data="home"),
             ]
         ]
-        await query.edit_message_text(
+        await edit_or_reply(
+            query,
             "ℹ️ Bu kitob uchun hozircha qismlar yuklanmagan.\n"
             "Yaqinda qo‘shiladi.",
             reply_markup=InlineKeyboardMarkup(keyboard)
@@ -68,57 +90,141 @@ async def show_book_parts(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # Qismlar mavjud — menyuni chiqaramiz
-    keyboard = []
-    row = []
-    for i, p in enumerate(parts):
-        row.append(InlineKeyboardButton(p["nomi"], callback_data=f"part_{book_id}_{i}"))
-        if len(row) == 2:
-            keyboard.append(row)
-            row = []
-    if row:
-        keyboard.append(row)
-
+    keyboard = paged_keyboard(
+        page, lambda i, p: InlineKeyboardButton(p["nomi"], callback_data=f"part_{p['id']}"), prefix
+    )
     keyboard.append([
         InlineKeyboardButton("🔙 Ortga", callback_data="books"),
         InlineKeyboardButton("🏠 Asosiy sahifa", callback_data="home"),
     ])
 
-    await query.edit_message_text(
+    await edit_or_reply(
+        query,
         f"🎧 Qismlar ro‘yxati:",
         reply_markup=InlineKeyboardMarkup(keyboard)
     )
 
 
+def _part_keyboard(part: dict, has_next: bool) -> InlineKeyboardMarkup:
+    """Audio caption ostidagi tugmalar: keyingi qism(lar) va orqaga."""
+    keyboard = []
+    if has_next:
+        keyboard.append([
+            InlineKeyboardButton("⏭ Keyingi qism", callback_data=f"playnext_{part['id']}_1"),
+            InlineKeyboardButton(f"⏬ Keyingi {PLAY_BATCH} ta", callback_data=f"playnext_{part['id']}_{PLAY_BATCH}"),
+        ])
+    keyboard.append([
+        InlineKeyboardButton("🔙 Ortga", callback_data=f"book_{part['book_id']}"),
+        InlineKeyboardButton("🏠 Asosiy sahifa", callback_data="home"),
+    ])
+    return InlineKeyboardMarkup(keyboard)
+
+
+async def _reply_part_audio(message, book_id: str, part: dict, reply_markup=None):
+    """
+    Qismni file_id bo'yicha yuboradi; file_id hali yo'q bo'lsa t.me havola orqali
+    yuborib, javobdagi file_id ni keyingi safar uchun saqlab qo'yadi.
+    """
+    file_id = part.get("file_id")
+    if file_id:
+        try:
+            return await message.reply_audio(audio=file_id, caption=f"{part['nomi']}", reply_markup=reply_markup)
+        except BadRequest:
+            # file_id yaroqsiz bo'lib qolgan — havola orqali qayta olamiz
+            pass
+
+    sent = await message.reply_audio(audio=part["audio_url"], caption=f"{part['nomi']}", reply_markup=reply_markup)
+    new_file_id = extract_file_id(sent)
+    if new_file_id and new_file_id != file_id:
+        await set_part_file_id(book_id, part["id"], new_file_id)
+    return sent
+
+
+async def _part_from_callback(data: str):
+    """
+    part_{part_id} -> qism (katalogdan PK bo'yicha).
+    Eski tugmalar: part_{book_id}_{index} — kitob qismlari ro'yxatidagi o'rin bo'yicha.
+    """
+    pieces = data.split("_")
+    if len(pieces) == 3:
+        _, book_id, part_index = pieces
+        parts = await get_parts(book_id)
+        index = int(part_index)
+        return parts[index] if 0 <= index < len(parts) else None
+    return await get_part(int(pieces[1]))
+
+
 # ⬇️ Qismni yuborish
 async def send_audio_part(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
-    _, book_id, part_index = query.data.split("_")
-    part_index = int(part_index)
-
-    parts = get_parts(book_id)
-    if not parts or part_index < 0 or part_index >= len(parts):
-        await query.edit_message_text(
+    # Ikkala yo'lda ham — aks holda "topilmadi" da tugma spinneri timeout gacha aylanadi
+    await query.answer()
+    part = await _part_from_callback(query.data)
+    if not part:
+        # Eski tugmadan kitob id sini olamiz, bo'lmasa kitoblar ro'yxatiga qaytamiz
+        pieces = query.data.split("_")
+        back = f"book_{pieces[1]}" if len(pieces) == 3 else "books"
+        await edit_or_reply(
+            query,
             "❌ Qism topilmadi yoki hali qo‘shilmagan.",
             reply_markup=InlineKeyboardMarkup([
                 [
-                    InlineKeyboardButton("🔙 Ortga", callback_data=f"book_{book_id}"),
+                    InlineKeyboardButton("🔙 Ortga", callback_data=back),
                     InlineKeyboardButton("🏠 Asosiy sahifa", callback_data="home"),
                 ]
             ])
         )
         return
 
-    part = parts[part_index]
-    await query.message.reply_audio(
-        audio=part["audio_url"],
-        caption=f"{part['nomi']}"
-    )
+    has_next = bool(await get_next_parts(part["id"]))
+    # Tugmalar audio caption ida — alohida reply_text yuborilmaydi
+    await _reply_part_audio(query.message, part["book_id"], part, _part_keyboard(part, has_next))
+    record_progress(query.from_user.id, part["book_id"], part["id"])
+
+
+async def _play_queue(message, user_id: int, parts: list):
+    """Qismlarni ketma-ket yuboradi (chat va umumiy flood limitlariga rioya qilib)."""
+    chat_id = message.chat_id
+    try:
+        # Bittadan ko'p oldinga qaraymiz — oxirgi qismda "keyingi" tugmasi kerakmi
+        last = parts[-1]
+        last_has_next = bool(await get_next_parts(last["id"]))
+        for part in parts:
+            markup = _part_keyboard(part, last_has_next) if part is last else None
+            while True:
+                await limiter.wait(chat_id)
+                try:
+                    await _reply_part_audio(message, part["book_id"], part, markup)
+                    break
+                except RetryAfter as e:
+                    await asyncio.sleep(retry_after_seconds(e))
+            record_progress(user_id, part["book_id"], part["id"])
+    except Forbidden:
+        # foydalanuvchi botni bloklagan
+        pass
+    except Exception:
+        logger.exception("Qismlarni yuborish to'xtadi (chat %s)", chat_id)
+    finally:
+        _playing.pop(chat_id, None)
+
+
+# ⏭ Keyingi qism / keyingi N ta qism
+async def send_next_parts(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    _, part_id, count = query.data.split("_")
+    chat_id = query.message.chat_id
 
-    keyboard = [[
-        InlineKeyboardButton("🔙 Ortga", callback_data=f"book_{book_id}"),
-        InlineKeyboardButton("🏠 Asosiy sahifa", callback_data="home"),
-    ]]
-    await query.message.reply_text(
-        "⬆️ Yana boshqa qismlarni tanlashingiz mumkin:",
-        reply_markup=InlineKeyboardMarkup(keyboard)
+    if chat_id in _playing:
+        await query.answer("⏳ Oldingi qismlar hali yuborilmoqda...")
+        return
+
+    parts = await get_next_parts(int(part_id), min(int(count), PLAY_BATCH))
+    if not parts:
+        await query.answer("✅ Bu kitobning oxirgi qismi.")
+        return
+    await query.answer()
+
+    # Yuborish fonda: bir nechta audio ~1 soniya oraliqda ketadi, handler esa darhol bo'shaydi
+    _playing[chat_id] = context.application.create_task(
+        _play_queue(query.message, query.from_user.id, parts), update=update, name=f"play-{chat_id}"
     )
@@ -1,7 +1,9 @@
-import asyncio
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes, ConversationHandler
-from storage import get_users
+from async_storage import count_users, create_broadcast_job
+from broadcaster import INSTANCE_ID, start_job
+from state_store import store
 
 ASK_BROADCAST_MESSAGE = 100
 CONFIRM_BROADCAST = 101
@@ -21,7 +23,8 @@ async def ask_broadcast_message(update: Update, context: ContextTypes.DEFAULT_TY
 
 async def handle_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
     message = update.message
-    context.user_data["broadcast_message"] = message
+    # Faqat manba xabar koordinatalari saqlanadi — yuborish copy_message orqali
+    await store.set(update.effective_user.id, "broadcast", (message.chat_id, message.message_id))
     keyboard = [
         [InlineKeyboardButton("✅ Ha, yubor", callback_data="confirm_broadcast")],
         [InlineKeyboardButton("❌ Bekor qilish", callback_data="cancel_broadcast")]
@@ -58,53 +61,32 @@ async def handle_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def confirm_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    message = context.user_data.get("broadcast_message")
-    if not message:
+    source = await store.pop(query.from_user.id, "broadcast")
+    if not source:
         await query.edit_message_text("❌ Xabar topilmadi.")
         return ConversationHandler.END
 
-    user_ids = [u["id"] for u in get_users()]
-    success = 0;
-    fail = 0
-
-    for uid in user_ids:
-        try:
-            if message.text:
-                await context.bot.send_message(chat_id=uid, text=message.text)
-            elif message.photo:
-                await context.bot.send_photo(chat_id=uid, photo=message.photo[-1].file_id,
-                                             caption=message.caption or "")
-            elif message.document:
-                await context.bot.send_document(chat_id=uid, document=message.document.file_id,
-                                                caption=message.caption or "")
-            elif message.audio:
-                await context.bot.send_audio(chat_id=uid, audio=message.audio.file_id, caption=message.caption or "")
-            elif message.voice:
-                await context.bot.send_voice(chat_id=uid, voice=message.voice.file_id, caption=message.caption or "")
-            elif message.video:
-                await context.bot.send_video(chat_id=uid, video=message.video.file_id, caption=message.caption or "")
-            success += 1
-        except Exception:
-            fail += 1
-        await asyncio.sleep(0.05)
-
-    context.user_data.pop("broadcast_message", None)
-    keyboard = [[
-        InlineKeyboardButton("🏠 Asosiy menyu", callback_data="admin_panel"),
-        InlineKeyboardButton("📨 Yana yuborish", callback_data="admin_broadcast")
-    ]]
-    response_text = f"✅ Xabar yuborildi!\n\n👥 Umumiy foydalanuvchilar: {len(user_ids)}\n📬 Yuborilganlar: {success}\n❌ Xatoliklar: {fail}"
+    total = await count_users()
+    text = f"⏳ Xabar yuborilmoqda...\n\n👥 Umumiy foydalanuvchilar: {total}"
     try:
-        await query.edit_message_text(response_text, reply_markup=InlineKeyboardMarkup(keyboard))
-    except:
-        await query.message.reply_text(response_text, reply_markup=InlineKeyboardMarkup(keyboard))
+        progress = await query.edit_message_text(text)
+    except BadRequest:
+        # Tasdiqlash xabari media bo'lsa, matnni tahrirlab bo'lmaydi
+        progress = await query.message.reply_text(text)
+
+    from_chat_id, message_id = source
+    job = await create_broadcast_job(
+        from_chat_id, message_id, progress.chat_id, progress.message_id, total, owner=INSTANCE_ID
+    )
+    # Yuborish fonda davom etadi; admin callback darhol bo'shaydi
+    start_job(context.bot, job)
     return ConversationHandler.END
 
 
 async def cancel_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    context.user_data.pop("broadcast_message", None)
+    await store.delete(query.from_user.id, "broadcast")
     keyboard = [[InlineKeyboardButton("🏠 Asosiy menyu", callback_data="admin_panel")]]
     try:
         await query.edit_message_text("❌ Xabar yuborish bekor qilindi.", reply_markup=InlineKeyboardMarkup(keyboard))
@@ -1,6 +1,6 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
-from storage import add_feedback
+from async_storage import add_feedback
 
 ASK_FEEDBACK = 1
 
@@ -31,7 +31,7 @@ async def save_feedback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     text = (update.message.text or "").strip()
 
-    add_feedback(
+    await add_feedback(
         user_id=user.id,
         name=f"{user.first_name or ''} {user.last_name or ''}".strip(),
         username=user.username or "",
@@ -1,13 +1,13 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
-from storage import get_feedback, deduplicate_feedback
+from async_storage import get_feedback, deduplicate_feedback
 
 
 async def show_last_feedbacks(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    feedbacks = get_feedback(10)
+    feedbacks = await get_feedback(10)
 
     if not feedbacks:
         text = "ℹ️ Hozircha hech qanday fikr bildirilmagan."
@@ -37,7 +37,7 @@ async def dedupe_feedback_handler(update: Update, context: ContextTypes.DEFAULT_
     query = update.callback_query
     await query.answer()
 
-    removed = deduplicate_feedback()
+    removed = await deduplicate_feedback()
     text = f"✅ Tayyor. Takror fikrlar tozalandi.\n\n🗑 O‘chirilganlar soni: <b>{removed}</b> ta"
 
     keyboard = [
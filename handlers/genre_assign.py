@@ -1,6 +1,11 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes, ConversationHandler, CallbackQueryHandler
-from storage import get_books, get_genres, get_genres_for_book, set_book_genres
+from async_storage import get_books_page, get_genres, get_genres_for_book, set_book_genres
+from keyboards import (
+    PAGE_SIZE, paged_keyboard, parse_cursor, toggle_keyboard, remember_markup, schedule_markup_edit,
+    get_draft
+)
+from state_store import store
 
 # States
 SELECT_BOOK_FOR_ASSIGN = 700
@@ -12,15 +17,19 @@ async def start_assign_genres(update: Update, context: ContextTypes.DEFAULT_TYPE
     query = update.callback_query
     await query.answer()
 
-    books = get_books()
-    if not books:
+    _, after_id, before_id = parse_cursor(query.data)
+    page = await get_books_page(after_id, before_id, PAGE_SIZE)
+    if not page.items:
         await query.edit_message_text(
             "📚 Hozircha hech qanday kitob mavjud emas.",
             reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🏠 Admin panel", callback_data="admin_panel")]])
         )
         return ConversationHandler.END
 
-    keyboard = [[InlineKeyboardButton(b["nomi"], callback_data=f"assigngenres_{b['id']}")] for b in books]
+    keyboard = paged_keyboard(
+        page, lambda i, b: InlineKeyboardButton(b["nomi"], callback_data=f"assigngenres_{b['id']}"),
+        "admin_assign_genres", columns=1
+    )
     keyboard.append([InlineKeyboardButton("🏠 Admin panel", callback_data="admin_panel")])
 
     await query.edit_message_text(
@@ -36,12 +45,11 @@ async def pick_book_then_show_genres(update: Update, context: ContextTypes.DEFAU
     await query.answer()
 
     book_id = query.data.replace("assigngenres_", "")
-    context.user_data["assign_book_id"] = book_id
 
-    all_genres = get_genres()
-    current = {g["id"] for g in get_genres_for_book(book_id)}  # mavjud tanlovlar
+    all_genres = await get_genres()
+    current = {g["id"] for g in await get_genres_for_book(book_id)}  # mavjud tanlovlar
 
-    context.user_data["assign_selected_genres"] = set(current)
+    await store.set(query.from_user.id, "assign_genres", {"book_id": book_id, "selected": current})
 
     if not all_genres:
         await query.edit_message_text(
@@ -53,59 +61,50 @@ async def pick_book_then_show_genres(update: Update, context: ContextTypes.DEFAU
         )
         return ConversationHandler.END
 
-    kb = _genres_keyboard(all_genres, context.user_data["assign_selected_genres"])
+    markup = _genres_keyboard(all_genres, current)
     await query.edit_message_text(
         "Tanlang: kitobga tegishli janr(lar)ni belgilang (bir nechtasini tanlash mumkin).",
-        reply_markup=InlineKeyboardMarkup(kb)
+        reply_markup=markup
     )
+    remember_markup(query.message.chat_id, query.message.message_id, markup)
     return TOGGLE_GENRES_FOR_BOOK
 
 
-def _genres_keyboard(all_genres: list[dict], selected: set[int]):
-    kb = []
-    row = []
-    for g in all_genres:
-        marker = "✅" if g["id"] in selected else "▫️"
-        row.append(InlineKeyboardButton(f"{marker} {g['nomi']}", callback_data=f"toggle_book_genre_{g['id']}"))
-        if len(row) == 2:
-            kb.append(row)
-            row = []
-    if row:
-        kb.append(row)
-
-    kb.append([InlineKeyboardButton("💾 Saqlash", callback_data="save_book_genres")])
-    kb.append([
-        InlineKeyboardButton("🔙 Ortga", callback_data="admin_assign_genres"),
-        InlineKeyboardButton("🏠 Admin panel", callback_data="admin_panel"),
+def _genres_keyboard(all_genres: list[dict], selected: set[int]) -> InlineKeyboardMarkup:
+    return toggle_keyboard(all_genres, selected, "toggle_book_genre_", [
+        [InlineKeyboardButton("💾 Saqlash", callback_data="save_book_genres")],
+        [
+            InlineKeyboardButton("🔙 Ortga", callback_data="admin_assign_genres"),
+            InlineKeyboardButton("🏠 Admin panel", callback_data="admin_panel"),
+        ],
     ])
-    return kb
 
 
 async def toggle_book_genre(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
+    user_id = query.from_user.id
+    chat_id, message_id = query.message.chat_id, query.message.message_id
 
-    book_id = context.user_data.get("assign_book_id")
-    if not book_id:
+    # Debounce oynasida tanlov xotirada — har bosishda DB ga murojaat yo'q
+    data = get_draft(chat_id, message_id) or await store.get(user_id, "assign_genres")
+    if not data:
         await query.edit_message_text("❌ Xatolik: kitob holati topilmadi.", reply_markup=InlineKeyboardMarkup([
             [InlineKeyboardButton("🏠 Admin panel", callback_data="admin_panel")]
         ]))
         return ConversationHandler.END
 
     gid = int(query.data.replace("toggle_book_genre_", ""))
-    selected: set[int] = context.user_data.get("assign_selected_genres", set())
+    selected: set[int] = data["selected"]
     if gid in selected:
         selected.remove(gid)
     else:
         selected.add(gid)
-    context.user_data["assign_selected_genres"] = selected
 
-    all_genres = get_genres()
-    kb = _genres_keyboard(all_genres, selected)
-    await query.edit_message_text(
-        "Tanlang: kitobga tegishli janr(lar)ni belgilang (bir nechtasini tanlash mumkin).",
-        reply_markup=InlineKeyboardMarkup(kb)
-    )
+    # Qayta chizish va holatni yozish kechiktiriladi: tez bosishlar bitta tahrir va bitta yozuvga birlashadi
+    markup = _genres_keyboard(await get_genres(), selected)
+    schedule_markup_edit(context.bot, chat_id, message_id, markup,
+                         draft=data, persist=lambda: store.set(user_id, "assign_genres", data))
     return TOGGLE_GENRES_FOR_BOOK
 
 
@@ -114,19 +113,14 @@ async def save_book_genres(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    book_id = context.user_data.get("assign_book_id")
-    selected: set[int] = context.user_data.get("assign_selected_genres", set())
-
-    if not book_id:
+    data = await store.pop(query.from_user.id, "assign_genres")
+    if not data:
         await query.edit_message_text("❌ Xatolik: kitob aniqlanmadi.",
                                       reply_markup=InlineKeyboardMarkup(
                                           [[InlineKeyboardButton("🏠 Admin panel", callback_data="admin_panel")]]))
         return ConversationHandler.END
 
-    set_book_genres(book_id, list(selected))
-    # Tozalash
-    context.user_data.pop("assign_book_id", None)
-    context.user_data.pop("assign_selected_genres", None)
+    await set_book_genres(data["book_id"], list(data["selected"]))
 
     await query.edit_message_text(
         "✅ Janrlar muvaffaqiyatli saqlandi.",
@@ -1,7 +1,9 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, CallbackQueryHandler, filters
-from storage import get_genres, add_genre, delete_genre, get_books_by_genre
+from async_storage import get_genres, add_genre, delete_genre, get_books_by_genre_page
 from utils import is_admin
+from keyboards import PAGE_SIZE, paged_keyboard, parse_cursor
+from state_store import store
 
 # States
 GENRE_MENU = 590
@@ -17,7 +19,7 @@ async def show_genres(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    genres = get_genres()
+    genres = await get_genres()
     if not genres:
         kb = [[InlineKeyboardButton("🏠 Asosiy menyu", callback_data="home")]]
         await query.edit_message_text("🏷 Hali janrlar qo‘shilmagan.", reply_markup=InlineKeyboardMarkup(kb))
@@ -45,14 +47,15 @@ async def show_genres(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def show_books_in_genre(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Tanlangan janrdagi kitoblar ro‘yxati (2 ustun)."""
+    """Tanlangan janrdagi kitoblar ro‘yxati (2 ustun, sahifalab)."""
     query = update.callback_query
     await query.answer()
 
-    gid = int(query.data.replace("genre_", ""))
-    books = get_books_by_genre(gid)
+    prefix, after_id, before_id = parse_cursor(query.data)
+    gid = int(prefix.replace("genre_", ""))
+    page = await get_books_by_genre_page(gid, after_id, before_id, PAGE_SIZE)
 
-    if not books:
+    if not page.items:
         kb = [[
             InlineKeyboardButton("🔙 Ortga (janrlar)", callback_data="genres"),
             InlineKeyboardButton("🏠 Asosiy menyu", callback_data="home"),
@@ -63,16 +66,9 @@ async def show_books_in_genre(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
         return
 
-    keyboard = []
-    row = []
-    for b in books:
-        row.append(InlineKeyboardButton(b["nomi"], callback_data=f"book_{b['id']}"))
-        if len(row) == 2:
-            keyboard.append(row)
-            row = []
-    if row:
-        keyboard.append(row)
-
+    keyboard = paged_keyboard(
+        page, lambda i, b: InlineKeyboardButton(b["nomi"], callback_data=f"book_{b['id']}"), prefix
+    )
     keyboard.append([
         InlineKeyboardButton("🔙 Ortga (janrlar)", callback_data="genres"),
         InlineKeyboardButton("🏠 Asosiy menyu", callback_data="home"),
@@ -91,7 +87,7 @@ async def admin_genre_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    if not is_admin(update.effective_user.id):
+    if not await is_admin(update.effective_user.id):
         await query.edit_message_text("⛔ Sizda bu bo‘limga kirish huquqi yo‘q.")
         return ConversationHandler.END
 
@@ -132,7 +128,7 @@ async def receive_genre_name(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text("❌ Janr nomi bo‘sh bo‘lmasin. Qayta yuboring.")
         return ASK_GENRE_NAME
 
-    add_genre(name)
+    await add_genre(name)
 
     kb = [[InlineKeyboardButton("🏷 Janr menyusi", callback_data="admin_manage_genres")]]
     await update.message.reply_text("✅ Janr qo‘shildi.", reply_markup=InlineKeyboardMarkup(kb))
@@ -144,7 +140,7 @@ async def delete_genre_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    genres = get_genres()
+    genres = await get_genres()
     if not genres:
         kb = [[InlineKeyboardButton("🏷 Janr menyusi", callback_data="admin_manage_genres")]]
         await query.edit_message_text("ℹ️ O‘chiradigan janr yo‘q.", reply_markup=InlineKeyboardMarkup(kb))
@@ -178,7 +174,7 @@ async def confirm_delete_genre(update: Update, context: ContextTypes.DEFAULT_TYP
     await query.answer()
 
     gid = int(query.data.replace("delgenre_", ""))
-    context.user_data["delete_genre_id"] = gid
+    await store.set(query.from_user.id, "delete_genre", gid)
 
     kb = [
         [InlineKeyboardButton("✅ Ha, o‘chirilsin", callback_data="confirm_delete_genre")],
@@ -197,15 +193,14 @@ async def really_delete_genre(update: Update, context: ContextTypes.DEFAULT_TYPE
     query = update.callback_query
     await query.answer()
 
-    gid = context.user_data.get("delete_genre_id")
+    gid = await store.pop(query.from_user.id, "delete_genre")
     if gid is None:
         await query.edit_message_text("❌ Xatolik.", reply_markup=InlineKeyboardMarkup([
             [InlineKeyboardButton("🏷 Janr menyusi", callback_data="admin_manage_genres")]
         ]))
         return ConversationHandler.END
 
-    delete_genre(int(gid))
-    context.user_data.pop("delete_genre_id", None)
+    await delete_genre(int(gid))
 
     kb = [[InlineKeyboardButton("🏷 Janr menyusi", callback_data="admin_manage_genres")]]
     await query.edit_message_text("✅ Janr o‘chirildi.", reply_markup=InlineKeyboardMarkup(kb))
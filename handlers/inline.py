@@ -0,0 +1,38 @@
+from telegram import InlineQueryResultCachedAudio, Update
+from telegram.ext import ContextTypes
+from async_storage import search_books_memory, get_parts
+
+# Telegram natijalarni shuncha soniya keshlaydi (bir xil so'rov botga qayta kelmaydi)
+INLINE_CACHE_TIME = 300
+# Bitta javobda Telegram ko'pi bilan 50 ta natija qabul qiladi
+INLINE_PAGE_SIZE = 50
+INLINE_MAX_BOOKS = 10
+
+
+# 🔎 @bot <nom> — istalgan chatda qismlarni audio sifatida yuborish
+async def inline_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    inline_query = update.inline_query
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+
+    # Faqat katalog keshi va xotiradagi indeks — DB ga murojaat yo'q
+    results = []
+    for book in await search_books_memory(inline_query.query, INLINE_MAX_BOOKS):
+        for part in await get_parts(book["id"]):
+            # Inline javobda faqat Telegramda bor fayllarni (file_id) yuborish mumkin
+            if part.get("file_id"):
+                results.append((book, part))
+
+    page = results[offset:offset + INLINE_PAGE_SIZE]
+    next_offset = str(offset + INLINE_PAGE_SIZE) if offset + INLINE_PAGE_SIZE < len(results) else ""
+    await inline_query.answer(
+        [
+            InlineQueryResultCachedAudio(
+                id=f"part_{part['id']}",
+                audio_file_id=part["file_id"],
+                caption=f"{book['nomi']} — {part['nomi']}",
+            )
+            for book, part in page
+        ],
+        cache_time=INLINE_CACHE_TIME,
+        next_offset=next_offset,
+    )
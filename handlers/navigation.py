@@ -16,7 +16,7 @@ async def back_to_home(update: Update, context: ContextTypes.DEFAULT_TYPE):
         [InlineKeyboardButton("👤 Admin bilan bog‘lanish", callback_data='admin_contact')],
     ]
     # <<< MUHIM: home menyuda ham admin panel tugmasini shartli ko'rsatamiz
-    if is_admin(user_id):
+    if await is_admin(user_id):
         keyboard.append([InlineKeyboardButton("🛠️ Admin panel", callback_data="admin_panel")])
 
     await query.edit_message_text(
@@ -1,6 +1,8 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
-from storage import get_users, get_book_views, get_books
+from async_storage import count_users, get_book_stats
+
+BOOK_STATS_LIMIT = 50
 
 
 async def show_stats_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -17,7 +19,7 @@ async def show_stats_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def show_user_count(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    count = len(get_users())
+    count = await count_users()
     keyboard = [[
         InlineKeyboardButton("🔙 Ortga", callback_data="stats"),
         InlineKeyboardButton("🏠 Asosiy menyu", callback_data="home")
@@ -33,19 +35,14 @@ async def show_book_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    views = {row["book_name"]: row["count"] for row in get_book_views()}
-    books = get_books()
-    titles = {b["nomi"] for b in books}
-
-    filtered = {t: c for t, c in views.items() if t in titles}
-    if not filtered:
+    stats = await get_book_stats(BOOK_STATS_LIMIT)
+    if not stats:
         text = "📚 Hali statistik ma’lumot yo‘q yoki mavjud kitoblarga tegishli emas.\n\n" \
                "ℹ️ Statistika kitob qismlar ro‘yxatini ochganingizda yangilanadi."
     else:
-        sorted_stats = sorted(filtered.items(), key=lambda x: x[1], reverse=True)
         text = "📖 Kitoblar bo‘yicha statistika:\n\n"
-        for name, cnt in sorted_stats:
-            text += f"• <b>{name}</b>: {cnt} marta ochilgan\n"
+        for row in stats:
+            text += f"• <b>{row['nomi']}</b>: {row['views']} marta ochilgan\n"
 
     keyboard = [[
         InlineKeyboardButton("🔙 Ortga", callback_data="stats"),
@@ -0,0 +1,171 @@
+"""
+Inline klaviatura yordamchilari: ustunlarga bo'lish, sahifalangan ro'yxatlar va
+multi-select (toggle) klaviaturalar.
+
+Sahifa tugmalari callback_data si: "<prefix>:n:<oxirgi id>" (keyingi) va
+"<prefix>:p:<birinchi id>" (oldingi). Oddiy "<prefix>" — birinchi sahifa.
+
+Toggle bosishlari darhol tahrirlanmaydi: schedule_markup_edit() oxirgi holatni
+TOGGLE_DEBOUNCE soniya kutib bitta edit_message_reply_markup bilan yuboradi va
+ko'rsatilgandan farq qilmasa umuman yubormaydi. Tanlov ham shu oyna davomida
+faqat xotirada turadi (get_draft) va holat omboriga bir marta — tahrir yuborilgach
+yoki boshqa tugma (saqlash, ortga, ...) bosilganda — yoziladi.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, RetryAfter
+
+from catalog import Page
+from utils import retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 20
+TOGGLE_DEBOUNCE = 0.4
+# Ko'rsatilgan klaviaturalar xotirasi (diff uchun) shu sondan oshsa eskilari tashlanadi
+_MAX_TRACKED = 1000
+
+_MessageKey = Tuple[int, int]  # (chat_id, message_id)
+_shown: Dict[_MessageKey, dict] = {}
+_pending: Dict[_MessageKey, InlineKeyboardMarkup] = {}
+_tasks: Dict[_MessageKey, asyncio.Task] = {}
+# Hali omborga yozilmagan tanlov: (holat, uni yozadigan korutina fabrikasi)
+_drafts: Dict[_MessageKey, Tuple[Any, Callable[[], Awaitable]]] = {}
+
+
+def grid(buttons: List[InlineKeyboardButton], columns: int = 2) -> List[List[InlineKeyboardButton]]:
+    return [buttons[i:i + columns] for i in range(0, len(buttons), columns)]
+
+
+def parse_cursor(data: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """callback_data -> (prefix, after_id, before_id)."""
+    parts = data.split(":", 2)
+    if len(parts) == 3 and parts[1] in ("n", "p"):
+        prefix, direction, key = parts
+        return (prefix, key, None) if direction == "n" else (prefix, None, key)
+    return data, None, None
+
+
+def paged_keyboard(page: Page, make_button: Callable[[int, Mapping], InlineKeyboardButton],
+                   prefix: str, columns: int = 2) -> List[List[InlineKeyboardButton]]:
+    """
+    Sahifa elementlari + ⬅️/➡️ qatori. make_button(index, item) — index butun
+    ro'yxatdagi o'rni (page.offset + i).
+    """
+    rows = grid([make_button(page.offset + i, item) for i, item in enumerate(page.items)], columns)
+    nav = []
+    if page.items and page.has_prev:
+        nav.append(InlineKeyboardButton("⬅️ Oldingi", callback_data=f"{prefix}:p:{page.items[0]['id']}"))
+    if page.items and page.has_next:
+        nav.append(InlineKeyboardButton("Keyingi ➡️", callback_data=f"{prefix}:n:{page.items[-1]['id']}"))
+    if nav:
+        rows.append(nav)
+    return rows
+
+
+def toggle_keyboard(items: Iterable[Mapping], selected, prefix: str,
+                    footer: List[List[InlineKeyboardButton]], columns: int = 2) -> InlineKeyboardMarkup:
+    """Multi-select: har element "<prefix><id>" tugmasi, tanlanganlari ✅ bilan."""
+    buttons = [
+        InlineKeyboardButton(f"{'✅' if item['id'] in selected else '▫️'} {item['nomi']}",
+                             callback_data=f"{prefix}{item['id']}")
+        for item in items
+    ]
+    return InlineKeyboardMarkup(grid(buttons, columns) + footer)
+
+
+def remember_markup(chat_id: int, message_id: int, markup: InlineKeyboardMarkup):
+    """Xabarga yuborilgan klaviaturani eslab qoladi — keyingi tahrirlar shu bilan solishtiriladi."""
+    key = (chat_id, message_id)
+    _shown.pop(key, None)
+    _shown[key] = markup.to_dict()
+    if len(_shown) > _MAX_TRACKED:
+        del _shown[next(iter(_shown))]
+
+
+def get_draft(chat_id: int, message_id: int) -> Any:
+    """Debounce oynasidagi (hali yozilmagan) tanlov yoki None — unda holat omboridan o'qiladi."""
+    item = _drafts.get((chat_id, message_id))
+    return item[0] if item else None
+
+
+def schedule_markup_edit(bot, chat_id: int, message_id: int, markup: InlineKeyboardMarkup,
+                         draft: Any = None, persist: Optional[Callable[[], Awaitable]] = None):
+    """
+    Ketma-ket bosishlarni bitta tahrirga birlashtiradi (oxirgi holat yuboriladi).
+    persist berilsa, draft xotirada qoladi va tahrirdan keyin bir marta persist() bilan yoziladi.
+    """
+    key = (chat_id, message_id)
+    _pending[key] = markup
+    if persist is not None:
+        _drafts[key] = (draft, persist)
+    if key not in _tasks:
+        _tasks[key] = asyncio.create_task(_flush_markup(bot, key), name=f"markup-{chat_id}-{message_id}")
+
+
+def cancel_markup_edit(chat_id: int, message_id: int):
+    """Xabar boshqa holatga o'tganda (saqlash/bekor qilish) kutilayotgan tahrirni bekor qiladi."""
+    key = (chat_id, message_id)
+    _pending.pop(key, None)
+    _shown.pop(key, None)
+    task = _tasks.pop(key, None)
+    if task is not None:
+        task.cancel()
+
+
+async def _persist_draft(key: _MessageKey) -> bool:
+    item = _drafts.get(key)
+    if item is None:
+        return True
+    try:
+        await item[1]()
+    except Exception:
+        # Xotirada qoladi: keyingi bosish yoki saqlash qayta yozadi
+        logger.warning("Tanlov holati yozilmadi %s", key, exc_info=True)
+        return False
+    # Yozish paytida yangi bosish kelgan bo'lsa, u keyingi aylanishda yoziladi
+    if _drafts.get(key) is item:
+        del _drafts[key]
+    return True
+
+
+async def drop_pending_markup(update, context):
+    """
+    group=-1 handler: toggle bo'lmagan har qanday bosish (saqlash, ortga, ...) xabarni
+    boshqa ekranga o'tkazadi — kechiktirilgan toggle tahriri uni qayta yozib yubormasin.
+    Xotiradagi tanlov esa asosiy handler uni omboridan o'qishidan oldin yoziladi.
+    """
+    message = update.callback_query.message
+    if message is not None:
+        cancel_markup_edit(message.chat_id, message.message_id)
+        await _persist_draft((message.chat_id, message.message_id))
+
+
+async def _flush_markup(bot, key: _MessageKey):
+    try:
+        await asyncio.sleep(TOGGLE_DEBOUNCE)
+        while key in _pending or key in _drafts:
+            markup = _pending.pop(key, None)
+            if markup is None:
+                if not await _persist_draft(key):
+                    break
+                continue
+            if markup.to_dict() == _shown.get(key):
+                continue
+            try:
+                await bot.edit_message_reply_markup(chat_id=key[0], message_id=key[1], reply_markup=markup)
+            except RetryAfter as e:
+                # Kutish paytida kelgan bosishlar ustun, bo'lmasa shu holatni qayta yuboramiz
+                _pending.setdefault(key, markup)
+                await asyncio.sleep(retry_after_seconds(e))
+                continue
+            except BadRequest as e:
+                if "not modified" not in str(e).lower():
+                    logger.warning("Klaviatura tahrirlanmadi %s: %s", key, e)
+            remember_markup(key[0], key[1], markup)
+    finally:
+        if _tasks.get(key) is asyncio.current_task():
+            del _tasks[key]
@@ -1,16 +1,28 @@
+import asyncio
+
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     ApplicationBuilder, CommandHandler, ContextTypes, ConversationHandler,
-    CallbackQueryHandler, MessageHandler, filters
+    CallbackQueryHandler, InlineQueryHandler, MessageHandler, filters
 )
-from config import BOT_TOKEN
-from storage import init_db, add_user
-from utils import is_admin
+from config import BOT_TOKEN, BOT_MODE, WEBHOOK_URL, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT
+from storage import init_db
+from async_storage import add_user, open_pool, close_pool, load_catalog
+from utils import edit_or_reply, is_admin
+from file_cache import warm_file_ids
+from broadcaster import resume_broadcasts, stop_all as stop_broadcasts
+from view_counter import flush_views, VIEW_FLUSH_INTERVAL
+from keyboards import drop_pending_markup
+from progress import continue_part, flush_progress, PROGRESS_FLUSH_INTERVAL
+from state_store import purge_expired_state
+from persistence import PostgresPersistence
 
 # --- Admin panel va boshqalar ---
 from handlers.admin_panel import admin_panel
-from handlers.books import show_books, show_book_parts, send_audio_part
+from handlers.books import show_books, show_book_parts, send_audio_part, send_next_parts
 from handlers.stats import show_stats_menu, show_user_count, show_book_stats
+from handlers.inline import inline_search
+from handlers.book_search import ask_search_query, receive_search_query, ASK_SEARCH_QUERY, SEARCH_TIMEOUT
 from handlers.feedback import ask_feedback, save_feedback, cancel_feedback, ASK_FEEDBACK
 from handlers.feedback_admin import show_last_feedbacks, dedupe_feedback_handler
 from handlers.broadcast import (
@@ -60,16 +72,24 @@ from handlers.book_edit import (
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    add_user(user.id, user.first_name or "")
-
-    keyboard = [
+    await add_user(user.id, user.first_name or "")
+
+    keyboard = []
+    # Oxirgi tinglangan kitobdagi keyingi qism — to'g'ridan-to'g'ri yuboriladi
+    nxt = await continue_part(user.id)
+    if nxt:
+        keyboard.append([InlineKeyboardButton(
+            f"▶️ Davom ettirish: {nxt['book_nomi']} — {nxt['nomi']}", callback_data=f"part_{nxt['id']}"
+        )])
+    keyboard += [
         [InlineKeyboardButton("📚 Kitoblar", callback_data='books')],
+        [InlineKeyboardButton("🔎 Qidirish", callback_data='search')],
         [InlineKeyboardButton("🏷 Janrlar", callback_data='genres')],
         [InlineKeyboardButton("📊 Statistika", callback_data='stats')],
         [InlineKeyboardButton("💬 Fikr bildirish", callback_data='feedback')],
         [InlineKeyboardButton("👤 Admin bilan bog‘lanish", callback_data='admin_contact')],
     ]
-    if is_admin(user.id):
+    if await is_admin(user.id):
         keyboard.append([InlineKeyboardButton("🛠️ Admin panel", callback_data="admin_panel")])
 
     text = (f"<b>🖐Assalomu alaykum, {user.first_name}</b>!\n\n"
@@ -79,7 +99,14 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.message:
         await update.message.reply_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="HTML")
     else:
-        await update.callback_query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="HTML")
+        # "🏠" audio caption idan ham bosiladi — edit_or_reply media xabarga yangi matn yuboradi
+        await edit_or_reply(update.callback_query, text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="HTML")
+
+
+async def home_end_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Suhbat fallback i: asosiy menyuni ko'rsatadi va suhbatni yakunlaydi."""
+    await start(update, context)
+    return ConversationHandler.END
 
 
 async def admin_contact(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -91,15 +118,50 @@ async def admin_contact(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def admin_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not is_admin(update.effective_user.id):
+    if not await is_admin(update.effective_user.id):
         await update.message.reply_text("⛔ Sizda bu bo‘limga kirish huquqi yo‘q.")
         return
     await admin_panel(update, context)
 
 
+async def post_init(app):
+    # Async pool event loop ichida ochiladi
+    await open_pool()
+    # Katalog keshini oldindan yuklaymiz — ko'rish DB ga murojaat qilmaydi
+    await load_catalog()
+
+
+async def post_shutdown(app):
+    await stop_broadcasts()
+    # Buferdagi ko'rishlarni yo'qotmaslik uchun
+    await flush_views()
+    await flush_progress()
+    await close_pool()
+
+
 def main():
     init_db()
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+    app = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        # Suhbat holatlari restart/deploydan keyin ham saqlanadi. Holatlar jarayon
+        # xotirasida yuritiladi — bot (polling ham, webhook ham) faqat bitta instance da ishlaydi
+        .persistence(PostgresPersistence())
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+
+    # Qismlarning file_id sini fonda oldindan aniqlash (FILE_CACHE_CHAT_ID berilgan bo'lsa)
+    app.job_queue.run_repeating(warm_file_ids, interval=3600, first=10, name="warm_file_ids")
+    # Uzilib qolgan broadcast joblarni checkpoint dan davom ettirish
+    app.job_queue.run_repeating(resume_broadcasts, interval=60, first=5, name="resume_broadcasts")
+    app.job_queue.run_repeating(flush_views, interval=VIEW_FLUSH_INTERVAL, name="flush_views")
+    app.job_queue.run_repeating(flush_progress, interval=PROGRESS_FLUSH_INTERVAL, name="flush_progress")
+    app.job_queue.run_repeating(purge_expired_state, interval=600, first=60, name="purge_expired_state")
+
+    # Kechiktirilgan toggle tahrirlari ekran almashganda bekor qilinadi (handlerlardan oldin)
+    app.add_handler(CallbackQueryHandler(drop_pending_markup, pattern=r"^(?!toggle_)"), group=-1)
 
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("admin", admin_cmd))
@@ -117,7 +179,8 @@ def main():
             CallbackQueryHandler(start, pattern="^home$"),
             MessageHandler(filters.COMMAND, cancel_feedback)
         ],
-        per_chat=True, allow_reentry=True
+        per_chat=True, allow_reentry=True,
+        name="feedback", persistent=True
     ))
 
     # ----- Add Book (with genres) -----
@@ -136,33 +199,45 @@ def main():
             ]
         },
         fallbacks=[CallbackQueryHandler(cancel_add_book, pattern="^cancel_add_book$")],
-        per_chat=True, allow_reentry=True
+        per_chat=True, allow_reentry=True,
+        name="add_book", persistent=True
     ))
 
     # ----- Add Part -----
     app.add_handler(ConversationHandler(
         entry_points=[CallbackQueryHandler(start_add_part, pattern="^admin_add_part$")],
         states={
-            ADD_PART_SELECT_BOOK: [CallbackQueryHandler(select_book_for_part_add, pattern=r"^addpart_")],
+            ADD_PART_SELECT_BOOK: [
+                CallbackQueryHandler(select_book_for_part_add, pattern=r"^addpart_"),
+                CallbackQueryHandler(start_add_part, pattern=r"^admin_add_part:[np]:")
+            ],
             ADD_PART_URL: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, receive_part_url),
                 CallbackQueryHandler(cancel_add_part, pattern="^cancel_add_part$")
             ],
         },
         fallbacks=[CallbackQueryHandler(cancel_add_part, pattern="^cancel_add_part$")],
-        per_chat=True, allow_reentry=True
+        per_chat=True, allow_reentry=True,
+        name="add_part", persistent=True
     ))
 
     # ----- Delete Part -----
     app.add_handler(ConversationHandler(
         entry_points=[CallbackQueryHandler(start_delete_part, pattern="^admin_delete_part$")],
         states={
-            DELETE_PART_SELECT_BOOK: [CallbackQueryHandler(select_part_to_delete, pattern=r"^delpartbook_")],
-            DELETE_PART_SELECT: [CallbackQueryHandler(confirm_delete_part, pattern=r"^delpart_")],
+            DELETE_PART_SELECT_BOOK: [
+                CallbackQueryHandler(select_part_to_delete, pattern=r"^delpartbook_"),
+                CallbackQueryHandler(start_delete_part, pattern=r"^admin_delete_part:[np]:")
+            ],
+            DELETE_PART_SELECT: [
+                CallbackQueryHandler(confirm_delete_part, pattern=r"^delpart(id)?_\d+$"),
+                CallbackQueryHandler(select_part_to_delete, pattern=r"^delpartbook_[^:]+:[np]:")
+            ],
             CONFIRM_DELETE_PART: [CallbackQueryHandler(really_delete_part, pattern=r"^confirm_delete_part$")],
         },
         fallbacks=[CallbackQueryHandler(admin_panel, pattern="^admin_panel$")],
-        per_chat=True, allow_reentry=True
+        per_chat=True, allow_reentry=True,
+        name="delete_part", persistent=True
     ))
 
     # ----- Broadcast -----
@@ -176,7 +251,8 @@ def main():
             ],
         },
         fallbacks=[CallbackQueryHandler(cancel_broadcast, pattern="^cancel_broadcast$")],
-        per_chat=True, allow_reentry=True
+        per_chat=True, allow_reentry=True,
+        name="broadcast", persistent=True
     ))
 
     # ----- Adminlar -----
@@ -184,7 +260,8 @@ def main():
     app.add_handler(ConversationHandler(
         entry_points=[CallbackQueryHandler(ask_admin_id, pattern="^admin_add_admin$")],
         states={ASK_NEW_ADMIN_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_admin_id)]},
-        fallbacks=[], per_chat=True, allow_reentry=True
+        fallbacks=[], per_chat=True, allow_reentry=True,
+        name="add_admin", persistent=True
     ))
     app.add_handler(CallbackQueryHandler(delete_admin_menu, pattern=r"^admin_delete_admin$"))
     app.add_handler(CallbackQueryHandler(remove_admin_confirm, pattern=r"^remove_admin_"))
@@ -216,7 +293,8 @@ def main():
             CallbackQueryHandler(admin_panel, pattern="^admin_panel$"),
             CallbackQueryHandler(start, pattern="^home$"),
         ],
-        per_chat=True, allow_reentry=True
+        per_chat=True, allow_reentry=True,
+        name="manage_genres", persistent=True
     ))
 
     # ----- Mavjud kitoblarga janr belgilash -----
@@ -224,7 +302,8 @@ def main():
         entry_points=[CallbackQueryHandler(start_assign_genres, pattern=r"^admin_assign_genres$")],
         states={
             SELECT_BOOK_FOR_ASSIGN: [
-                CallbackQueryHandler(pick_book_then_show_genres, pattern=r"^assigngenres_")
+                CallbackQueryHandler(pick_book_then_show_genres, pattern=r"^assigngenres_"),
+                CallbackQueryHandler(start_assign_genres, pattern=r"^admin_assign_genres:[np]:")
             ],
             TOGGLE_GENRES_FOR_BOOK: [
                 CallbackQueryHandler(toggle_book_genre, pattern=r"^toggle_book_genre_\d+$"),
@@ -237,7 +316,8 @@ def main():
             CallbackQueryHandler(admin_panel, pattern=r"^admin_panel$"),
             CallbackQueryHandler(start, pattern=r"^home$"),
         ],
-        per_chat=True, allow_reentry=True
+        per_chat=True, allow_reentry=True,
+        name="assign_genres", persistent=True
     ))
 
     # ----- Kitob nomini tahrirlash (YANGI) -----
@@ -245,7 +325,8 @@ def main():
         entry_points=[CallbackQueryHandler(start_rename_book, pattern=r"^admin_rename_book$")],
         states={
             RENAME_SELECT_BOOK: [
-                CallbackQueryHandler(pick_book_then_ask_title, pattern=r"^renamebook_")
+                CallbackQueryHandler(pick_book_then_ask_title, pattern=r"^renamebook_"),
+                CallbackQueryHandler(start_rename_book, pattern=r"^admin_rename_book:[np]:")
             ],
             RENAME_ASK_TITLE: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, receive_new_title),
@@ -257,20 +338,40 @@ def main():
             CallbackQueryHandler(admin_panel, pattern=r"^admin_panel$"),
             CallbackQueryHandler(start, pattern=r"^home$"),
         ],
-        per_chat=True, allow_reentry=True
+        per_chat=True, allow_reentry=True,
+        name="rename_book", persistent=True
+    ))
+
+    # ----- Qidiruv -----
+    # Admin/feedback suhbatlaridan keyin: ular kutayotgan matnni qidiruv "yutib" yubormasin.
+    # persistent emas — timeout joblari restartdan keyin tiklanmaydi, holat esa osilib qolardi
+    app.add_handler(ConversationHandler(
+        entry_points=[
+            CallbackQueryHandler(ask_search_query, pattern="^search$"),
+            CommandHandler("search", ask_search_query),
+        ],
+        states={ASK_SEARCH_QUERY: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_search_query)]},
+        fallbacks=[CallbackQueryHandler(home_end_conversation, pattern="^home$")],
+        per_chat=True, allow_reentry=True,
+        conversation_timeout=SEARCH_TIMEOUT,
+        name="search"
     ))
 
+    # ----- Inline rejim (@bot nom) -----
+    app.add_handler(InlineQueryHandler(inline_search))
+
     # ----- Static handlers -----
     app.add_handler(CallbackQueryHandler(start, pattern="^home$"))
     app.add_handler(CallbackQueryHandler(admin_panel, pattern="^admin_panel$"))
     app.add_handler(CallbackQueryHandler(admin_contact, pattern="^admin_contact$"))
 
     app.add_handler(CallbackQueryHandler(send_audio_part, pattern=r"^part_"))
+    app.add_handler(CallbackQueryHandler(send_next_parts, pattern=r"^playnext_\d+_\d+$"))
     app.add_handler(CallbackQueryHandler(show_book_parts, pattern=r"^book_"))
-    app.add_handler(CallbackQueryHandler(show_books, pattern=r"^books$"))
+    app.add_handler(CallbackQueryHandler(show_books, pattern=r"^books(:[np]:.+)?$"))
 
     # Kitoblar ro‘yxati va o‘chirish
-    app.add_handler(CallbackQueryHandler(admin_list_books, pattern=r"^admin_list_books$"))
+    app.add_handler(CallbackQueryHandler(admin_list_books, pattern=r"^admin_list_books(:[np]:.+)?$"))
     app.add_handler(CallbackQueryHandler(admin_list_books, pattern=r"^admin_delete_book$"))
     app.add_handler(CallbackQueryHandler(ask_confirm_book_delete, pattern=r"^deletebook_"))
     app.add_handler(CallbackQueryHandler(confirm_book_delete, pattern=r"^confirm_delete_book$"))
@@ -281,11 +382,16 @@ def main():
 
     app.add_handler(CallbackQueryHandler(show_last_feedbacks, pattern=r"^admin_view_feedback$"))
     app.add_handler(CallbackQueryHandler(show_genres, pattern=r"^genres$"))
-    app.add_handler(CallbackQueryHandler(show_books_in_genre, pattern=r"^genre_\d+$"))
+    app.add_handler(CallbackQueryHandler(show_books_in_genre, pattern=r"^genre_\d+(:[np]:.+)?$"))
     app.add_handler(CallbackQueryHandler(dedupe_feedback_handler, pattern="^admin_dedupe_feedback$"))
 
-    print("✅ Bot ishga tushdi.")
-    app.run_polling()
+    if BOT_MODE == "webhook":
+        from webhook import run_webhook
+        print(f"✅ Bot ishga tushdi (webhook, port {WEBHOOK_PORT}).")
+        asyncio.run(run_webhook(app, WEBHOOK_URL, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT))
+    else:
+        print("✅ Bot ishga tushdi.")
+        app.run_polling()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,93 @@
+-- Boshlang'ich sxema: init_db dagi barcha DDL (mavjud bazalarda ham xavfsiz — IF NOT EXISTS)
+
+-- Books
+CREATE TABLE IF NOT EXISTS books (
+    id TEXT PRIMARY KEY,
+    nomi TEXT NOT NULL
+);
+
+-- Parts (audio chapters)
+CREATE TABLE IF NOT EXISTS parts (
+    id SERIAL PRIMARY KEY,
+    book_id TEXT NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+    nomi TEXT NOT NULL,
+    audio_url TEXT NOT NULL
+);
+
+-- Genres and M2M link
+CREATE TABLE IF NOT EXISTS genres (
+    id SERIAL PRIMARY KEY,
+    nomi TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS book_genres (
+    book_id TEXT NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+    genre_id INTEGER NOT NULL REFERENCES genres(id) ON DELETE CASCADE,
+    PRIMARY KEY (book_id, genre_id)
+);
+
+-- Users & Admins
+CREATE TABLE IF NOT EXISTS users (
+    id BIGINT PRIMARY KEY,
+    name TEXT
+);
+CREATE TABLE IF NOT EXISTS admins (
+    id BIGINT PRIMARY KEY,
+    name TEXT
+);
+
+-- Feedback
+CREATE TABLE IF NOT EXISTS feedback (
+    id BIGINT,               -- user_id
+    name TEXT,
+    username TEXT,
+    text TEXT,
+    created_at TIMESTAMPTZ   -- ISO time
+);
+
+-- Book views
+CREATE TABLE IF NOT EXISTS book_views (
+    book_name TEXT PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0
+);
+
+-- Helpful index for feedback dedupe
+CREATE INDEX IF NOT EXISTS idx_feedback_user_text ON feedback (id, text);
+
+-- Telegram file_id kesh (birinchi yuborishdan keyin to'ldiriladi)
+ALTER TABLE parts ADD COLUMN IF NOT EXISTS file_id TEXT;
+
+-- Broadcast jobs (checkpoint: last_user_id — users.id bo'yicha keyset)
+CREATE TABLE IF NOT EXISTS broadcast_jobs (
+    id SERIAL PRIMARY KEY,
+    from_chat_id BIGINT NOT NULL,
+    message_id BIGINT NOT NULL,
+    admin_chat_id BIGINT NOT NULL,
+    progress_message_id BIGINT,
+    status TEXT NOT NULL DEFAULT 'running',   -- running | done
+    last_user_id BIGINT NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    sent INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_running ON broadcast_jobs (updated_at) WHERE status = 'running';
+
+-- Suhbat oqimlari uchun vaqtinchalik holat (state_store.PostgresStateStore)
+CREATE TABLE IF NOT EXISTS conversation_state (
+    owner_id BIGINT NOT NULL,
+    key TEXT NOT NULL,
+    value JSONB NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (owner_id, key)
+);
+CREATE INDEX IF NOT EXISTS idx_conversation_state_expires ON conversation_state (expires_at);
+
+-- ConversationHandler holatlari, user_data/chat_data/bot_data (persistence.PostgresPersistence)
+CREATE TABLE IF NOT EXISTS bot_persistence (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    data BYTEA NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (kind, key)
+);
@@ -0,0 +1,5 @@
+-- get_parts / delete_part_by_index: WHERE book_id = ? ORDER BY id — index-only tartib
+CREATE INDEX IF NOT EXISTS idx_parts_book_id_id ON parts (book_id, id);
+
+-- get_books_by_genre: PK (book_id, genre_id) genre_id bo'yicha qidiruvga yordam bermaydi
+CREATE INDEX IF NOT EXISTS idx_book_genres_genre_id ON book_genres (genre_id);
@@ -0,0 +1,8 @@
+-- Kitoblar tartibi: raqamli id lar son bo'yicha, qolganlari (NULL) oxirida id bo'yicha.
+-- Avval har bir so'rov ORDER BY (CASE WHEN id ~ '^\d+$' THEN id::int END) qilardi —
+-- har qatorda regex, indeks ishlatilmaydi. Endi qiymat bir marta hisoblanib saqlanadi.
+ALTER TABLE books ADD COLUMN IF NOT EXISTS sort_key BIGINT
+    GENERATED ALWAYS AS (CASE WHEN id ~ '^[0-9]{1,18}$' THEN id::bigint END) STORED;
+
+-- ORDER BY sort_key, id va MAX(sort_key) — index scan
+CREATE INDEX IF NOT EXISTS idx_books_sort_key ON books (sort_key, id);
@@ -0,0 +1,4 @@
+-- Yangi kitob id lari sequence dan olinadi: ikki admin bir vaqtda kitob qo'shsa ham
+-- bir xil id chiqmaydi (avval MAX(id)+1 alohida so'rov bilan hisoblanardi).
+CREATE SEQUENCE IF NOT EXISTS book_id_seq AS BIGINT;
+SELECT setval('book_id_seq', COALESCE((SELECT MAX(sort_key) FROM books), 0) + 1, false);
@@ -0,0 +1,14 @@
+-- Foydalanuvchi har bir kitobda oxirgi tinglagan qismi ("Davom ettirish" uchun)
+CREATE TABLE IF NOT EXISTS user_progress (
+    user_id BIGINT NOT NULL,
+    book_id TEXT NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+    part_id INTEGER NOT NULL REFERENCES parts(id) ON DELETE CASCADE,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (user_id, book_id)
+);
+
+-- Foydalanuvchining eng oxirgi tinglagan kitobi — ORDER BY updated_at DESC LIMIT 1
+CREATE INDEX IF NOT EXISTS idx_user_progress_recent ON user_progress (user_id, updated_at DESC);
+
+-- ON DELETE CASCADE (part_id) uchun
+CREATE INDEX IF NOT EXISTS idx_user_progress_part ON user_progress (part_id);
@@ -0,0 +1,34 @@
+-- Qidiruv: uz_fold() — search.fold() ning SQL nusxasi (kirill -> lotin, apostroflarsiz).
+-- lower() kirill harflarini faqat mos collation da kichraytiradi, shuning uchun
+-- katta harflar ham alohida ko'rsatilgan.
+CREATE OR REPLACE FUNCTION uz_fold(t TEXT) RETURNS TEXT
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT btrim(regexp_replace(
+        translate(
+            replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(lower(t), 'ё', 'yo'), 'Ё', 'yo'), 'ц', 'ts'), 'Ц', 'ts'), 'ч', 'ch'), 'Ч', 'ch'), 'ш', 'sh'), 'Ш', 'sh'), 'щ', 'sh'), 'Щ', 'sh'), 'ю', 'yu'), 'Ю', 'yu'), 'я', 'ya'), 'Я', 'ya'),
+            'абвгдежзийклмнопрстуфхыэўқғҳАБВГДЕЖЗИЙКЛМНОПРСТУФХЫЭЎҚҒҲ''‘’ʻʼ`´ʹъьЪЬ',
+            'abvgdejziyklmnoprstufxieoqghabvgdejziyklmnoprstufxieoqgh'
+        ),
+        '[^a-z0-9]+', ' ', 'g'
+    ))
+$$;
+
+ALTER TABLE books ADD COLUMN IF NOT EXISTS search_key TEXT
+    GENERATED ALWAYS AS (uz_fold(nomi)) STORED;
+
+-- pg_trgm: ruxsat bo'lmasa (managed DB) migratsiya to'xtamaydi — bot xotiradagi indeksga o'tadi
+DO $$
+BEGIN
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+EXCEPTION WHEN insufficient_privilege OR undefined_file THEN
+    RAISE NOTICE 'pg_trgm o''rnatilmadi: %', SQLERRM;
+END
+$$;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+        CREATE INDEX IF NOT EXISTS idx_books_search_key_trgm ON books USING gin (search_key gin_trgm_ops);
+    END IF;
+END
+$$;
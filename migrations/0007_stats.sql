@@ -0,0 +1,69 @@
+-- Statistika: users soni trigger bilan yuritiladigan hisoblagichda, kitoblar
+-- statistikasi — tayyor materialized view da (har ekran bitta indeksli so'rov)
+
+CREATE TABLE IF NOT EXISTS app_counters (
+    name TEXT PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO app_counters (name, value)
+SELECT 'users', COUNT(*) FROM users
+ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value;
+
+-- Statement darajasidagi triggerlar: COPY/ko'p qatorli INSERT ham bitta UPDATE;
+-- ON CONFLICT DO NOTHING (qayta /start) hisoblagich qatorini qulflamaydi
+CREATE OR REPLACE FUNCTION app_counters_users_ins() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE n BIGINT;
+BEGIN
+    SELECT COUNT(*) INTO n FROM new_rows;
+    IF n > 0 THEN
+        UPDATE app_counters SET value = value + n WHERE name = 'users';
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION app_counters_users_del() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE n BIGINT;
+BEGIN
+    SELECT COUNT(*) INTO n FROM old_rows;
+    IF n > 0 THEN
+        UPDATE app_counters SET value = value - n WHERE name = 'users';
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION app_counters_users_truncate() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE app_counters SET value = 0 WHERE name = 'users';
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS trg_users_count_ins ON users;
+CREATE TRIGGER trg_users_count_ins AFTER INSERT ON users
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION app_counters_users_ins();
+
+DROP TRIGGER IF EXISTS trg_users_count_del ON users;
+CREATE TRIGGER trg_users_count_del AFTER DELETE ON users
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION app_counters_users_del();
+
+DROP TRIGGER IF EXISTS trg_users_count_truncate ON users;
+CREATE TRIGGER trg_users_count_truncate AFTER TRUNCATE ON users
+    FOR EACH STATEMENT EXECUTE FUNCTION app_counters_users_truncate();
+
+-- Kitoblar statistikasi: mavjud kitoblarga tegishli ko'rishlar (view_counter flush dan keyin yangilanadi)
+CREATE MATERIALIZED VIEW IF NOT EXISTS book_stats AS
+SELECT b.id AS book_id, b.nomi, v.count AS views
+FROM book_views v
+JOIN books b ON b.nomi = v.book_name;
+
+-- REFRESH ... CONCURRENTLY uchun unique indeks shart
+CREATE UNIQUE INDEX IF NOT EXISTS idx_book_stats_book ON book_stats (book_id);
+CREATE INDEX IF NOT EXISTS idx_book_stats_views ON book_stats (views DESC, book_id);
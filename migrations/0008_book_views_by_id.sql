@@ -0,0 +1,29 @@
+-- Ko'rishlar kitob id si bo'yicha: nom o'zgarsa tarix yo'qolmaydi, kitob o'chsa — birga o'chadi.
+-- Eski (nom bo'yicha) jadval book_views_by_title nomi bilan solishtirish uchun qoldiriladi.
+
+DROP MATERIALIZED VIEW IF EXISTS book_stats;
+
+ALTER TABLE book_views RENAME TO book_views_by_title;
+ALTER TABLE book_views_by_title RENAME CONSTRAINT book_views_pkey TO book_views_by_title_pkey;
+
+CREATE TABLE book_views (
+    book_id TEXT PRIMARY KEY REFERENCES books(id) ON DELETE CASCADE,
+    count INTEGER NOT NULL DEFAULT 0
+);
+
+-- Hozirgi nomi bo'yicha ko'chiramiz (avval statistikada ham aynan shu moslik ko'rsatilardi);
+-- nomi o'zgargan kitoblarning eski yozuvlari book_views_by_title da qoladi
+INSERT INTO book_views (book_id, count)
+SELECT b.id, SUM(v.count)
+FROM book_views_by_title v
+JOIN books b ON b.nomi = v.book_name
+GROUP BY b.id;
+
+CREATE MATERIALIZED VIEW book_stats AS
+SELECT v.book_id, b.nomi, v.count AS views
+FROM book_views v
+JOIN books b ON b.id = v.book_id;
+
+-- REFRESH ... CONCURRENTLY uchun unique indeks shart
+CREATE UNIQUE INDEX idx_book_stats_book ON book_stats (book_id);
+CREATE INDEX idx_book_stats_views ON book_stats (views DESC, book_id);
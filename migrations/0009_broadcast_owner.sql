@@ -0,0 +1,3 @@
+-- Broadcast lease: jobni qaysi instance yuborayotgani. updated_at endi batchdan
+-- mustaqil heartbeat bilan yangilanadi; checkpoint faqat egasi tomonidan yoziladi
+ALTER TABLE broadcast_jobs ADD COLUMN IF NOT EXISTS owner TEXT;
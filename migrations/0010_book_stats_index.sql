@@ -0,0 +1,11 @@
+-- book_stats materialized view o'rniga to'g'ridan-to'g'ri so'rov: book_views (count DESC)
+-- indeksi bo'yicha LIMIT n qator + books PK join. Har doim joriy — nom o'zgarishi va
+-- kitob o'chirilishi darhol ko'rinadi, REFRESH (butun katalog bo'yicha) kerak emas.
+DROP MATERIALIZED VIEW IF EXISTS book_stats;
+
+CREATE INDEX IF NOT EXISTS idx_book_views_count ON book_views (count DESC, book_id);
+
+-- Eslatma: app_counters('users') — bitta "issiq" qator. users ga har bir haqiqiy
+-- INSERT/DELETE statementi shu qatorni yangilaydi (qulf commit gacha). Faqat yangi
+-- foydalanuvchilar (ON CONFLICT DO NOTHING dagi takroriy /start emas) uni qulflaydi —
+-- hozirgi oqimda yetarli; ro'yxatdan o'tish juda tezlashsa, sharded hisoblagichga o'tiladi.
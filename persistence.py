@@ -0,0 +1,183 @@
+"""
+PostgreSQL asosidagi BasePersistence: ConversationHandler holatlari,
+user_data, chat_data va bot_data deploy/restartdan keyin ham saqlanadi.
+
+- Hammasi bitta `bot_persistence(kind, key, data)` jadvalida (pickle, BYTEA).
+- Ishga tushganda jadval bir marta, bitta so'rov bilan o'qiladi.
+- Application update_interval da faqat ishlatilgan kalitlarni beradi; bu yerda
+  qiymati oxirgi yozilgandan farq qilmaganlari ham tashlab yuboriladi.
+- Qolgan o'zgarishlar bitta tranzaksiyada (unnest UPSERT + DELETE) yoziladi.
+
+Faqat BITTA instance uchun: PTB ConversationHandler holatlarini ishga tushganda
+bir marta oladi va keyin jarayon xotirasida yuritadi. Ikkinchi instance (load
+balancer ortida) o'ziga tushgan update uchun eski/yo'q holatni ko'radi va keyingi
+yozuvi boshqasining yangi qatorini bosib ketadi. Deploy da eski jarayon to'xtab
+(flush) bo'lgach yangisi ishga tushishi kerak — ikkalasi bir vaqtda ishlamasin.
+"""
+import asyncio
+import json
+import logging
+import os
+import pickle
+from typing import Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from async_storage import get_conn, open_pool
+
+logger = logging.getLogger(__name__)
+
+PERSISTENCE_INTERVAL = float(os.getenv("PERSISTENCE_INTERVAL", "30"))
+
+# (kind, key) -> pickle yoki None (o'chirish)
+_Row = Tuple[str, str]
+
+
+def _conv_kind(name: str) -> str:
+    return f"conv:{name}"
+
+
+def _conv_key(key: tuple) -> str:
+    return json.dumps(list(key), separators=(",", ":"))
+
+
+class PostgresPersistence(BasePersistence):
+    def __init__(self, update_interval: float = PERSISTENCE_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=True, chat_data=True, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self._rows: Optional[Dict[_Row, bytes]] = None  # oxirgi yozilgan (yoki o'qilgan) qiymatlar
+        self._dirty: Dict[_Row, Optional[bytes]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._load_lock = asyncio.Lock()
+
+    # ---------- O'qish ----------
+
+    async def _load(self) -> Dict[_Row, bytes]:
+        async with self._load_lock:
+            if self._rows is None:
+                # initialize() post_init dan oldin chaqiriladi — pool ni shu yerda ochamiz
+                await open_pool()
+                async with get_conn() as conn, conn.cursor() as cur:
+                    await cur.execute("SELECT kind, key, data FROM bot_persistence;")
+                    rows = await cur.fetchall()
+                self._rows = {(r["kind"], r["key"]): bytes(r["data"]) for r in rows}
+            return self._rows
+
+    async def _load_kind(self, kind: str) -> Dict[str, object]:
+        rows = await self._load()
+        return {key: pickle.loads(blob) for (k, key), blob in rows.items() if k == kind}
+
+    async def get_user_data(self) -> Dict[int, dict]:
+        return {int(k): v for k, v in (await self._load_kind("user")).items()}
+
+    async def get_chat_data(self) -> Dict[int, dict]:
+        return {int(k): v for k, v in (await self._load_kind("chat")).items()}
+
+    async def get_bot_data(self) -> dict:
+        return (await self._load_kind("bot")).get("", {})
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> Dict[tuple, object]:
+        states = await self._load_kind(_conv_kind(name))
+        return {tuple(json.loads(k)): v for k, v in states.items()}
+
+    # ---------- Yozish (faqat o'zgarganlar) ----------
+
+    def _stage(self, kind: str, key: str, value) -> None:
+        row = (kind, key)
+        blob = None if value is None else pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        written = self._rows.get(row) if self._rows is not None else None
+        if blob == written and row not in self._dirty:
+            return
+        self._dirty[row] = blob
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_soon())
+
+    async def _flush_soon(self):
+        # update_persistence barcha update_* larni gather qiladi — ular navbatga
+        # qo'yib bo'lgach bitta so'rov bilan yozamiz
+        await asyncio.sleep(0)
+        try:
+            await self._write()
+        except Exception:
+            logger.exception("Persistence yozilmadi, keyingi intervalda qayta uriniladi")
+
+    async def _write(self):
+        if not self._dirty:
+            return
+        batch, self._dirty = self._dirty, {}
+        upserts = [(k, key, blob) for (k, key), blob in batch.items() if blob is not None]
+        deletes = [(k, key) for (k, key), blob in batch.items() if blob is None]
+        try:
+            async with get_conn() as conn, conn.transaction(), conn.cursor() as cur:
+                if upserts:
+                    await cur.execute(
+                        """
+                        INSERT INTO bot_persistence (kind, key, data)
+                        SELECT * FROM unnest(%s::text[], %s::text[], %s::bytea[])
+                        ON CONFLICT (kind, key) DO UPDATE SET data = EXCLUDED.data, updated_at = now();
+                        """,
+                        ([u[0] for u in upserts], [u[1] for u in upserts], [u[2] for u in upserts])
+                    )
+                if deletes:
+                    await cur.execute(
+                        """
+                        DELETE FROM bot_persistence p
+                        USING unnest(%s::text[], %s::text[]) AS d(kind, key)
+                        WHERE p.kind = d.kind AND p.key = d.key;
+                        """,
+                        ([d[0] for d in deletes], [d[1] for d in deletes])
+                    )
+        except Exception:
+            # Yozilmaganlarini qaytaramiz (oradagi yangi qiymatlar ustun)
+            for row, blob in batch.items():
+                self._dirty.setdefault(row, blob)
+            raise
+
+        rows = self._rows if self._rows is not None else {}
+        for row, blob in batch.items():
+            if blob is None:
+                rows.pop(row, None)
+            else:
+                rows[row] = blob
+        self._rows = rows
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._stage("user", str(user_id), data or None)
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        self._stage("chat", str(chat_id), data or None)
+
+    async def update_bot_data(self, data: dict) -> None:
+        self._stage("bot", "", data or None)
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]) -> None:
+        self._stage(_conv_kind(name), _conv_key(key), new_state)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._stage("user", str(user_id), None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._stage("chat", str(chat_id), None)
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def flush(self) -> None:
+        """shutdown(): navbatdagi yozuvlarni pool yopilishidan oldin yakunlaydi."""
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        await self._write()
@@ -0,0 +1,102 @@
+"""
+Tinglash progressi (user_id, book_id) -> oxirgi qism uchun xotiradagi bufer.
+
+Har bir qism yuborilganda DB ga yozish o'rniga, oxirgi holat shu yerda
+yig'iladi (bir kitob ichida keyingi bosish oldingisini almashtiradi) va har
+PROGRESS_FLUSH_INTERVAL soniyada (hamda shutdown da) bitta UPSERT bilan yoziladi.
+Yozuvlar commit bo'lgunicha buferda ko'rinib turadi, so'ng faqat oradan
+o'zgarmaganlari olib tashlanadi.
+
+DB da davom ettiriladigan qismi yo'q foydalanuvchilar NO_PROGRESS_TTL soniya
+eslab qolinadi — ularning har /start i DB ga so'rov yubormaydi.
+"""
+import logging
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from telegram.ext import ContextTypes
+
+from async_storage import save_progress, get_continue_part, get_next_parts, get_book
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_FLUSH_INTERVAL = float(os.getenv("PROGRESS_FLUSH_INTERVAL", "30"))
+# Kitobga yangi qism qo'shilsa "tugatilgan" kitob yana davom ettiriladigan bo'ladi — shuning uchun TTL
+NO_PROGRESS_TTL = 600
+_MAX_NO_PROGRESS = 100_000
+
+# (user_id, book_id) -> (part_id, unix_ts)
+_pending: Dict[Tuple[int, str], Tuple[int, float]] = {}
+# user_id -> (book_id, part_id, unix_ts): foydalanuvchining buferdagi eng oxirgi pozitsiyasi
+_latest: Dict[int, Tuple[str, int, float]] = {}
+# user_id -> monotonic muddati: DB da davom ettiriladigan qism topilmagan
+_no_progress: Dict[int, float] = {}
+
+
+def record_progress(user_id: int, book_id: str, part_id: int):
+    ts = time.time()
+    _pending[(user_id, book_id)] = (part_id, ts)
+    _latest[user_id] = (book_id, part_id, ts)
+    _no_progress.pop(user_id, None)
+
+
+def _remember_no_progress(user_id: int):
+    now = time.monotonic()
+    _no_progress[user_id] = now + NO_PROGRESS_TTL
+    if len(_no_progress) > _MAX_NO_PROGRESS:
+        for uid in [u for u, exp in _no_progress.items() if exp <= now]:
+            del _no_progress[uid]
+        if len(_no_progress) > _MAX_NO_PROGRESS:
+            _no_progress.clear()
+
+
+def _last_pending(user_id: int) -> Optional[Tuple[str, int]]:
+    """Buferdagi (hali yozilmagan) eng oxirgi pozitsiya: (book_id, part_id) — O(1)."""
+    latest = _latest.get(user_id)
+    return (latest[0], latest[1]) if latest else None
+
+
+async def continue_part(user_id: int) -> Optional[dict]:
+    """
+    "Davom ettirish" uchun keyingi qism (book_nomi bilan).
+    Buferda bo'lsa katalog keshidan, aks holda bitta DB so'rovi bilan.
+    """
+    pending = _last_pending(user_id)
+    if pending is None:
+        expires_at = _no_progress.get(user_id)
+        if expires_at is not None and expires_at > time.monotonic():
+            return None
+        part = await get_continue_part(user_id)
+        if part is None:
+            _remember_no_progress(user_id)
+        return part
+    book_id, part_id = pending
+    nxt = await get_next_parts(part_id)
+    book = await get_book(book_id)
+    if not nxt or not book:
+        return None
+    return {**nxt[0], "book_nomi": book["nomi"]}
+
+
+async def flush_progress(context: ContextTypes.DEFAULT_TYPE = None):
+    """JobQueue callback va post_shutdown: yig'ilgan progressni DB ga yozadi."""
+    if not _pending:
+        return
+    # Nusxa yoziladi, bufer esa commit gacha o'z joyida: shu paytdagi /start
+    # DB dagi eski qatorni emas, buferdagi holatni ko'radi
+    batch = dict(_pending)
+    latest = dict(_latest)
+    try:
+        await save_progress([(uid, bid, pid, ts) for (uid, bid), (pid, ts) in batch.items()])
+    except Exception:
+        # Bufer tegilmagan — keyingi flush da qayta uriniladi
+        logger.exception("Progress flush failed (%d rows)", len(batch))
+        return
+    # Faqat yozilgan qiymati o'zgarmaganlarini olib tashlaymiz; oradagi yangi bosishlar qoladi
+    for key, value in batch.items():
+        if _pending.get(key) == value:
+            del _pending[key]
+    for uid, value in latest.items():
+        if _latest.get(uid) == value:
+            del _latest[uid]
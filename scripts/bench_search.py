@@ -0,0 +1,125 @@
+"""
+Xotiradagi qidiruv indeksini (search.NgramIndex) lokal o'lchash — DB kerak emas.
+
+    python scripts/bench_search.py --books 20000 --queries 2000
+
+Nomlar data/books.json dan olinadi va kerakli songacha sun'iy variantlar bilan
+ko'paytiriladi (kirill yozuv, apostrof variantlari, tartib raqamlari).
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # project root ni import yo'liga qo'shish
+
+import argparse
+import json
+import random
+import statistics
+import time
+
+from search import NgramIndex, fold
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+BOOKS_JSON = BASE_DIR / "data" / "books.json"
+
+_LAT_TO_CYR = {"sh": "ш", "ch": "ч", "o'": "ў", "g'": "ғ", "a": "а", "b": "б", "d": "д", "e": "е",
+               "f": "ф", "g": "г", "h": "ҳ", "i": "и", "j": "ж", "k": "к", "l": "л", "m": "м",
+               "n": "н", "o": "о", "p": "п", "q": "қ", "r": "р", "s": "с", "t": "т", "u": "у",
+               "v": "в", "x": "х", "y": "й", "z": "з"}
+_APOSTROPHES = ["'", "‘", "ʻ", "’"]
+
+
+def to_cyrillic(text: str) -> str:
+    out, i, low = [], 0, text.lower()
+    while i < len(low):
+        pair = low[i:i + 2]
+        if pair in _LAT_TO_CYR:
+            out.append(_LAT_TO_CYR[pair])
+            i += 2
+        else:
+            out.append(_LAT_TO_CYR.get(low[i], low[i]))
+            i += 1
+    return "".join(out)
+
+
+def load_titles() -> list[str]:
+    if BOOKS_JSON.exists():
+        data = json.loads(BOOKS_JSON.read_text(encoding="utf-8"))
+        titles = [b.get("nomi", "") for b in data.get("kitoblar", []) if b.get("nomi")]
+        if titles:
+            return titles
+    return ["O'tkan kunlar", "Mehrobdan chayon", "Kecha va kunduz", "Sarob", "Ikki eshik orasi"]
+
+
+def make_books(n: int, rng: random.Random) -> list[dict]:
+    base = load_titles()
+    books = []
+    for i in range(n):
+        title = base[i % len(base)]
+        variant = rng.random()
+        if variant < 0.2:
+            title = to_cyrillic(title)
+        elif variant < 0.4:
+            title = title.replace("'", rng.choice(_APOSTROPHES))
+        if i >= len(base):
+            title = f"{title} {i // len(base) + 1}-kitob"
+        books.append({"id": str(i + 1), "nomi": title})
+    return books
+
+
+def make_queries(books: list[dict], n: int, rng: random.Random) -> list[str]:
+    queries = []
+    for _ in range(n):
+        title = rng.choice(books)["nomi"]
+        words = title.split()
+        q = " ".join(words[:rng.randint(1, len(words))])
+        if rng.random() < 0.3 and len(q) > 4:
+            # bitta harf tushib qolgan (typo)
+            pos = rng.randrange(len(q))
+            q = q[:pos] + q[pos + 1:]
+        if rng.random() < 0.3:
+            q = to_cyrillic(q)
+        queries.append(q)
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="search.NgramIndex benchmark")
+    parser.add_argument("--books", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    books = make_books(args.books, rng)
+    queries = make_queries(books, args.queries, rng)
+
+    t0 = time.perf_counter()
+    index = NgramIndex(books)
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    timings, empty = [], 0
+    for q in queries:
+        t = time.perf_counter()
+        hits = index.search(q, args.limit)
+        timings.append((time.perf_counter() - t) * 1000)
+        empty += not hits
+
+    timings.sort()
+    print(f"📚 Kitoblar: {len(books)} | 🔎 So'rovlar: {len(queries)}")
+    print(f"🏗  Indeks qurish: {build_ms:.1f} ms")
+    print(f"⏱  So'rov: o'rtacha {statistics.mean(timings):.3f} ms, "
+          f"p50 {timings[len(timings) // 2]:.3f} ms, p95 {timings[int(len(timings) * 0.95)]:.3f} ms, "
+          f"max {timings[-1]:.3f} ms")
+    print(f"😕 Natijasiz so'rovlar: {empty}")
+    sample = queries[0]
+    print(f"\nNamuna: {sample!r} -> {fold(sample)!r}")
+    for score, b in index.search(sample, 5):
+        print(f"  {score:.2f}  {b['nomi']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,17 @@
+"""
+data/*.json -> PostgreSQL import (oqimli, to'plamli).
+
+    python scripts/migrate_from_json.py            # import
+    python scripts/migrate_from_json.py --dry-run  # DB siz: faqat o'qish, tekshirish va tezlik
+
+- JSON fayllar bo'laklab o'qiladi (JsonStream): xotirada faqat joriy yozuv
+  (masalan, bitta kitob qismlari bilan) va bitta to'plam turadi.
+- Har bir jadval BATCH_ROWS lik to'plamlarda yoziladi: COPY -> vaqtinchalik
+  jadval -> bitta INSERT ... SELECT (ON CONFLICT / NOT EXISTS bilan dublikatlar
+  o'tkazib yuboriladi), har to'plam bitta tranzaksiyada.
+- Ko'rishlar soni har bir kitob uchun yakuniy qiymati bilan bitta yozuvda yoziladi
+  (avval count marta increment qilinardi); qayta ishga tushirish sonni oshirmaydi.
+"""
 from __future__ import annotations
 
 from pathlib import Path
@@ -5,32 +19,22 @@ import sys
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # project root ni import yo'liga qo'shish
 
+import argparse
 import json
-import os
 import shutil
+import time
 from datetime import datetime
-from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
 
 # Loyiha ildizidan ishga tushiriladi deb faraz qilamiz
 BASE_DIR = Path(__file__).resolve().parents[1]
 DATA_DIR = BASE_DIR / "data"
 BACKUP_DIR = DATA_DIR / "backups"
-DB_FILE = DATA_DIR / "app.db"
 
-# storage dagi CRUD funksiyalar
+SOURCES = ("books.json", "book_views.json", "users.json", "admins.json", "feedback.json")
 
-from storage import (
-    init_db,
-    add_book,
-    get_books,
-    add_part,
-    get_parts,
-    add_user,
-    add_admin,
-    add_feedback,
-    increment_book_view,
-)
+BATCH_ROWS = 5_000
+CHUNK_SIZE = 1 << 16  # fayldan bir marta o'qiladigan belgilar soni
 
 
 # ---------- Yordamchi funksiyalar ----------
@@ -39,16 +43,6 @@ def ts() -> str:
     return datetime.now().strftime("%Y%m%d-%H%M%S")
 
 
-def safe_read_json(path: Path, default: Any) -> Any:
-    if not path.exists():
-        return default
-    try:
-        with path.open("r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return default
-
-
 def backup_file(path: Path) -> None:
     BACKUP_DIR.mkdir(parents=True, exist_ok=True)
     if path.exists():
@@ -60,272 +54,402 @@ def ensure_data_dir():
     DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def index_books_by_id() -> Dict[str, dict]:
-    """DB dagi books ni id->row ko'rinishida qaytaradi."""
-    rows = get_books()
-    return {row["id"]: row for row in rows}
-
-
-def index_parts_by_book(book_id: str) -> Dict[Tuple[str, str], dict]:
-    """(nomi, audio_url) bo'yicha indeks — dublikatni oldini olish uchun."""
-    rows = get_parts(book_id)
-    return {(row["nomi"], row["audio_url"]): row for row in rows}
+# ---------- Oqimli JSON o'quvchi ----------
 
+class JsonStream:
+    """
+    json.JSONDecoder.raw_decode ustidagi oqimli o'quvchi: massiv/ob'ekt
+    elementlari bittalab dekodlanadi, bufer faqat joriy element uchun o'sadi.
+    """
+    _WS = " \t\r\n"
+
+    def __init__(self, f, chunk_size: int = CHUNK_SIZE):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        data = self._f.read(self._chunk_size)
+        if not data:
+            self._eof = True
+            return False
+        # O'qib bo'lingan qismni tashlaymiz — bufer joriy element bilan chegaralanadi
+        self._buf = self._buf[self._pos:] + data
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Keyingi bo'sh bo'lmagan belgi ('' — fayl oxiri)."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in self._WS:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _take(self, expected: str) -> str:
+        ch = self.peek()
+        if not ch or ch not in expected:
+            raise ValueError(f"JSON: {expected!r} kutilgan, {ch or 'EOF'!r} topildi")
+        self._pos += 1
+        return ch
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue  # element bo'lak chegarasida kesilgan
+                raise
+            if end == len(self._buf) and self._fill():
+                continue  # son (masalan 12|3) bo'lak oxirida tugagan bo'lishi mumkin
+            self._pos = end
+            return value
+
+    def iter_array(self) -> Iterator[Any]:
+        self._take("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self._take(",]") == "]":
+                return
+
+    def iter_keys(self) -> Iterator[str]:
+        """Ob'ekt kalitlari; har bir kalitdan keyin chaqiruvchi qiymatni o'qishi shart."""
+        self._take("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self._take(":")
+            yield key
+            if self._take(",}") == "}":
+                return
+
+
+def _open_stream(path: Path):
+    if not path.exists():
+        return None, None
+    f = path.open("r", encoding="utf-8")
+    return f, JsonStream(f)
 
-# ---------- Migratsiya bosqichlari ----------
 
-def migrate_books_and_parts() -> Tuple[int, int, int, int]:
+def stream_array(path: Path, key: Optional[str] = None) -> Iterator[Any]:
     """
-    data/books.json dan:
-    {
-      "kitoblar": [
-        {
-          "id": "1",
-          "nomi": "Kitob nomi",
-          "qismlar": [
-            {"nomi": "1-qism", "audio_url": "https://t.me/kanal/123"},
-            ...
-          ]
-        },
-        ...
-      ]
-    }
+    Massiv elementlari bittalab: ildiz massiv yoki ildiz ob'ektning `key` massivi
+    (qolgan a'zolar o'tkazib yuboriladi). Fayl yo'q/bo'sh yoki shakl boshqa bo'lsa — hech narsa.
     """
-    books_json = safe_read_json(DATA_DIR / "books.json", default={})
-    all_books = books_json.get("kitoblar", [])
-    if not isinstance(all_books, list):
-        all_books = []
+    f, stream = _open_stream(path)
+    if f is None:
+        return
+    with f:
+        first = stream.peek()
+        if first == "[" and key is None:
+            yield from stream.iter_array()
+        elif first == "{" and key is not None:
+            for name in stream.iter_keys():
+                if name == key and stream.peek() == "[":
+                    yield from stream.iter_array()
+                else:
+                    stream.value()
+
+
+def stream_items(path: Path) -> Iterator[Tuple[str, Any]]:
+    """Ildiz ob'ekt a'zolari (kalit, qiymat) juftlari bittalab."""
+    f, stream = _open_stream(path)
+    if f is None:
+        return
+    with f:
+        if stream.peek() == "{":
+            for name in stream.iter_keys():
+                yield name, stream.value()
 
-    # Backup qilamiz (asliga tegmaydi)
-    backup_file(DATA_DIR / "books.json")
 
-    existed_books = index_books_by_id()
+# ---------- To'plamli yozuvchi ----------
 
-    added_books = 0
-    skipped_books = 0
-    added_parts = 0
-    skipped_parts = 0
+class Loader:
+    """
+    Qatorlarni to'playdi va har batch_rows da yozadi:
+    COPY _import_<name> -> merge_sql (INSERT ... SELECT FROM _import_<name>).
+    conn=None (dry-run) bo'lsa faqat sanaydi.
+    """
 
-    for b in all_books:
+    def __init__(self, conn, name: str, columns: Sequence[str], merge_sql: str,
+                 batch_rows: int = BATCH_ROWS, depends: Optional["Loader"] = None,
+                 unmatched_sql: Optional[str] = None):
+        self.conn = conn
+        self.name = name
+        self.merge_sql = merge_sql
+        # Merge dan oldin: staging dagi qaysi qatorlar hech narsaga bog'lanmaydi (hisobot uchun)
+        self.unmatched_sql = unmatched_sql
+        self.unmatched = 0
+        self.batch_rows = batch_rows
+        self.depends = depends  # FK: avval shu loader yoziladi (parts -> books)
+        self.staged = 0
+        self.added = 0
+        self.invalid = 0
+        self._names = ", ".join(c.split()[0] for c in columns)
+        self._rows: List[tuple] = []
+        if conn is not None:
+            # ON COMMIT DELETE ROWS: har to'plam tranzaksiyasi tugashi bilan staging tozalanadi
+            conn.execute(
+                f"CREATE TEMP TABLE IF NOT EXISTS _import_{name} "
+                f"(seq BIGINT, {', '.join(columns)}) ON COMMIT DELETE ROWS;"
+            )
+
+    def add(self, *values) -> None:
+        self.staged += 1
+        self._rows.append((self.staged, *values))
+        if len(self._rows) >= self.batch_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.depends is not None:
+            self.depends.flush()
+        rows, self._rows = self._rows, []
+        if not rows or self.conn is None:
+            return
+        with self.conn.transaction(), self.conn.cursor() as cur:
+            with cur.copy(f"COPY _import_{self.name} (seq, {self._names}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+            if self.unmatched_sql:
+                cur.execute(self.unmatched_sql)
+                self.unmatched += cur.fetchone()["n"]
+            cur.execute(self.merge_sql)
+            self.added += max(cur.rowcount, 0)
+
+    def report(self, label: str, elapsed: float, dry_run: bool) -> str:
+        rate = self.staged / elapsed if elapsed > 0 else 0.0
+        if dry_run:
+            return f"{label}: {self.staged} yaroqli, {self.invalid} yaroqsiz ({rate:,.0f} qator/s)"
+        skipped = self.invalid + max(self.staged - self.added, 0)
+        unmatched = f" (mos kelmadi: {self.unmatched})" if self.unmatched_sql else ""
+        return f"{label}: +{self.added}, skip {skipped}{unmatched} ({rate:,.0f} qator/s)"
+
+
+MERGE_BOOKS = """
+    INSERT INTO books (id, nomi)
+    SELECT id, nomi FROM _import_books ORDER BY seq
+    ON CONFLICT (id) DO NOTHING;
+"""
+# Bir kitob ichida (nomi, audio_url) dublikatlari — mavjudlari ham, fayl ichidagilari ham — o'tkazib yuboriladi
+MERGE_PARTS = """
+    INSERT INTO parts (book_id, nomi, audio_url)
+    SELECT s.book_id, s.nomi, s.audio_url
+    FROM (
+        SELECT DISTINCT ON (book_id, nomi, audio_url) seq, book_id, nomi, audio_url
+        FROM _import_parts
+        ORDER BY book_id, nomi, audio_url, seq
+    ) s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM parts p
+        WHERE p.book_id = s.book_id AND p.nomi = s.nomi AND p.audio_url = s.audio_url
+    )
+    ORDER BY s.seq;
+"""
+# book_views.json nom bo'yicha — book_views esa kitob id si bo'yicha; mos kitobi yo'q nomlar o'tkazib yuboriladi.
+# Bir xil nomli kitoblar bo'lsa ko'rishlar faqat bittasiga (kitoblar tartibida birinchisiga) yoziladi —
+# aks holda har biri to'liq sonni olib, ko'rishlar ikki marta hisoblanardi.
+# GREATEST: qayta ishga tushirish idempotent, import dan keyin bot yig'gan ko'rishlar ham yo'qolmaydi
+MERGE_VIEWS = """
+    WITH titles AS (
+        SELECT DISTINCT ON (b.nomi) b.nomi, b.id
+        FROM books b
+        JOIN _import_book_views s ON s.book_name = b.nomi
+        ORDER BY b.nomi, b.sort_key, b.id
+    )
+    INSERT INTO book_views (book_id, count)
+    SELECT t.id, MAX(s.count)
+    FROM _import_book_views s
+    JOIN titles t ON t.nomi = s.book_name
+    GROUP BY t.id
+    ON CONFLICT (book_id) DO UPDATE SET count = GREATEST(book_views.count, EXCLUDED.count);
+"""
+UNMATCHED_VIEWS = """
+    SELECT COUNT(*) AS n FROM _import_book_views s
+    WHERE NOT EXISTS (SELECT 1 FROM books b WHERE b.nomi = s.book_name);
+"""
+MERGE_USERS = """
+    INSERT INTO users (id, name)
+    SELECT id, name FROM _import_users ORDER BY seq
+    ON CONFLICT (id) DO NOTHING;
+"""
+MERGE_ADMINS = """
+    INSERT INTO admins (id, name)
+    SELECT id, name FROM _import_admins ORDER BY seq
+    ON CONFLICT (id) DO NOTHING;
+"""
+MERGE_FEEDBACK = """
+    INSERT INTO feedback (id, name, username, text, created_at)
+    SELECT id, name, username, text, now() FROM _import_feedback ORDER BY seq;
+"""
+
+
+# ---------- Manbalar ----------
+
+def load_books_and_parts(books: Loader, parts: Loader) -> None:
+    """
+    data/books.json:
+    {"kitoblar": [{"id": "1", "nomi": "Kitob nomi",
+                   "qismlar": [{"nomi": "1-qism", "audio_url": "https://t.me/kanal/123"}, ...]}, ...]}
+    """
+    for b in stream_array(DATA_DIR / "books.json", key="kitoblar"):
+        if not isinstance(b, dict):
+            books.invalid += 1
+            continue
         book_id = str(b.get("id") or "").strip()
         nomi = str(b.get("nomi") or "").strip()
-
         if not book_id or not nomi:
-            # invalid yozuv — tashlab ketamiz
-            skipped_books += 1
+            books.invalid += 1
             continue
+        books.add(book_id, nomi)
 
-        if book_id in existed_books:
-            skipped_books += 1
-        else:
-            try:
-                add_book(book_id, nomi)
-                added_books += 1
-            except Exception:
-                # ehtimol parallel ishga tushirishda poyga — tashlab ketamiz
-                skipped_books += 1
-
-        # Qismlar
-        parts = b.get("qismlar", [])
-        if isinstance(parts, list):
-            # dublikatni oldini olish uchun mavjudlarni indekslaymiz
-            existing_map = index_parts_by_book(book_id)
-            for p in parts:
-                p_nomi = str(p.get("nomi") or "").strip()
-                p_url = str(p.get("audio_url") or "").strip()
-                key = (p_nomi, p_url)
-                if not p_nomi or not p_url:
-                    skipped_parts += 1
-                    continue
-                if key in existing_map:
-                    skipped_parts += 1
-                    continue
-                try:
-                    add_part(book_id, p_nomi, p_url)
-                    added_parts += 1
-                except Exception:
-                    skipped_parts += 1
-
-    return added_books, skipped_books, added_parts, skipped_parts
-
-
-def migrate_book_views() -> Tuple[int, int]:
-    """
-    data/book_views.json dan:
-    {
-      "Kitob nomi": 12,
-      ...
-    }
-    """
-    views_json = safe_read_json(DATA_DIR / "book_views.json", default={})
-    if not isinstance(views_json, dict):
-        views_json = {}
+        qismlar = b.get("qismlar")
+        if not isinstance(qismlar, list):
+            continue
+        for p in qismlar:
+            if not isinstance(p, dict):
+                parts.invalid += 1
+                continue
+            p_nomi = str(p.get("nomi") or "").strip()
+            p_url = str(p.get("audio_url") or "").strip()
+            if not p_nomi or not p_url:
+                parts.invalid += 1
+                continue
+            parts.add(book_id, p_nomi, p_url)
 
-    backup_file(DATA_DIR / "book_views.json")
 
-    added = 0
-    skipped = 0
-    for book_name, count in views_json.items():
+def load_book_views(views: Loader) -> None:
+    """data/book_views.json: {"Kitob nomi": 12, ...}"""
+    for book_name, count in stream_items(DATA_DIR / "book_views.json"):
         try:
             cnt = int(count)
-        except Exception:
-            skipped += 1
+        except (TypeError, ValueError):
+            views.invalid += 1
             continue
-        if not book_name:
-            skipped += 1
+        if not book_name or cnt <= 0:
+            views.invalid += 1
             continue
-        try:
-            # count marta increment qilamiz (kichik son bo'lsa ok; juda katta bo'lsa sekinlashishi mumkin)
-            for _ in range(cnt):
-                increment_book_view(book_name)
-            added += 1
-        except Exception:
-            skipped += 1
+        views.add(book_name, cnt)
 
-    return added, skipped
 
+def _person_row(key: str, val: Any) -> Optional[Tuple[int, str]]:
+    """{"8027031316": {"id": 8027031316, "name": "..."}} yoki {"8027031316": "name"}."""
+    try:
+        if isinstance(val, dict):
+            pid = int(val.get("id") or key)
+            name = str(val.get("name") or "")[:255]
+        else:
+            pid = int(key)
+            name = str(val)[:255]
+    except (TypeError, ValueError):
+        return None
+    return (pid, name) if pid > 0 else None
+
+
+def load_people(loader: Loader, fname: str) -> None:
+    """data/users.json va data/admins.json (admin_manage.load_admins() formati)."""
+    for key, val in stream_items(DATA_DIR / fname):
+        row = _person_row(key, val)
+        if row is None:
+            loader.invalid += 1
+        else:
+            loader.add(*row)
 
-def migrate_users() -> Tuple[int, int]:
-    """
-    data/users.json — ko‘rganlaridan kelib chiqib:
-    {
-      "8027031316": {"id": 8027031316, "name": "Behruz"},
-      ...
-    }
-    yoki ba'zan shunchaki dict bo‘lishi mumkin.
-    """
-    users_json = safe_read_json(DATA_DIR / "users.json", default={})
-    if not isinstance(users_json, dict):
-        users_json = {}
-
-    backup_file(DATA_DIR / "users.json")
 
-    added = 0
-    skipped = 0
-    for key, val in users_json.items():
+def load_feedback(feedback: Loader) -> None:
+    """data/feedback.json: [{"id": 123, "name": "...", "username": "...", "text": "..."}, ...]"""
+    for fb in stream_array(DATA_DIR / "feedback.json"):
         try:
-            if isinstance(val, dict):
-                uid = int(val.get("id") or key)
-                name = str(val.get("name") or "")[:255]
-            else:
-                uid = int(key)
-                name = str(val)[:255]
-            if uid <= 0:
-                skipped += 1
-                continue
-            try:
-                add_user(uid, name)
-                added += 1
-            except Exception:
-                # PK bor — demak avvaldan mavjud
-                skipped += 1
-        except Exception:
-            skipped += 1
-
-    return added, skipped
+            uid = int(fb.get("id"))
+        except (AttributeError, TypeError, ValueError):
+            feedback.invalid += 1
+            continue
+        text = str(fb.get("text") or "").strip()
+        if not text:
+            feedback.invalid += 1
+            continue
+        feedback.add(uid, str(fb.get("name") or "")[:255], str(fb.get("username") or "")[:255], text)
 
 
-def migrate_admins() -> Tuple[int, int]:
-    """
-    data/admins.json — admin_manage.py’dagi load_admins() formatiga mos:
-    {
-      "8027031316": {"id": 8027031316, "name": "Behruz"},
-      ...
-    }
-    """
-    admins_json = safe_read_json(DATA_DIR / "admins.json", default={})
-    if not isinstance(admins_json, dict):
-        admins_json = {}
+# ---------- Ishga tushirish ----------
 
-    backup_file(DATA_DIR / "admins.json")
+def run_phase(source: str, fill, labelled: Sequence[Tuple[str, Loader]], dry_run: bool) -> None:
+    t0 = time.perf_counter()
+    loaders = [loader for _, loader in labelled]
+    try:
+        fill(*loaders)
+    except ValueError as e:  # json.JSONDecodeError ham
+        print(f"❌ {source}: buzuq JSON, shu joygacha o'qilgani yoziladi — {e}")
+    for loader in loaders:
+        loader.flush()
+    elapsed = time.perf_counter() - t0
+    print(" | ".join(loader.report(label, elapsed, dry_run) for label, loader in labelled))
 
-    added = 0
-    skipped = 0
-    for key, val in admins_json.items():
-        try:
-            if isinstance(val, dict):
-                aid = int(val.get("id") or key)
-                name = str(val.get("name") or "")[:255]
-            else:
-                aid = int(key)
-                name = str(val)[:255]
-            if aid <= 0:
-                skipped += 1
-                continue
-            try:
-                add_admin(aid, name)
-                added += 1
-            except Exception:
-                skipped += 1
-        except Exception:
-            skipped += 1
 
-    return added, skipped
+def run(conn, batch_rows: int, dry_run: bool) -> None:
+    def loader(name, columns, merge_sql, depends=None, unmatched_sql=None):
+        return Loader(conn, name, columns, merge_sql, batch_rows=batch_rows, depends=depends,
+                      unmatched_sql=unmatched_sql)
 
+    books = loader("books", ["id TEXT", "nomi TEXT"], MERGE_BOOKS)
+    parts = loader("parts", ["book_id TEXT", "nomi TEXT", "audio_url TEXT"], MERGE_PARTS, depends=books)
+    run_phase("books.json", load_books_and_parts, [("📚 Books", books), ("🎧 Parts", parts)], dry_run)
 
-def migrate_feedback() -> Tuple[int, int]:
-    """
-    data/feedback.json:
-    [
-      {"id": 123, "name": "...", "username": "...", "text": "..."},
-      ...
-    ]
-    """
-    feedback_json = safe_read_json(DATA_DIR / "feedback.json", default=[])
-    if not isinstance(feedback_json, list):
-        feedback_json = []
+    views = loader("book_views", ["book_name TEXT", "count BIGINT"], MERGE_VIEWS, unmatched_sql=UNMATCHED_VIEWS)
+    run_phase("book_views.json", load_book_views, [("📊 Book views", views)], dry_run)
 
-    backup_file(DATA_DIR / "feedback.json")
+    users = loader("users", ["id BIGINT", "name TEXT"], MERGE_USERS)
+    run_phase("users.json", lambda l: load_people(l, "users.json"), [("👥 Users", users)], dry_run)
 
-    added = 0
-    skipped = 0
-    for fb in feedback_json:
-        try:
-            uid = int(fb.get("id"))
-            name = str(fb.get("name") or "")[:255]
-            username = str(fb.get("username") or "")[:255]
-            text = str(fb.get("text") or "")
-            if not text:
-                skipped += 1
-                continue
-            try:
-                add_feedback(uid, name, username, text)
-                added += 1
-            except Exception:
-                skipped += 1
-        except Exception:
-            skipped += 1
+    admins = loader("admins", ["id BIGINT", "name TEXT"], MERGE_ADMINS)
+    run_phase("admins.json", lambda l: load_people(l, "admins.json"), [("👮 Admins", admins)], dry_run)
 
-    return added, skipped
+    feedback = loader("feedback", ["id BIGINT", "name TEXT", "username TEXT", "text TEXT"], MERGE_FEEDBACK)
+    run_phase("feedback.json", load_feedback, [("💬 Feedback", feedback)], dry_run)
 
 
 def main():
-    print("➡️  Migratsiya boshlandi...")
-    ensure_data_dir()
-
-    # DB tayyorlab olamiz
-    print("ℹ️  DB init (tables, pragmas)...")
-    init_db()
-    if not DB_FILE.exists():
-        print("❌ DB fayli yaratilmagan ko‘rinadi (data/app.db yo‘q). storage.init_db() ni tekshiring.")
-        return
-
-    # Har bir blokni alohida migratsiya qilamiz
-    b_add, b_skip, p_add, p_skip = migrate_books_and_parts()
-    print(f"📚 Books: +{b_add}, skip {b_skip} | 🎧 Parts: +{p_add}, skip {p_skip}")
-
-    v_add, v_skip = migrate_book_views()
-    print(f"📊 Book views: +{v_add}, skip {v_skip}")
-
-    u_add, u_skip = migrate_users()
-    print(f"👥 Users: +{u_add}, skip {u_skip}")
-
-    a_add, a_skip = migrate_admins()
-    print(f"👮 Admins: +{a_add}, skip {a_skip}")
-
-    f_add, f_skip = migrate_feedback()
-    print(f"💬 Feedback: +{f_add}, skip {f_skip}")
+    parser = argparse.ArgumentParser(description="data/*.json -> PostgreSQL import")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="DB ga ulanmasdan faqat o'qish, tekshirish va tezlikni o'lchash")
+    parser.add_argument("--batch", type=int, default=BATCH_ROWS, help="bitta COPY to'plamidagi qatorlar")
+    args = parser.parse_args()
 
+    print("➡️  Migratsiya boshlandi..." + (" (dry-run)" if args.dry_run else ""))
+    ensure_data_dir()
+    total_bytes = sum((DATA_DIR / name).stat().st_size for name in SOURCES if (DATA_DIR / name).exists())
+    t0 = time.perf_counter()
+
+    if args.dry_run:
+        run(None, args.batch, dry_run=True)
+    else:
+        # storage import paytida DATABASE_URL talab qiladi — dry-run usiz ishlashi uchun shu yerda
+        from storage import init_db, get_conn, sync_book_id_seq
+
+        print("ℹ️  DB init (migratsiyalar)...")
+        init_db()
+        for name in SOURCES:
+            backup_file(DATA_DIR / name)  # asliga tegmaydi
+        with get_conn() as conn:
+            run(conn, args.batch, dry_run=False)
+        sync_book_id_seq()  # keyingi yangi kitob id si import qilinganlar bilan to'qnashmasin
+
+    elapsed = time.perf_counter() - t0
+    mb = total_bytes / (1 << 20)
+    print(f"⏱  {elapsed:.2f} s, {mb:.2f} MB ({mb / elapsed if elapsed > 0 else 0:.1f} MB/s)")
     print("✅ Migratsiya yakunlandi.")
 
 
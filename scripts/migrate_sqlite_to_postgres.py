@@ -1,3 +1,16 @@
+"""
+data/app.db (eski SQLite baza, sxemasi storage.py oxirida izohda) -> PostgreSQL.
+
+    python scripts/migrate_sqlite_to_postgres.py [--sqlite data/app.db] [--jobs 4] [--batch 10000]
+
+- Jadvallar FK tartibida ikki bosqichda ko'chiriladi; bir bosqichdagi mustaqil
+  jadvallar parallel (har biri o'z SQLite va PostgreSQL ulanishida).
+- SQLite dan fetchmany bilan o'qiladi va to'g'ridan-to'g'ri COPY FROM STDIN ga
+  yoziladi; PostgreSQL jadvali bo'sh bo'lmasa — vaqtinchalik jadval orqali
+  INSERT ... ON CONFLICT DO NOTHING (qayta ishga tushirish xavfsiz).
+- Tekshiruv: qatorlar soni va tartibga bog'liq bo'lmagan checksum (har qator
+  md5 ining birinchi 8 bayti yig'indisi) ikkala tomonda solishtiriladi.
+"""
 from __future__ import annotations
 
 from pathlib import Path
@@ -5,327 +18,235 @@ import sys
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # project root ni import yo'liga qo'shish
 
-import json
-import os
-import shutil
-from datetime import datetime
-from pathlib import Path
-from typing import Any, Dict, List, Tuple
+import argparse
+import hashlib
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from storage import init_db, get_conn, pool, sync_book_id_seq
 
-# Loyiha ildizidan ishga tushiriladi deb faraz qilamiz
 BASE_DIR = Path(__file__).resolve().parents[1]
-DATA_DIR = BASE_DIR / "data"
-BACKUP_DIR = DATA_DIR / "backups"
-DB_FILE = DATA_DIR / "app.db"
-
-# storage dagi CRUD funksiyalar
-
-from storage import (
-    init_db,
-    add_book,
-    get_books,
-    add_part,
-    get_parts,
-    add_user,
-    add_admin,
-    add_feedback,
-    increment_book_view,
+DB_FILE = BASE_DIR / "data" / "app.db"
+
+BATCH_ROWS = 10_000
+JOBS = 4
+
+# jadval -> ustunlar (eski SQLite sxemasi bilan bir xil nomlar)
+TABLES: Dict[str, Tuple[str, ...]] = {
+    "books": ("id", "nomi"),
+    "genres": ("id", "nomi"),
+    "users": ("id", "name"),
+    "admins": ("id", "name"),
+    "feedback": ("id", "name", "username", "text", "created_at"),
+    "book_views": ("book_name", "count"),
+    "parts": ("id", "book_id", "nomi", "audio_url"),
+    "book_genres": ("book_id", "genre_id"),
+}
+# FK: parts/book_genres/book_views books va genres dan keyin
+PHASES: Tuple[Tuple[str, ...], ...] = (
+    ("users", "books", "feedback", "genres", "admins"),
+    ("parts", "book_genres", "book_views"),
 )
-
-
-# ---------- Yordamchi funksiyalar ----------
-
-def ts() -> str:
-    return datetime.now().strftime("%Y%m%d-%H%M%S")
-
-
-def safe_read_json(path: Path, default: Any) -> Any:
-    if not path.exists():
-        return default
+# SERIAL ustunlar: id lar ko'chirilgandan keyin sequence surib qo'yiladi
+SERIAL_TABLES = ("parts", "genres")
+# created_at SQLite da isoformat matn, PostgreSQL da TIMESTAMPTZ — matn ko'rinishi farq qiladi
+CHECKSUM_SKIP = {"feedback": {"created_at"}}
+# SQLite da nom bo'yicha, PostgreSQL da kitob id si bo'yicha: staging ustunlari va merge so'rovi.
+# Bir xil nomli kitoblardan faqat birinchisi (sort_key, id) oladi — ko'rishlar ikki marta sanalmasin
+TRANSFORM = {
+    "book_views": (
+        "book_name TEXT, count INTEGER",
+        "INSERT INTO book_views (book_id, count) "
+        "SELECT t.id, SUM(s.count) FROM _src_book_views s "
+        "JOIN (SELECT DISTINCT ON (nomi) nomi, id FROM books ORDER BY nomi, sort_key, id) t "
+        "ON t.nomi = s.book_name "
+        "GROUP BY t.id ON CONFLICT DO NOTHING;",
+    ),
+}
+# Kaliti yo'q jadval: qayta ishga tushirishda dublikat bo'lmasligi uchun
+MERGE_FILTER = {
+    "feedback": "WHERE NOT EXISTS (SELECT 1 FROM feedback f WHERE f.id IS NOT DISTINCT FROM s.id "
+                "AND f.text IS NOT DISTINCT FROM s.text AND f.created_at IS NOT DISTINCT FROM s.created_at)",
+}
+
+_SEP = "\x1f"
+_NULL = "\\N"
+
+
+# ---------- Checksum ----------
+
+def _checksum_columns(table: str) -> List[str]:
+    skip = CHECKSUM_SKIP.get(table, set())
+    return [c for c in TABLES[table] if c not in skip]
+
+
+def row_digest(values: Sequence) -> int:
+    """PostgreSQL dagi _pg_checksum bilan bir xil: md5(ustunlar chr(31) bilan) ning 8 bayti, signed."""
+    text = _SEP.join(_NULL if v is None else str(v) for v in values)
+    return int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:8], "big", signed=True)
+
+
+def _pg_checksum(cur, table: str) -> Tuple[int, int]:
+    cols = ", ".join(f"COALESCE({c}::text, '{_NULL}')" for c in _checksum_columns(table))
+    cur.execute(
+        f"""
+        SELECT COUNT(*) AS n,
+               COALESCE(SUM(('x' || left(md5(concat_ws(chr(31), {cols})), 16))::bit(64)::bigint), 0) AS s
+        FROM {table};
+        """
+    )
+    row = cur.fetchone()
+    return row["n"], int(row["s"])
+
+
+# ---------- Bitta jadval ----------
+
+def _sqlite_connect(path: Path) -> sqlite3.Connection:
+    # Faqat o'qish: asl bazaga tegmaymiz
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+
+def _select_sql(src: sqlite3.Connection, table: str) -> Optional[str]:
+    have = {r[1] for r in src.execute(f"PRAGMA table_info({table});")}
+    if not have:
+        return None
+    # Eski bazada keyin qo'shilgan ustun bo'lmasa — NULL
+    cols = ", ".join(c if c in have else "NULL" for c in TABLES[table])
+    return f"SELECT {cols} FROM {table} ORDER BY rowid;"
+
+
+def _clean(table: str, row: tuple) -> tuple:
+    if table == "feedback" and not row[4]:
+        return row[:4] + (None,)  # bo'sh created_at TIMESTAMPTZ ga sig'maydi
+    return row
+
+
+def copy_table(sqlite_path: Path, table: str, batch_rows: int) -> dict:
+    t0 = time.perf_counter()
+    columns = TABLES[table]
+    names = ", ".join(columns)
+    cs_idx = [columns.index(c) for c in _checksum_columns(table)]
+    src_rows = src_sum = 0
+
+    src = _sqlite_connect(sqlite_path)
     try:
-        with path.open("r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return default
-
-
-def backup_file(path: Path) -> None:
-    BACKUP_DIR.mkdir(parents=True, exist_ok=True)
-    if path.exists():
-        dest = BACKUP_DIR / f"{path.name}.{ts()}.bak"
-        shutil.copy2(path, dest)
-
-
-def ensure_data_dir():
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-
-def index_books_by_id() -> Dict[str, dict]:
-    """DB dagi books ni id->row ko'rinishida qaytaradi."""
-    rows = get_books()
-    return {row["id"]: row for row in rows}
-
-
-def index_parts_by_book(book_id: str) -> Dict[Tuple[str, str], dict]:
-    """(nomi, audio_url) bo'yicha indeks — dublikatni oldini olish uchun."""
-    rows = get_parts(book_id)
-    return {(row["nomi"], row["audio_url"]): row for row in rows}
-
-
-# ---------- Migratsiya bosqichlari ----------
-
-def migrate_books_and_parts() -> Tuple[int, int, int, int]:
-    """
-    data/books.json dan:
-    {
-      "kitoblar": [
-        {
-          "id": "1",
-          "nomi": "Kitob nomi",
-          "qismlar": [
-            {"nomi": "1-qism", "audio_url": "https://t.me/kanal/123"},
-            ...
-          ]
-        },
-        ...
-      ]
+        sql = _select_sql(src, table)
+        if sql is None:
+            return {"table": table, "missing": True}
+
+        with get_conn() as conn, conn.transaction(), conn.cursor() as cur:
+            cur.execute(f"SELECT EXISTS (SELECT 1 FROM {table}) AS busy;")
+            direct = not cur.fetchone()["busy"] and table not in TRANSFORM
+            if direct:
+                target = f"{table} ({names})"
+            else:
+                staging = TRANSFORM[table][0] if table in TRANSFORM else f"LIKE {table} INCLUDING DEFAULTS"
+                cur.execute(f"CREATE TEMP TABLE _src_{table} ({staging}) ON COMMIT DROP;")
+                target = f"_src_{table} ({names})"
+
+            reader = src.execute(sql)
+            with cur.copy(f"COPY {target} FROM STDIN") as copy:
+                while True:
+                    rows = reader.fetchmany(batch_rows)
+                    if not rows:
+                        break
+                    for row in rows:
+                        row = _clean(table, row)
+                        copy.write_row(row)
+                        src_sum += row_digest([row[i] for i in cs_idx])
+                    src_rows += len(rows)
+
+            if table in TRANSFORM:
+                cur.execute(TRANSFORM[table][1])
+            elif not direct:
+                cur.execute(
+                    f"INSERT INTO {table} ({names}) SELECT {names} FROM _src_{table} s "
+                    f"{MERGE_FILTER.get(table, '')} ON CONFLICT DO NOTHING;"
+                )
+            copied = src_rows if direct else max(cur.rowcount, 0)
+    finally:
+        src.close()
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "table": table, "rows": src_rows, "copied": copied, "direct": direct,
+        "checksum": src_sum, "elapsed": elapsed,
     }
-    """
-    books_json = safe_read_json(DATA_DIR / "books.json", default={})
-    all_books = books_json.get("kitoblar", [])
-    if not isinstance(all_books, list):
-        all_books = []
 
-    # Backup qilamiz (asliga tegmaydi)
-    backup_file(DATA_DIR / "books.json")
 
-    existed_books = index_books_by_id()
+# ---------- Tekshiruv ----------
 
-    added_books = 0
-    skipped_books = 0
-    added_parts = 0
-    skipped_parts = 0
+def verify(result: dict) -> str:
+    if result["table"] in TRANSFORM:
+        # Kalit o'zgaradi (nom -> kitob id) — qatorma-qator solishtirib bo'lmaydi
+        return f"ℹ️ qayta kalitlandi: {result['rows']} nomdan {result['copied']} kitob"
+    with get_conn() as conn, conn.cursor() as cur:
+        n, s = _pg_checksum(cur, result["table"])
+    if not result["direct"]:
+        # Jadvalda avvaldan qatorlar bor edi — to'liq tenglik kutilmaydi
+        return f"⚠️ avvaldan to'la jadval, faqat soni: PG {n} ≥ SQLite {result['rows']}" \
+            if n >= result["rows"] else f"❌ PG {n} < SQLite {result['rows']}"
+    if n == result["rows"] and s == result["checksum"]:
+        return "✅ soni va checksum mos"
+    return f"❌ soni PG {n} / SQLite {result['rows']}, checksum {'mos' if s == result['checksum'] else 'farq qiladi'}"
 
-    for b in all_books:
-        book_id = str(b.get("id") or "").strip()
-        nomi = str(b.get("nomi") or "").strip()
 
-        if not book_id or not nomi:
-            # invalid yozuv — tashlab ketamiz
-            skipped_books += 1
-            continue
+def bump_sequences():
+    with get_conn() as conn, conn.cursor() as cur:
+        for table in SERIAL_TABLES:
+            cur.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 0) + 1, false) "
+                f"FROM {table};"
+            )
+    sync_book_id_seq()
 
-        if book_id in existed_books:
-            skipped_books += 1
-        else:
-            try:
-                add_book(book_id, nomi)
-                added_books += 1
-            except Exception:
-                # ehtimol parallel ishga tushirishda poyga — tashlab ketamiz
-                skipped_books += 1
-
-        # Qismlar
-        parts = b.get("qismlar", [])
-        if isinstance(parts, list):
-            # dublikatni oldini olish uchun mavjudlarni indekslaymiz
-            existing_map = index_parts_by_book(book_id)
-            for p in parts:
-                p_nomi = str(p.get("nomi") or "").strip()
-                p_url = str(p.get("audio_url") or "").strip()
-                key = (p_nomi, p_url)
-                if not p_nomi or not p_url:
-                    skipped_parts += 1
-                    continue
-                if key in existing_map:
-                    skipped_parts += 1
-                    continue
-                try:
-                    add_part(book_id, p_nomi, p_url)
-                    added_parts += 1
-                except Exception:
-                    skipped_parts += 1
-
-    return added_books, skipped_books, added_parts, skipped_parts
-
-
-def migrate_book_views() -> Tuple[int, int]:
-    """
-    data/book_views.json dan:
-    {
-      "Kitob nomi": 12,
-      ...
-    }
-    """
-    views_json = safe_read_json(DATA_DIR / "book_views.json", default={})
-    if not isinstance(views_json, dict):
-        views_json = {}
-
-    backup_file(DATA_DIR / "book_views.json")
-
-    added = 0
-    skipped = 0
-    for book_name, count in views_json.items():
-        try:
-            cnt = int(count)
-        except Exception:
-            skipped += 1
-            continue
-        if not book_name:
-            skipped += 1
-            continue
-        try:
-            # count marta increment qilamiz (kichik son bo'lsa ok; juda katta bo'lsa sekinlashishi mumkin)
-            for _ in range(cnt):
-                increment_book_view(book_name)
-            added += 1
-        except Exception:
-            skipped += 1
-
-    return added, skipped
-
-
-def migrate_users() -> Tuple[int, int]:
-    """
-    data/users.json — ko‘rganlaridan kelib chiqib:
-    {
-      "8027031316": {"id": 8027031316, "name": "Behruz"},
-      ...
-    }
-    yoki ba'zan shunchaki dict bo‘lishi mumkin.
-    """
-    users_json = safe_read_json(DATA_DIR / "users.json", default={})
-    if not isinstance(users_json, dict):
-        users_json = {}
-
-    backup_file(DATA_DIR / "users.json")
-
-    added = 0
-    skipped = 0
-    for key, val in users_json.items():
-        try:
-            if isinstance(val, dict):
-                uid = int(val.get("id") or key)
-                name = str(val.get("name") or "")[:255]
-            else:
-                uid = int(key)
-                name = str(val)[:255]
-            if uid <= 0:
-                skipped += 1
-                continue
-            try:
-                add_user(uid, name)
-                added += 1
-            except Exception:
-                # PK bor — demak avvaldan mavjud
-                skipped += 1
-        except Exception:
-            skipped += 1
-
-    return added, skipped
-
-
-def migrate_admins() -> Tuple[int, int]:
-    """
-    data/admins.json — admin_manage.py’dagi load_admins() formatiga mos:
-    {
-      "8027031316": {"id": 8027031316, "name": "Behruz"},
-      ...
-    }
-    """
-    admins_json = safe_read_json(DATA_DIR / "admins.json", default={})
-    if not isinstance(admins_json, dict):
-        admins_json = {}
-
-    backup_file(DATA_DIR / "admins.json")
-
-    added = 0
-    skipped = 0
-    for key, val in admins_json.items():
-        try:
-            if isinstance(val, dict):
-                aid = int(val.get("id") or key)
-                name = str(val.get("name") or "")[:255]
-            else:
-                aid = int(key)
-                name = str(val)[:255]
-            if aid <= 0:
-                skipped += 1
-                continue
-            try:
-                add_admin(aid, name)
-                added += 1
-            except Exception:
-                skipped += 1
-        except Exception:
-            skipped += 1
-
-    return added, skipped
-
-
-def migrate_feedback() -> Tuple[int, int]:
-    """
-    data/feedback.json:
-    [
-      {"id": 123, "name": "...", "username": "...", "text": "..."},
-      ...
-    ]
-    """
-    feedback_json = safe_read_json(DATA_DIR / "feedback.json", default=[])
-    if not isinstance(feedback_json, list):
-        feedback_json = []
-
-    backup_file(DATA_DIR / "feedback.json")
-
-    added = 0
-    skipped = 0
-    for fb in feedback_json:
-        try:
-            uid = int(fb.get("id"))
-            name = str(fb.get("name") or "")[:255]
-            username = str(fb.get("username") or "")[:255]
-            text = str(fb.get("text") or "")
-            if not text:
-                skipped += 1
-                continue
-            try:
-                add_feedback(uid, name, username, text)
-                added += 1
-            except Exception:
-                skipped += 1
-        except Exception:
-            skipped += 1
-
-    return added, skipped
 
+# ---------- Ishga tushirish ----------
 
 def main():
-    print("➡️  Migratsiya boshlandi...")
-    ensure_data_dir()
-
-    # DB tayyorlab olamiz
-    print("ℹ️  DB init (tables, pragmas)...")
+    parser = argparse.ArgumentParser(description="SQLite (data/app.db) -> PostgreSQL")
+    parser.add_argument("--sqlite", type=Path, default=DB_FILE)
+    parser.add_argument("--jobs", type=int, default=JOBS, help="parallel jadvallar soni")
+    parser.add_argument("--batch", type=int, default=BATCH_ROWS, help="fetchmany hajmi")
+    args = parser.parse_args()
+
+    if not args.sqlite.exists():
+        print(f"❌ SQLite bazasi topilmadi: {args.sqlite}")
+        sys.exit(1)
+    # Har bir parallel jadval pooldan bitta ulanish oladi
+    jobs = max(1, min(args.jobs, pool.max_size))
+
+    print(f"➡️  Migratsiya boshlandi: {args.sqlite} ({jobs} parallel)")
+    print("ℹ️  DB init (migratsiyalar)...")
     init_db()
-    if not DB_FILE.exists():
-        print("❌ DB fayli yaratilmagan ko‘rinadi (data/app.db yo‘q). storage.init_db() ni tekshiring.")
-        return
-
-    # Har bir blokni alohida migratsiya qilamiz
-    b_add, b_skip, p_add, p_skip = migrate_books_and_parts()
-    print(f"📚 Books: +{b_add}, skip {b_skip} | 🎧 Parts: +{p_add}, skip {p_skip}")
-
-    v_add, v_skip = migrate_book_views()
-    print(f"📊 Book views: +{v_add}, skip {v_skip}")
-
-    u_add, u_skip = migrate_users()
-    print(f"👥 Users: +{u_add}, skip {u_skip}")
-
-    a_add, a_skip = migrate_admins()
-    print(f"👮 Admins: +{a_add}, skip {a_skip}")
-
-    f_add, f_skip = migrate_feedback()
-    print(f"💬 Feedback: +{f_add}, skip {f_skip}")
 
+    t0 = time.perf_counter()
+    results: List[dict] = []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for phase in PHASES:
+            futures = [executor.submit(copy_table, args.sqlite, table, args.batch) for table in phase]
+            results.extend(f.result() for f in futures)
+    bump_sequences()
+    total = time.perf_counter() - t0
+
+    failed = False
+    for r in results:
+        if r.get("missing"):
+            print(f"➖ {r['table']}: SQLite da jadval yo'q")
+            continue
+        status = verify(r)
+        failed |= status.startswith("❌")
+        rate = r["rows"] / r["elapsed"] if r["elapsed"] > 0 else 0.0
+        mode = "COPY" if r["direct"] else "COPY+merge"
+        print(f"{r['table']}: {r['rows']} qator, +{r['copied']} ({mode}, {r['elapsed']:.1f} s, "
+              f"{rate:,.0f} qator/s) — {status}")
+
+    print(f"⏱  Jami {total:.1f} s")
+    if failed:
+        print("❌ Tekshiruv o'tmadi.")
+        sys.exit(1)
     print("✅ Migratsiya yakunlandi.")
 
 
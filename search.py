@@ -0,0 +1,77 @@
+"""
+Kitob nomlari bo'yicha qidiruv: normalizatsiya va xotiradagi trigram indeksi.
+
+fold() — o'zbek kirill/lotin va apostrof variantlarini (o‘/o'/oʻ) bitta ko'rinishga
+keltiradi; DB dagi uz_fold() SQL funksiyasi aynan shu qoidalarni bajaradi.
+NgramIndex — pg_trgm mavjud bo'lmaganda katalog keshidan quriladigan zaxira indeks
+(scripts/bench_search.py bilan lokal o'lchash mumkin).
+"""
+import re
+from collections import defaultdict
+from typing import Dict, List, Mapping, Sequence, Set, Tuple
+
+# Ko'p harfli moslar avval (translate 1:1 ishlaydi)
+_CYR_MULTI = {"ё": "yo", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sh", "ю": "yu", "я": "ya"}
+_CYR_SINGLE = str.maketrans(
+    "абвгдежзийклмнопрстуфхыэўқғҳ",
+    "abvgdejziyklmnoprstufxieoqgh",
+)
+# Apostrof va tutuq belgisi variantlari: o‘ o' oʻ oʼ o` o’ ... — hammasi tashlab yuboriladi
+_APOSTROPHES = "'‘’ʻʼ`´ʹъь"
+_DROP = str.maketrans("", "", _APOSTROPHES)
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+MIN_SCORE = 0.3
+
+
+def fold(text: str) -> str:
+    """Qidiruv kaliti: kichik harf, kirill -> lotin, apostroflarsiz, faqat [a-z0-9 ]."""
+    s = (text or "").lower()
+    for cyr, lat in _CYR_MULTI.items():
+        s = s.replace(cyr, lat)
+    s = s.translate(_CYR_SINGLE).translate(_DROP)
+    return _NON_WORD.sub(" ", s).strip()
+
+
+def trigrams(key: str) -> Set[str]:
+    """pg_trgm ga o'xshash: har bir so'z "  so'z " ko'rinishida to'ldirilib 3 talikka bo'linadi."""
+    grams = set()
+    for word in key.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NgramIndex:
+    """Trigram -> kitob indekslari; natija word_similarity ga yaqin ball bilan tartiblanadi."""
+
+    def __init__(self, books: Sequence[Mapping]):
+        self.books = tuple(books)
+        self.keys = tuple(fold(b["nomi"]) for b in self.books)
+        self._grams = tuple(trigrams(k) for k in self.keys)
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for i, grams in enumerate(self._grams):
+            for g in grams:
+                postings[g].append(i)
+        self._postings = dict(postings)
+
+    def search(self, query: str, limit: int = 10, min_score: float = MIN_SCORE) -> List[Tuple[float, Mapping]]:
+        q = fold(query)
+        if not q:
+            return []
+        q_grams = trigrams(q)
+        shared: Dict[int, int] = defaultdict(int)
+        for g in q_grams:
+            for i in self._postings.get(g, ()):
+                shared[i] += 1
+
+        scored = []
+        for i, n in shared.items():
+            # So'rovning qancha qismi nomda bor (word_similarity ga yaqin), substring — eng yuqori
+            score = n / len(q_grams)
+            if q in self.keys[i]:
+                score = 1.0 + (self.keys[i].startswith(q))
+            if score >= min_score:
+                scored.append((score, i))
+        scored.sort(key=lambda t: (-t[0], t[1]))
+        return [(score, self.books[i]) for score, i in scored[:limit]]
@@ -0,0 +1,174 @@
+"""
+Suhbat (ConversationHandler) oqimlari uchun vaqtinchalik holat ombori.
+
+Holat (owner_id, key) juftligi bo'yicha saqlanadi, TTL dan keyin o'chadi va
+ixcham JSON ko'rinishida serializatsiya qilinadi (set/tuple ham saqlanadi).
+Backend STATE_BACKEND orqali tanlanadi:
+  - "postgres" (default) — restartdan keyin ham saqlanadi, bir nechta worker uchun umumiy;
+  - "memory"  — bitta jarayon ichida, DB ga murojaat qilmaydi.
+"""
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from psycopg.types.json import Jsonb
+from telegram.ext import ContextTypes
+
+from async_storage import get_conn
+
+STATE_BACKEND = os.getenv("STATE_BACKEND", "postgres").lower()
+STATE_TTL = int(os.getenv("STATE_TTL", "3600"))
+
+
+# ---------- Serializatsiya ----------
+
+def _encode(obj):
+    if isinstance(obj, (set, frozenset)):
+        return {"$set": sorted(obj)}
+    if isinstance(obj, tuple):
+        return {"$tuple": list(obj)}
+    raise TypeError(f"{type(obj).__name__} holat omborida saqlanmaydi")
+
+
+def _decode(obj: dict):
+    if "$set" in obj and len(obj) == 1:
+        return set(obj["$set"])
+    if "$tuple" in obj and len(obj) == 1:
+        return tuple(obj["$tuple"])
+    return obj
+
+
+def _prepare(value: Any) -> Any:
+    # json.dumps tuple larni default ga bermaydi — oldindan belgilab qo'yamiz
+    if isinstance(value, tuple):
+        return {"$tuple": [_prepare(v) for v in value]}
+    if isinstance(value, dict):
+        return {k: _prepare(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_prepare(v) for v in value]
+    return value
+
+
+def dumps(value: Any) -> str:
+    return json.dumps(_prepare(value), separators=(",", ":"), ensure_ascii=False, default=_encode)
+
+
+def loads(data: str) -> Any:
+    return json.loads(data, object_hook=_decode)
+
+
+# ---------- Backendlar ----------
+
+class StateStore(ABC):
+    """Backend interfeysi: to'liq bo'lmagan backend yaratilayotganda (import paytida) xato beradi."""
+
+    @abstractmethod
+    async def get(self, owner: int, key: str, default: Any = None) -> Any:
+        ...
+
+    @abstractmethod
+    async def set(self, owner: int, key: str, value: Any, ttl: Optional[int] = None):
+        ...
+
+    @abstractmethod
+    async def delete(self, owner: int, key: str):
+        ...
+
+    @abstractmethod
+    async def purge_expired(self) -> int:
+        ...
+
+    async def pop(self, owner: int, key: str, default: Any = None) -> Any:
+        value = await self.get(owner, key, default)
+        await self.delete(owner, key)
+        return value
+
+
+class MemoryStateStore(StateStore):
+    def __init__(self):
+        self._data: Dict[Tuple[int, str], Tuple[float, str]] = {}
+
+    async def get(self, owner: int, key: str, default: Any = None) -> Any:
+        item = self._data.get((owner, key))
+        if item is None:
+            return default
+        expires_at, blob = item
+        if expires_at <= time.monotonic():
+            self._data.pop((owner, key), None)
+            return default
+        return loads(blob)
+
+    async def set(self, owner: int, key: str, value: Any, ttl: Optional[int] = None):
+        self._data[(owner, key)] = (time.monotonic() + (ttl or STATE_TTL), dumps(value))
+
+    async def delete(self, owner: int, key: str):
+        self._data.pop((owner, key), None)
+
+    async def purge_expired(self) -> int:
+        now = time.monotonic()
+        expired = [k for k, (exp, _) in self._data.items() if exp <= now]
+        for k in expired:
+            del self._data[k]
+        return len(expired)
+
+
+class PostgresStateStore(StateStore):
+    async def get(self, owner: int, key: str, default: Any = None) -> Any:
+        async with get_conn() as conn, conn.cursor() as cur:
+            await cur.execute(
+                "SELECT value::text AS value FROM conversation_state "
+                "WHERE owner_id = %s AND key = %s AND expires_at > now();",
+                (owner, key)
+            )
+            row = await cur.fetchone()
+        return loads(row["value"]) if row else default
+
+    async def set(self, owner: int, key: str, value: Any, ttl: Optional[int] = None):
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl or STATE_TTL)
+        async with get_conn() as conn, conn.cursor() as cur:
+            await cur.execute(
+                """
+                INSERT INTO conversation_state (owner_id, key, value, expires_at)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (owner_id, key) DO UPDATE SET value = EXCLUDED.value, expires_at = EXCLUDED.expires_at;
+                """,
+                (owner, key, Jsonb(value, dumps=dumps), expires_at)
+            )
+
+    async def delete(self, owner: int, key: str):
+        async with get_conn() as conn, conn.cursor() as cur:
+            await cur.execute("DELETE FROM conversation_state WHERE owner_id = %s AND key = %s;", (owner, key))
+
+    async def pop(self, owner: int, key: str, default: Any = None) -> Any:
+        async with get_conn() as conn, conn.cursor() as cur:
+            await cur.execute(
+                "DELETE FROM conversation_state WHERE owner_id = %s AND key = %s "
+                "RETURNING value::text AS value, expires_at > now() AS alive;",
+                (owner, key)
+            )
+            row = await cur.fetchone()
+        return loads(row["value"]) if row and row["alive"] else default
+
+    async def purge_expired(self) -> int:
+        async with get_conn() as conn, conn.cursor() as cur:
+            await cur.execute("DELETE FROM conversation_state WHERE expires_at <= now();")
+            return cur.rowcount
+
+
+def _make_store() -> StateStore:
+    if STATE_BACKEND == "memory":
+        return MemoryStateStore()
+    if STATE_BACKEND == "postgres":
+        return PostgresStateStore()
+    raise ValueError(f"Unknown STATE_BACKEND: {STATE_BACKEND}")
+
+
+store: StateStore = _make_store()
+
+
+async def purge_expired_state(context: ContextTypes.DEFAULT_TYPE):
+    """JobQueue callback: muddati o'tgan holatlarni tozalaydi."""
+    await store.purge_expired()
@@ -25,90 +25,67 @@ def get_conn():
 # 🔧 Init & Schema
 # =====================
 
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+# Bir vaqtda ishga tushgan bir nechta worker migratsiyani ikki marta qo'llamasligi uchun
+MIGRATIONS_LOCK_ID = 7_310_001
+
+def _migration_files() -> List[tuple]:
+    """migrations/NNNN_nomi.sql -> [(NNNN, nomi, path)] versiya bo'yicha tartiblangan."""
+    files = []
+    for fname in os.listdir(MIGRATIONS_DIR):
+        if not fname.endswith(".sql"):
+            continue
+        version, _, name = fname[:-4].partition("_")
+        if version.isdigit():
+            files.append((int(version), name, os.path.join(MIGRATIONS_DIR, fname)))
+    return sorted(files)
+
 def init_db():
-    """Create tables and indexes if not exist (PostgreSQL version)."""
-    ddl_statements = [
-        # Books
-        """
-        CREATE TABLE IF NOT EXISTS books (
-            id TEXT PRIMARY KEY,
-            nomi TEXT NOT NULL
-        );
-        """,
-        # Parts (audio chapters)
-        """
-        CREATE TABLE IF NOT EXISTS parts (
-            id SERIAL PRIMARY KEY,
-            book_id TEXT NOT NULL REFERENCES books(id) ON DELETE CASCADE,
-            nomi TEXT NOT NULL,
-            audio_url TEXT NOT NULL
-        );
-        """,
-        # Genres and M2M link
-        """
-        CREATE TABLE IF NOT EXISTS genres (
-            id SERIAL PRIMARY KEY,
-            nomi TEXT UNIQUE NOT NULL
-        );
-        """,
-        """
-        CREATE TABLE IF NOT EXISTS book_genres (
-            book_id TEXT NOT NULL REFERENCES books(id) ON DELETE CASCADE,
-            genre_id INTEGER NOT NULL REFERENCES genres(id) ON DELETE CASCADE,
-            PRIMARY KEY (book_id, genre_id)
-        );
-        """,
-        # Users & Admins
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            id BIGINT PRIMARY KEY,
-            name TEXT
-        );
-        """,
-        """
-        CREATE TABLE IF NOT EXISTS admins (
-            id BIGINT PRIMARY KEY,
-            name TEXT
-        );
-        """,
-        # Feedback
-        """
-        CREATE TABLE IF NOT EXISTS feedback (
-            id BIGINT,               -- user_id
-            name TEXT,
-            username TEXT,
-            text TEXT,
-            created_at TIMESTAMPTZ   -- ISO time
-        );
-        """,
-        # Book views
-        """
-        CREATE TABLE IF NOT EXISTS book_views (
-            book_name TEXT PRIMARY KEY,
-            count INTEGER NOT NULL DEFAULT 0
-        );
-        """,
-        # Helpful index for feedback dedupe
-        """
-        CREATE INDEX IF NOT EXISTS idx_feedback_user_text ON feedback (id, text);
-        """,
-    ]
+    """Apply pending migrations from migrations/ (schema_version da qayd etiladi)."""
     with get_conn() as conn:
-        with conn.cursor() as cur:
-            for stmt in ddl_statements:
-                cur.execute(stmt)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+        """)
+        conn.execute("SELECT pg_advisory_lock(%s);", (MIGRATIONS_LOCK_ID,))
+        try:
+            applied = {r["version"] for r in conn.execute("SELECT version FROM schema_version;").fetchall()}
+            for version, name, path in _migration_files():
+                if version in applied:
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    sql = f.read()
+                # Har bir migratsiya va uning qaydi — bitta tranzaksiyada
+                with conn.transaction():
+                    conn.execute(sql)
+                    conn.execute(
+                        "INSERT INTO schema_version (version, name) VALUES (%s, %s);",
+                        (version, name)
+                    )
+                print(f"✅ Migration {version:04d}_{name} applied")
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(%s);", (MIGRATIONS_LOCK_ID,))
 
 # =====================
 # 📚 Books
 # =====================
 
 def get_next_book_id() -> str:
-    """Return next numeric string id based on max(id::int)."""
+    """Reserve the next numeric string id from book_id_seq."""
     with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("SELECT MAX(CASE WHEN id ~ '^\\d+$' THEN id::int ELSE NULL END) AS m FROM books;")
-        row = cur.fetchone()
-        mx = row["m"] if row and row["m"] is not None else 0
-        return str(int(mx) + 1)
+        cur.execute("SELECT nextval('book_id_seq') AS id;")
+        return str(cur.fetchone()["id"])
+
+def sync_book_id_seq():
+    """Id lari tashqaridan berilgan import dan keyin book_id_seq ni MAX(sort_key) ga tenglaydi."""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT setval('book_id_seq', GREATEST(COALESCE(MAX(sort_key), 0), "
+            "(SELECT last_value FROM book_id_seq)), true) FROM books;"
+        )
 
 def add_book(book_id: str, nomi: str):
     with get_conn() as conn, conn.cursor() as cur:
@@ -131,7 +108,7 @@ def get_book_by_title(title: str) -> Optional[Dict]:
 
 def get_books() -> List[Dict]:
     with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("SELECT * FROM books ORDER BY (CASE WHEN id ~ '^\\d+$' THEN id::int ELSE NULL END), id;")
+        cur.execute("SELECT * FROM books ORDER BY sort_key, id;")
         return list(cur.fetchall())
 
 def delete_book(book_id: str):
@@ -214,12 +191,49 @@ def get_genres_for_book(book_id: str) -> List[Dict]:
         return list(cur.fetchall())
 
 def set_book_genres(book_id: str, genre_ids: List[int]):
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("DELETE FROM book_genres WHERE book_id = %s;", (book_id,))
-        for gid in genre_ids:
+    # async_storage.set_book_genres bilan bir xil: faqat farq, bitta tranzaksiyada
+    ids = sorted(set(genre_ids))
+    with get_conn() as conn, conn.transaction(), conn.cursor() as cur:
+        cur.execute(
+            "DELETE FROM book_genres WHERE book_id = %s AND genre_id <> ALL(%s::int[]);",
+            (book_id, ids)
+        )
+        if ids:
             cur.execute(
-                "INSERT INTO book_genres (book_id, genre_id) VALUES (%s, %s) ON CONFLICT DO NOTHING;",
-                (book_id, gid)
+                """
+                INSERT INTO book_genres (book_id, genre_id)
+                SELECT %s, unnest(%s::int[])
+                ON CONFLICT DO NOTHING;
+                """,
+                (book_id, ids)
+            )
+
+def set_genres_for_books(assignments: Dict[str, List[int]]):
+    """{book_id: [genre_id, ...]} — ko'p kitobning janrlarini ikki so'rov bilan tenglashtiradi."""
+    if not assignments:
+        return
+    book_ids = list(assignments)
+    pairs = [(bid, gid) for bid, gids in assignments.items() for gid in sorted(set(gids))]
+    with get_conn() as conn, conn.transaction(), conn.cursor() as cur:
+        cur.execute(
+            """
+            DELETE FROM book_genres bg
+            WHERE bg.book_id = ANY(%s::text[])
+              AND NOT EXISTS (
+                  SELECT 1 FROM unnest(%s::text[], %s::int[]) AS n(book_id, genre_id)
+                  WHERE n.book_id = bg.book_id AND n.genre_id = bg.genre_id
+              );
+            """,
+            (book_ids, [p[0] for p in pairs], [p[1] for p in pairs])
+        )
+        if pairs:
+            cur.execute(
+                """
+                INSERT INTO book_genres (book_id, genre_id)
+                SELECT * FROM unnest(%s::text[], %s::int[])
+                ON CONFLICT DO NOTHING;
+                """,
+                ([p[0] for p in pairs], [p[1] for p in pairs])
             )
 
 def get_books_by_genre(genre_id: int) -> List[Dict]:
@@ -229,7 +243,7 @@ def get_books_by_genre(genre_id: int) -> List[Dict]:
             SELECT b.* FROM books b
             JOIN book_genres bg ON bg.book_id = b.id
             WHERE bg.genre_id = %s
-            ORDER BY (CASE WHEN b.id ~ '^\\d+$' THEN b.id::int ELSE NULL END), b.id;
+            ORDER BY b.sort_key, b.id;
             """,
             (genre_id,)
         )
@@ -316,19 +330,19 @@ def deduplicate_feedback() -> int:
 # 👁 Book Views
 # =====================
 
-def increment_book_view(book_name: str):
+def increment_book_view(book_id: str):
     with get_conn() as conn, conn.cursor() as cur:
         cur.execute(
             """
-            INSERT INTO book_views (book_name, count) VALUES (%s, 1)
-            ON CONFLICT (book_name) DO UPDATE SET count = book_views.count + 1;
+            INSERT INTO book_views (book_id, count) VALUES (%s, 1)
+            ON CONFLICT (book_id) DO UPDATE SET count = book_views.count + 1;
             """,
-            (book_name,)
+            (book_id,)
         )
 
 def get_book_views() -> List[Dict]:
     with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("SELECT * FROM book_views ORDER BY count DESC, book_name;")
+        cur.execute("SELECT * FROM book_views ORDER BY count DESC, book_id;")
         return list(cur.fetchall())
 
 
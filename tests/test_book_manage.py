@@ -0,0 +1,30 @@
+from handlers.book_manage import MAX_LINKS_PER_MESSAGE, parse_part_links
+
+
+def test_single_links_and_lines():
+    urls, bad = parse_part_links("https://t.me/kanal/1\nhttps://t.me/kanal/2  https://t.me/boshqa/9")
+    assert urls == ["https://t.me/kanal/1", "https://t.me/kanal/2", "https://t.me/boshqa/9"]
+    assert bad == []
+
+
+def test_range_is_expanded():
+    urls, bad = parse_part_links("https://t.me/kanal/35-38")
+    assert urls == [f"https://t.me/kanal/{n}" for n in range(35, 39)]
+    assert bad == []
+
+
+def test_reversed_range_is_rejected():
+    assert parse_part_links("https://t.me/kanal/40-35") == ([], ["https://t.me/kanal/40-35"])
+
+
+def test_range_limit():
+    ok, bad = parse_part_links(f"https://t.me/kanal/1-{MAX_LINKS_PER_MESSAGE}")
+    assert len(ok) == MAX_LINKS_PER_MESSAGE and bad == []
+    too_long = f"https://t.me/kanal/1-{MAX_LINKS_PER_MESSAGE + 1}"
+    assert parse_part_links(too_long) == ([], [too_long])
+
+
+def test_junk_is_reported():
+    urls, bad = parse_part_links("https://t.me/kanal/1 salom http://t.me/kanal/2")
+    assert urls == ["https://t.me/kanal/1"]
+    assert bad == ["salom", "http://t.me/kanal/2"]
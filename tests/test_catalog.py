@@ -0,0 +1,71 @@
+import catalog
+from catalog import book_sort_key, build, paginate
+
+
+def _catalog():
+    books = [{"id": i, "nomi": f"Kitob {i}"} for i in ("10", "b", "2", "B", "1")]
+    parts = [
+        {"id": 1, "book_id": "1", "nomi": "1-qism", "audio_url": "https://t.me/k/1"},
+        {"id": 2, "book_id": "1", "nomi": "2-qism", "audio_url": "https://t.me/k/2"},
+        {"id": 3, "book_id": "2", "nomi": "1-qism", "audio_url": "https://t.me/k/3"},
+    ]
+    genres = [{"id": 1, "nomi": "Roman"}]
+    links = [{"book_id": bid, "genre_id": 1} for bid in ("b", "10", "2")]
+    return build(books, parts, genres, links)
+
+
+def test_book_sort_key_numeric_first_by_value():
+    ids = ["10", "b", "2", "B", "1", "007"]
+    assert sorted(ids, key=book_sort_key) == ["1", "2", "007", "10", "B", "b"]
+
+
+def test_book_sort_key_long_digits_sort_as_text():
+    # sort_key faqat 1..18 raqamli id lar uchun (bigint ga sig'adi)
+    assert book_sort_key("1" * 19)[0] == 1
+
+
+def test_build_sorts_books_and_genre_lists():
+    snap = _catalog()
+    assert [b["id"] for b in snap.books] == ["1", "2", "10", "B", "b"]
+    assert list(snap.book_keys) == sorted(snap.book_keys)
+    assert [b["id"] for b in snap.books_by_genre[1]] == ["2", "10", "b"]
+    assert list(snap.genre_book_keys[1]) == sorted(snap.genre_book_keys[1])
+
+
+def test_paginate_forward_and_back():
+    items = [{"id": i} for i in range(10)]
+    keys = list(range(10))
+
+    first = paginate(items, keys, limit=4)
+    assert [i["id"] for i in first.items] == [0, 1, 2, 3]
+    assert (first.offset, first.has_prev, first.has_next) == (0, False, True)
+
+    second = paginate(items, keys, after=3, limit=4)
+    assert [i["id"] for i in second.items] == [4, 5, 6, 7]
+    assert (second.offset, second.has_prev, second.has_next) == (4, True, True)
+
+    last = paginate(items, keys, after=7, limit=4)
+    assert [i["id"] for i in last.items] == [8, 9]
+    assert last.has_next is False
+
+    back = paginate(items, keys, before=8, limit=4)
+    assert [i["id"] for i in back.items] == [4, 5, 6, 7]
+
+    start = paginate(items, keys, before=2, limit=4)
+    assert [i["id"] for i in start.items] == [0, 1]
+    assert start.has_prev is False
+
+
+def test_paginate_over_catalog_keys():
+    snap = _catalog()
+    page = paginate(snap.books, snap.book_keys, after=book_sort_key("2"), limit=2)
+    assert [b["id"] for b in page.items] == ["10", "B"]
+
+
+def test_patch_parts_replaces_snapshot_rows(monkeypatch):
+    monkeypatch.setattr(catalog, "_snapshot", _catalog())
+    catalog.patch_parts({1: {"file_id": "F1"}, 3: {"file_id": "F3"}, 99: {"file_id": "x"}})
+    snap = catalog._snapshot
+    assert [p.get("file_id") for p in snap.parts_by_book["1"]] == ["F1", None]
+    assert snap.parts_by_book["2"][0]["file_id"] == "F3"
+    assert snap.parts_by_id[1]["file_id"] == "F1"
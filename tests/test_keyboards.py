@@ -0,0 +1,31 @@
+from catalog import Page
+from keyboards import paged_keyboard, parse_cursor
+from telegram import InlineKeyboardButton
+
+
+def _button(i, item):
+    return InlineKeyboardButton(item["nomi"], callback_data=f"book_{item['id']}")
+
+
+def test_parse_cursor():
+    assert parse_cursor("books") == ("books", None, None)
+    assert parse_cursor("books:n:12") == ("books", "12", None)
+    assert parse_cursor("books:p:12") == ("books", None, "12")
+    # id ichida ":" bo'lsa ham kalit butunligicha qoladi
+    assert parse_cursor("genre_3:n:a:b") == ("genre_3", "a:b", None)
+    assert parse_cursor("delpartbook_7:n:41") == ("delpartbook_7", "41", None)
+
+
+def test_paged_keyboard_nav_row():
+    items = tuple({"id": str(i), "nomi": f"K{i}"} for i in range(3))
+    rows = paged_keyboard(Page(items, 20, True, True), _button, "books", columns=2)
+    assert [len(r) for r in rows] == [2, 1, 2]
+    prev, nxt = rows[-1]
+    assert prev.callback_data == "books:p:0"
+    assert nxt.callback_data == "books:n:2"
+
+
+def test_paged_keyboard_single_page_has_no_nav():
+    items = tuple({"id": str(i), "nomi": f"K{i}"} for i in range(2))
+    rows = paged_keyboard(Page(items, 0, False, False), _button, "books", columns=1)
+    assert [[b.callback_data for b in r] for r in rows] == [["book_0"], ["book_1"]]
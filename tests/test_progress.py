@@ -0,0 +1,49 @@
+import asyncio
+
+import progress
+
+
+def test_latest_position_is_per_user(monkeypatch):
+    monkeypatch.setattr(progress, "_pending", {})
+    monkeypatch.setattr(progress, "_latest", {})
+    progress.record_progress(1, "a", 10)
+    progress.record_progress(1, "b", 20)
+    progress.record_progress(2, "a", 11)
+    assert progress._last_pending(1) == ("b", 20)
+    assert progress._last_pending(2) == ("a", 11)
+    assert progress._last_pending(3) is None
+
+
+def test_flush_keeps_entries_visible_and_newer_taps(monkeypatch):
+    monkeypatch.setattr(progress, "_pending", {})
+    monkeypatch.setattr(progress, "_latest", {})
+    written = []
+
+    async def save_progress(rows):
+        # Yozish paytida: buferdagi holat hali ko'rinadi, yangi bosish keladi
+        assert progress._last_pending(2) == ("c", 3)
+        progress.record_progress(1, "b", 7)
+        written.extend(rows)
+
+    monkeypatch.setattr(progress, "save_progress", save_progress)
+    progress.record_progress(1, "b", 5)
+    progress.record_progress(2, "c", 3)
+    asyncio.run(progress.flush_progress())
+
+    assert sorted((uid, bid, pid) for uid, bid, pid, _ in written) == [(1, "b", 5), (2, "c", 3)]
+    assert progress._last_pending(1) == ("b", 7)
+    assert progress._last_pending(2) is None
+    assert list(progress._pending) == [(1, "b")]
+
+
+def test_failed_flush_keeps_buffer(monkeypatch):
+    monkeypatch.setattr(progress, "_pending", {})
+    monkeypatch.setattr(progress, "_latest", {})
+
+    async def save_progress(rows):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(progress, "save_progress", save_progress)
+    progress.record_progress(1, "b", 5)
+    asyncio.run(progress.flush_progress())
+    assert progress._last_pending(1) == ("b", 5)
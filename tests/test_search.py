@@ -0,0 +1,42 @@
+from search import NgramIndex, fold
+
+
+def test_fold_apostrophes_and_case():
+    variants = ["O‘tkan kunlar", "O'tkan kunlar", "Oʻtkan  kunlar", "o`tkan-kunlar"]
+    assert {fold(v) for v in variants} == {"otkan kunlar"}
+
+
+def test_fold_cyrillic_to_latin():
+    assert fold("Ўтган кунлар") == fold("O‘tgan kunlar") == "otgan kunlar"
+    assert fold("Шум бола") == "shum bola"
+
+
+def test_fold_empty():
+    assert fold(None) == ""
+    assert fold("  ...  ") == ""
+
+
+def _index():
+    titles = ["O‘tkan kunlar", "Mehrobdan chayon", "Kecha va kunduz", "Shum bola"]
+    return NgramIndex([{"id": str(i), "nomi": t} for i, t in enumerate(titles)])
+
+
+def test_ngram_substring_matches_rank_above_partial():
+    names = [b["nomi"] for _, b in _index().search("kun")]
+    assert set(names[:2]) == {"O‘tkan kunlar", "Kecha va kunduz"}
+
+
+def test_ngram_exact_prefix_beats_substring():
+    results = _index().search("shum")
+    assert results[0][0] == 2.0
+    assert results[0][1]["nomi"] == "Shum bola"
+
+
+def test_ngram_typo_and_script_insensitive():
+    assert _index().search("мехробдан")[0][1]["nomi"] == "Mehrobdan chayon"
+    assert _index().search("mehrobdn")[0][1]["nomi"] == "Mehrobdan chayon"
+
+
+def test_ngram_no_match():
+    assert _index().search("zzzz") == []
+    assert _index().search("") == []
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from state_store import MemoryStateStore, StateStore, dumps, loads
+
+
+def test_json_round_trip_set_and_tuple():
+    value = {
+        "book_id": "12",
+        "genres": {3, 1, 2},
+        "pair": ("a", 1),
+        "nested": [{"ids": {5}}, ("x", ("y",))],
+    }
+    assert loads(dumps(value)) == value
+    assert isinstance(loads(dumps(value))["pair"], tuple)
+
+
+def test_dumps_is_compact_and_sorted():
+    assert dumps({"s": {2, 1}}) == '{"s":{"$set":[1,2]}}'
+    assert dumps(("a",)) == '{"$tuple":["a"]}'
+
+
+def test_plain_dict_with_marker_key_and_more_keys_is_kept():
+    assert loads('{"$set":[1],"other":2}') == {"$set": [1], "other": 2}
+
+
+def test_unsupported_type_fails_loudly():
+    with pytest.raises(TypeError):
+        dumps({"x": object()})
+
+
+def test_memory_store_get_set_pop():
+    async def scenario():
+        store = MemoryStateStore()
+        await store.set(1, "add_book", {"title": "K", "genres": {1}})
+        assert await store.get(1, "add_book") == {"title": "K", "genres": {1}}
+        assert await store.get(2, "add_book", "yo'q") == "yo'q"
+        assert await store.pop(1, "add_book") == {"title": "K", "genres": {1}}
+        assert await store.get(1, "add_book") is None
+
+        await store.set(1, "tmp", 1, ttl=-1)
+        assert await store.purge_expired() == 1
+
+    asyncio.run(scenario())
+
+
+def test_incomplete_backend_fails_on_construction():
+    class Partial(StateStore):
+        async def get(self, owner, key, default=None):
+            return default
+
+    with pytest.raises(TypeError):
+        Partial()
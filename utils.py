@@ -1,5 +1,5 @@
 from telegram import InlineKeyboardMarkup, InlineKeyboardButton
-from storage import get_admins, add_admin, delete_admin
+from async_storage import get_admins, get_admin_ids, add_admin, delete_admin
 from config import ADMINS as ENV_ADMINS
 
 
@@ -15,46 +15,67 @@ def _to_int_set(values) -> set[int]:
     return s
 
 
-def is_admin(user_id: int) -> bool:
+# .env dagi (config.ADMINS) — odatda [int, int, ...]; import paytida bir marta
+_ENV_ADMINS: frozenset[int] = frozenset(_to_int_set(ENV_ADMINS))
+
+
+def retry_after_seconds(exc) -> float:
+    """RetryAfter.retry_after int yoki timedelta bo'lishi mumkin (PTB versiyasiga qarab)."""
+    value = exc.retry_after
+    return value.total_seconds() if hasattr(value, "total_seconds") else float(value)
+
+
+async def edit_or_reply(query, text: str, **kwargs):
+    """
+    Callback xabarini matn bilan almashtiradi. Tugma audio (media) xabarda bo'lsa
+    edit_message_text ishlamaydi ("There is no text in the message to edit") —
+    unda yangi matnli xabar yuboriladi.
+    """
+    if query.message is not None and getattr(query.message, "text", None) is None:
+        return await query.message.reply_text(text, **kwargs)
+    return await query.edit_message_text(text, **kwargs)
+
+
+async def is_admin(user_id: int) -> bool:
     """
     .env dagi ADMINS va DB dagi adminlar roʻyxatini birlashtirib tekshiradi.
-    Shunday qilib, admin panel orqali qoʻshilgan yangi admin ham zudlik bilan tan olinadi.
+    DB roʻyxati keshlanadi (frozenset) va add_admin/delete_admin da yangilanadi,
+    shuning uchun admin panel orqali qoʻshilgan yangi admin ham zudlik bilan tan olinadi.
     """
-    # .env dagi (config.ADMINS) — odatda [int, int, ...]
-    env_admins: set[int] = _to_int_set(ENV_ADMINS)
+    uid = int(user_id)
+    if uid in _ENV_ADMINS:
+        return True
 
     # DB dagi adminlar
     try:
-        db_admins: set[int] = {int(r["id"]) for r in get_admins()}
+        return uid in await get_admin_ids()
     except Exception:
-        db_admins = set()
-
-    return int(user_id) in env_admins or int(user_id) in db_admins
+        return False
 
 
-def load_admins() -> dict:
+async def load_admins() -> dict:
     """
     admin_manage.py mosligi uchun: DB dagi adminlarni
     { "123": {"id":123, "name":"..."} } ko‘rinishida qaytaradi.
     """
-    data = get_admins()  # [{'id':..., 'name':...}]
+    data = await get_admins()  # [{'id':..., 'name':...}]
     return {str(r["id"]): {"id": int(r["id"]), "name": r.get("name") or ""} for r in data}
 
 
-def save_admins(admins: dict):
+async def save_admins(admins: dict):
     """
     admin_manage.py mosligi uchun: berilgan dict ni DB bilan sinxronlashtiradi.
     Minimal diff bilan ishlaydi: yangilarni qo‘shadi, mavjuddan yo‘q bo‘lganlarini o‘chiradi.
     """
-    existing = load_admins()
+    existing = await load_admins()
     # qo'shilganlar
     for k, v in admins.items():
         if k not in existing:
-            add_admin(int(v["id"]), v.get("name") or "")
+            await add_admin(int(v["id"]), v.get("name") or "")
     # o'chirilganlar
     for k in list(existing.keys()):
         if k not in admins:
-            delete_admin(int(k))
+            await delete_admin(int(k))
 
 
 # Orqaga/Asosiy klaviatura (admin bo'limlarida)
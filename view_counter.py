@@ -0,0 +1,38 @@
+"""
+Kitob ko'rishlar hisoblagichi uchun xotiradagi bufer.
+
+Har bir ochilishda DB ga UPSERT qilish o'rniga, oshirishlar shu yerda yig'iladi
+va har VIEW_FLUSH_INTERVAL soniyada (hamda shutdown da) bitta ko'p qatorli
+UPSERT bilan yoziladi.
+"""
+import logging
+import os
+from collections import Counter
+
+from telegram.ext import ContextTypes
+
+from async_storage import add_book_views
+
+logger = logging.getLogger(__name__)
+
+VIEW_FLUSH_INTERVAL = float(os.getenv("VIEW_FLUSH_INTERVAL", "30"))
+
+_pending: Counter = Counter()
+
+
+def record_view(book_id: str):
+    _pending[book_id] += 1
+
+
+async def flush_views(context: ContextTypes.DEFAULT_TYPE = None):
+    """JobQueue callback va post_shutdown: yig'ilgan oshirishlarni DB ga yozadi."""
+    global _pending
+    if not _pending:
+        return
+    batch, _pending = _pending, Counter()
+    try:
+        await add_book_views(dict(batch))
+    except Exception:
+        # Yozilmagan oshirishlarni yo'qotmaymiz — keyingi flush da qayta urinamiz
+        _pending.update(batch)
+        logger.exception("Book views flush failed (%d books)", len(batch))
@@ -0,0 +1,99 @@
+"""
+Webhook rejimi: run_polling o'rniga aiohttp server.
+
+- POST /telegram — Telegram update lari; X-Telegram-Bot-Api-Secret-Token tekshiriladi.
+- GET /healthz   — load balancer uchun: DB ulanishi va katalog keshi holati.
+
+Polling o'rniga Telegram update larni HTTP orqali olish uchun; gorizontal
+kengaytirish uchun EMAS — bitta instance ishga tushiriladi: suhbat holatlari
+(persistence.py) va keshlar jarayon xotirasida, ikkinchi instance ularni ko'rmaydi.
+Keshlar har instance da alohida: katalog (catalog.py) va admin ID lari
+(async_storage.py) boshqa jarayondagi o'zgarishni (skript, deploy paytidagi
+eski/yangi jarayon) faqat CATALOG_TTL / ADMIN_CACHE_TTL o'tgach ko'radi.
+"""
+import asyncio
+import hmac
+import logging
+import signal
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+import catalog
+from async_storage import get_conn
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_PATH = "/telegram"
+HEALTH_PATH = "/healthz"
+HEALTH_TIMEOUT = 2
+
+
+def build_web_app(application: Application, secret_token: str) -> web.Application:
+    async def handle_update(request: web.Request) -> web.Response:
+        received = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not hmac.compare_digest(received, secret_token):
+            return web.Response(status=403)
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        await application.update_queue.put(Update.de_json(data, application.bot))
+        return web.Response()
+
+    async def ping_db():
+        async with get_conn() as conn, conn.cursor() as cur:
+            await cur.execute("SELECT 1;")
+
+    async def health(request: web.Request) -> web.Response:
+        # Pooldan ulanish olish ham (pool band / DB o'chgan) vaqt chegarasi ichida —
+        # aks holda probe pool timeout (30 s) gacha osilib qoladi
+        try:
+            await asyncio.wait_for(ping_db(), timeout=HEALTH_TIMEOUT)
+            db_ok = True
+        except Exception:
+            db_ok = False
+        body = {"status": "ok" if db_ok else "degraded", "db": db_ok, "catalog": catalog.stats()}
+        return web.json_response(body, status=200 if db_ok else 503)
+
+    web_app = web.Application()
+    web_app.router.add_post(WEBHOOK_PATH, handle_update)
+    web_app.router.add_get(HEALTH_PATH, health)
+    return web_app
+
+
+async def run_webhook(application: Application, url: str, secret_token: str, host: str, port: int):
+    """run_polling ga o'xshash hayot sikli: initialize → post_init → start → ... → post_shutdown."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    runner = web.AppRunner(build_web_app(application, secret_token))
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    try:
+        await application.bot.set_webhook(
+            url=url.rstrip("/") + WEBHOOK_PATH,
+            secret_token=secret_token,
+            allowed_updates=Update.ALL_TYPES,
+        )
+        await application.start()
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        logger.info("Webhook server %s:%s da ishlayapti", host, port)
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)